@@ -0,0 +1,238 @@
+#! /usr/bin/env python3
+# vi: set ts=4 et fileencoding=utf-8 ff=unix:
+############################################################################
+#                                                                          #
+# Copyright © 2016 Julian R Yon <julian@julianyon.net>                     #
+#                                                                          #
+# This program is free software: you can redistribute it and/or modify it  #
+# under the terms of the GNU General Public License as published by the    #
+# Free Software Foundation, either version 3 of the License, or (at your   #
+# option) any later version.                                               #
+#                                                                          #
+# This program is distributed in the hope that it will be useful, but      #
+# WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General #
+# Public License for more details.                                         #
+#                                                                          #
+# You should have received a copy of the GNU General Public License along  #
+# with this program. If not, see <http://www.gnu.org/licenses/>.           #
+#                                                                          #
+############################################################################
+
+"""
+Renders the whole clock (the analogue clock, the word clock, the digital
+clocks and the date) at a list of times, as images, e.g. for printed
+worksheets or a time-lapse video. By default that's every minute of
+today:
+
+    python3 batch.py --output frames
+
+The times can also be given much as for the windowed clock: a start
+(or an offset from midnight), a step (or a scale for the default step
+of a minute) and a number of frames, or a file of times with
+--time-replay. Images are
+PNGs, or raw RGBA (--format raw), named in the order of the times. With
+--output - the raw frames are written one after another to stdout
+instead, e.g. for ffmpeg's "-f rawvideo -pix_fmt rgba -s 800x600 -i -".
+
+Drawing is done as fbclock.py does it, without a window. The times are
+shared out among a pool of processes in runs, each of which is drawn in
+order, so that from one frame to the next a process only redraws what
+changed, and the text it has already rendered is reused. The images are
+written as the runs come back, in order.
+"""
+
+import os
+
+# Our command line is our own, not Kivy's.
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+from main import config, argument_parser, apply_args
+from clockstate import parse_time, read_times
+from fbclock import FbClock
+
+import math
+import multiprocessing
+import struct
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+
+############################################################################
+
+class Image:
+    """
+    Stands in for the framebuffer of an FbClock whose frames are only
+    wanted in memory: the clock's own surface holds the image, so there's
+    nothing to copy.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+    def write(self, surface, rect):
+        pass
+
+def png(surface, level=6):
+    """
+    Return an RGBA surface as a PNG file. The surface is opaque, so the
+    alpha channel is left out.
+    """
+    width, height = surface.width, surface.height
+    rgb = bytearray(surface.pixels)
+    del rgb[3::4]
+    stride = width * 3
+    view = memoryview(rgb)
+    # Each row starts with its filter type, which is none.
+    data = b''.join(
+        b'\0' + view[y*stride:(y + 1)*stride] for y in range(height)
+    )
+
+    def chunk(kind, body):
+        return (struct.pack('!I', len(body)) + kind + body
+                + struct.pack('!I', zlib.crc32(kind + body)))
+
+    return b''.join((
+        b'\x89PNG\r\n\x1a\n',
+        chunk(b'IHDR', struct.pack('!2I5B', width, height, 8, 2, 0, 0, 0)),
+        chunk(b'IDAT', zlib.compress(data, level)),
+        chunk(b'IEND', b'')
+    ))
+
+def raw(surface):
+    return bytes(surface.pixels)
+
+formats = {'png': png, 'raw': raw}
+
+############################################################################
+
+# Each worker process draws on its own clock, which lasts as long as the
+# process does, along with the text it has rendered.
+_clock = None
+_encode = None
+
+def start_worker(size, fmt, roman):
+    global _clock, _encode
+    _clock = FbClock(Image(*size), None)
+    _encode = formats[fmt]
+    if roman:
+        for numeral in _clock.numerals:
+            numeral.roman = True
+            numeral.show(numeral.texts[1])
+        _clock.draw_static(_clock.base.rect)
+    _clock.damage(_clock.frame.rect)
+
+def render_run(times):
+    """
+    Draw the clock at each of a run of times, returning the images.
+    """
+    clock = _clock
+    images = []
+    for t in times:
+        clock.state.tick(t)
+        clock.flush()
+        images.append(_encode(clock.frame))
+    return images
+
+def runs(times, jobs):
+    """
+    Split the times into runs, enough of them to keep every process busy
+    to the end but each as long as possible, so that little has to be
+    drawn from scratch.
+    """
+    n = max(1, min(60, math.ceil(len(times) / (jobs * 4))))
+    return [ times[i:i + n] for i in range(0, len(times), n) ]
+
+def render(times, size, fmt='png', roman=False, jobs=None):
+    """
+    Draw the clock at each of the times, yielding the images in order.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    args = (size, fmt, roman)
+    if jobs == 1 or len(times) < 2:
+        start_worker(*args)
+        for run in runs(times, 1):
+            yield from render_run(run)
+        return
+    with multiprocessing.Pool(jobs, start_worker, args) as pool:
+        for images in pool.imap(render_run, runs(times, jobs)):
+            yield from images
+
+def times_from_config(frames):
+    """
+    Return the times to draw: those in the replay file if there is one,
+    or else `frames` of them from the start time, time_step seconds
+    apart. As for the windowed clock, time_offset only applies if no
+    start is given, when it's added to midnight today, and time_scale
+    only if no step is given, when it multiplies the step of a minute.
+    """
+    if config['time_replay'] is not None:
+        return read_times(config['time_replay'])
+    start = config['time_start']
+    if start is None:
+        start = datetime.combine(datetime.now().date(), datetime.min.time())
+        start += timedelta(seconds=config['time_offset'])
+    elif isinstance(start, str):
+        start = parse_time(start)
+    step = config['time_step']
+    if step is None:
+        step = 60 * config['time_scale']
+    step = timedelta(seconds=step)
+    return [ start + i*step for i in range(frames) ]
+
+############################################################################
+
+def parse_args(argv=None):
+    parser = argument_parser("Draw the clock at a list of times, as images.")
+    parser.add_argument(
+        '-o', '--output', default='frames', metavar='DIR',
+        help="the directory for the images, or - to write raw frames to "
+             "stdout (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--format', choices=sorted(formats), default='png',
+        help="the format of the images (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--size', default='800x600', metavar='WxH',
+        type=lambda s: tuple(map(int, s.split('x'))),
+        help="the size of the images (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--frames', type=int, default=1440, metavar='N',
+        help="how many times to draw from the start (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--roman', action='store_true',
+        help="show Roman numerals on the clock face"
+    )
+    parser.add_argument(
+        '-j', '--jobs', type=int, metavar='N',
+        help="how many processes to draw with (default: one per CPU)"
+    )
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parse_args()
+    apply_args(args)
+    times = times_from_config(args.frames)
+    fmt = 'raw' if args.output == '-' else args.format
+    images = render(times, args.size, fmt, args.roman, args.jobs)
+
+    began = time.perf_counter()
+    if args.output == '-':
+        out = sys.stdout.buffer
+        for image in images:
+            out.write(image)
+        out.flush()
+    else:
+        os.makedirs(args.output, exist_ok=True)
+        for i, (t, image) in enumerate(zip(times, images)):
+            name = '{0:05d}-{1:%Y%m%d-%H%M%S}.{2}'.format(i, t, fmt)
+            with open(os.path.join(args.output, name), 'wb') as f:
+                f.write(image)
+    elapsed = time.perf_counter() - began
+    print("Drew {0} frames in {1:.1f}s ({2:.1f} per second).".format(
+        len(times), elapsed, len(times) / elapsed if elapsed else 0
+    ), file=sys.stderr)
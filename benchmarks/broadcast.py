@@ -0,0 +1,193 @@
+# vi: set ts=4 et fileencoding=utf-8 ff=unix:
+############################################################################
+#                                                                          #
+# Copyright © 2016 Julian R Yon <julian@julianyon.net>                     #
+#                                                                          #
+# This program is free software: you can redistribute it and/or modify it  #
+# under the terms of the GNU General Public License as published by the    #
+# Free Software Foundation, either version 3 of the License, or (at your   #
+# option) any later version.                                               #
+#                                                                          #
+# This program is distributed in the hope that it will be useful, but      #
+# WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General #
+# Public License for more details.                                         #
+#                                                                          #
+# You should have received a copy of the GNU General Public License along  #
+# with this program. If not, see <http://www.gnu.org/licenses/>.           #
+#                                                                          #
+############################################################################
+
+"""
+Load test for server.py. Starts the server, then connects more and more
+clients to it (half by WebSocket, half by Server-Sent Events) and, for
+each number of clients, measures the CPU time the server process uses
+per tick, read from /proc. The clock's state is worked out and encoded
+once per tick whatever the number of clients, so what grows with them is
+only the cost of handing the same bytes to each connection.
+
+The clients run in this process, so on a machine with few cores they
+compete with the server; the CPU time it reports is the server's alone.
+Linux only. Run it from anywhere, e.g.:
+
+    python3 benchmarks/broadcast.py --clients 0 100 1000 3000
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+############################################################################
+
+class Client:
+    """
+    One client, which counts the messages it gets.
+    """
+    def __init__(self, port, websocket):
+        self.port = port
+        self.websocket = websocket
+        self.messages = 0
+        self.task = None
+
+    async def connect(self):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        if self.websocket:
+            key = base64.b64encode(os.urandom(16)).decode('ascii')
+            writer.write((
+                'GET /ws HTTP/1.1\r\nHost: localhost\r\n'
+                'Upgrade: websocket\r\nConnection: Upgrade\r\n'
+                'Sec-WebSocket-Key: {0}\r\nSec-WebSocket-Version: 13\r\n\r\n'
+            ).format(key).encode('ascii'))
+        else:
+            writer.write(b'GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        await reader.readuntil(b'\r\n\r\n')
+        self.writer = writer
+        self.task = asyncio.ensure_future(self.read(reader))
+
+    async def read(self, reader):
+        # Every message, whole or not, has the second hand in it; that's
+        # enough to count them without parsing anything.
+        tail = b''
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                return
+            data = tail + data
+            self.messages += data.count(b'"second":')
+            tail = data[-8:]
+
+    def close(self):
+        self.task.cancel()
+        self.writer.close()
+
+def cpu_time(pid):
+    """
+    Return the user and system CPU time used by a process, in seconds.
+    """
+    with open('/proc/{0}/stat'.format(pid)) as f:
+        fields = f.read().rpartition(')')[2].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+async def measure(server, port, clients, counts, ticks, tick):
+    results = []
+    for n in counts:
+        while len(clients) < n:
+            batch = [
+                Client(port, (len(clients) + i) % 2)
+                for i in range(min(100, n - len(clients)))
+            ]
+            await asyncio.gather(*( c.connect() for c in batch ))
+            clients.extend(batch)
+
+        # Let the connections settle before measuring.
+        await asyncio.sleep(2 * tick)
+        before = sum( c.messages for c in clients )
+        cpu0, t0 = cpu_time(server.pid), time.monotonic()
+        await asyncio.sleep(ticks * tick)
+        cpu1, t1 = cpu_time(server.pid), time.monotonic()
+        received = sum( c.messages for c in clients ) - before
+
+        ticked = (t1 - t0) / tick
+        ms = (cpu1 - cpu0) * 1000 / ticked
+        results.append((n, ms, received / ticked))
+        print('{0:8d} {1:12.3f} {2:12.1f} {3:14}'.format(
+            n, ms, received / ticked,
+            '{0:.1f}'.format(ms * 1000 / n) if n else '-'
+        ), flush=True)
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure the server's CPU time as clients connect."
+    )
+    parser.add_argument(
+        '--clients', type=int, nargs='+', default=[0, 100, 1000, 3000],
+        metavar='N', help="numbers of clients (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--ticks', type=int, default=20,
+        help="ticks to measure for each number (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--time-scale', type=float, default=10,
+        help="run the server's clock this much faster than real time, "
+             "so that it ticks this many times a second "
+             "(default: %(default)s)"
+    )
+    parser.add_argument(
+        '--port', type=int, default=0,
+        help="port for the server (default: any free one)"
+    )
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Each client is a file descriptor here and another in the server.
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = max(args.clients) + 64
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+
+    port = args.port
+    if not port:
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+
+    server = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, 'server.py'),
+        '--server-host', '127.0.0.1', '--server-port', str(port),
+        '--time-scale', str(args.time_scale)
+    ], cwd=ROOT, stderr=subprocess.DEVNULL)
+    try:
+        # Wait for it to start listening.
+        for i in range(300):
+            try:
+                socket.create_connection(('127.0.0.1', port)).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        print('{0:>8} {1:>12} {2:>12} {3:>14}'.format(
+            'clients', 'cpu ms/tick', 'msgs/tick', 'cpu us/client'
+        ))
+        clients = []
+        asyncio.run(measure(
+            server, port, clients, sorted(args.clients),
+            args.ticks, 1 / args.time_scale
+        ))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == '__main__':
+    main()
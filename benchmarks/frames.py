@@ -0,0 +1,413 @@
+# vi: set ts=4 et fileencoding=utf-8 ff=unix:
+############################################################################
+#                                                                          #
+# Copyright © 2016 Julian R Yon <julian@julianyon.net>                     #
+#                                                                          #
+# This program is free software: you can redistribute it and/or modify it  #
+# under the terms of the GNU General Public License as published by the    #
+# Free Software Foundation, either version 3 of the License, or (at your   #
+# option) any later version.                                               #
+#                                                                          #
+# This program is distributed in the hope that it will be useful, but      #
+# WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General #
+# Public License for more details.                                         #
+#                                                                          #
+# You should have received a copy of the GNU General Public License along  #
+# with this program. If not, see <http://www.gnu.org/licenses/>.           #
+#                                                                          #
+############################################################################
+
+"""
+End-to-end frame benchmark. Builds the whole BKClock widget tree in a
+window (offscreen by default), then drives it from a simulated clock as
+fast as it will go, drawing every frame, for each of a set of scenarios.
+
+For each scenario it reports the frame rate, percentiles of the time
+taken per frame, the memory allocated per frame and the number of times
+per frame text is uploaded to a texture, however it was rendered. The
+results can be saved as JSON, and compared against an earlier run.
+
+Run it from anywhere, e.g.:
+
+    python3 benchmarks/frames.py -n 300 -o before.json
+    python3 benchmarks/frames.py -n 300 --set glyph_atlas=True \\
+        --compare before.json
+"""
+
+import argparse
+import ast
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import cycle
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# A steady-state time which keeps well away from any rollover.
+START = datetime(2016, 3, 23, 10, 10, 10)
+
+WINDOW_SIZES = ((800, 600), (1024, 768), (640, 480), (1280, 720), (480, 800))
+
+############################################################################
+
+class Bench:
+    """
+    Drives the clock one frame at a time and measures each frame.
+    """
+    def __init__(self, root, window, event_loop):
+        self.root = root
+        self.window = window
+        self.event_loop = event_loop
+        self.uploads = 0
+
+    def frame(self, action=None):
+        if action is not None:
+            action()
+        self.root.update()
+        self.event_loop.idle()
+
+    def run(self, scenario, frames, warmup):
+        from clockstate import SteppedTime
+        from framestats import AllocationMeter
+
+        step, action = scenario(self)
+        self.root.state.source = SteppedTime(scenario.start, step)
+
+        for i in range(warmup):
+            self.frame(action)
+
+        # Timing pass.
+        perf_counter = time.perf_counter
+        durations = []
+        self.uploads = 0
+        t_start = perf_counter()
+        for i in range(frames):
+            t0 = perf_counter()
+            self.frame(action)
+            durations.append(perf_counter() - t0)
+        elapsed = perf_counter() - t_start
+        uploads = self.uploads
+
+        # Allocation pass, carrying on from where the timing pass left
+        # off, since tracing distorts the timings.
+        meter = AllocationMeter()
+        alloc_bytes = []
+        retained = []
+        meter.start()
+        try:
+            for i in range(frames):
+                meter.begin()
+                self.frame(action)
+                b, n = meter.end()
+                alloc_bytes.append(b)
+                retained.append(n)
+        finally:
+            meter.stop()
+
+        durations.sort()
+        return {
+            'frames': frames,
+            'fps': round(frames / elapsed, 1),
+            'latency_ms': dict(
+                [ ('p{0}'.format(p), round(percentile(durations, p) * 1000, 3))
+                  for p in (50, 90, 99) ]
+                + [ ('max', round(durations[-1] * 1000, 3)) ]
+            ),
+            'alloc_bytes_per_frame': {
+                'mean': round(sum(alloc_bytes) / frames),
+                'max': max(alloc_bytes),
+            },
+            'retained_bytes_per_frame': round(sum(retained) / frames, 1),
+            'texture_uploads_per_frame': round(uploads / frames, 3),
+        }
+
+    def count_uploads(self, label_class, cache_class, cached_label_class):
+        """
+        Count every upload of text to a texture. That's text rendered by
+        a core label into its texture (for a Label widget, the TextPool
+        or the GlyphAtlas), text loaded from the texture cache, and text
+        rendered by the text worker, which is uploaded once it's ready.
+        Kivy's Texture can't be patched, so these are counted where they
+        happen instead.
+        """
+        bench = self
+        fill = label_class._texture_fill
+        load = cache_class.load
+        prerendered = cached_label_class.prerendered
+
+        def counted_fill(label, *args, **kwargs):
+            bench.uploads += 1
+            return fill(label, *args, **kwargs)
+
+        def counted_load(cache, *args, **kwargs):
+            bitmap = load(cache, *args, **kwargs)
+            if bitmap is not None:
+                bench.uploads += 1
+            return bitmap
+
+        def counted_prerendered(label, *args, **kwargs):
+            ahead = label._ahead
+            result = prerendered(label, *args, **kwargs)
+            if label._ahead is not None and label._ahead is not ahead:
+                bench.uploads += 1
+            return result
+
+        label_class._texture_fill = counted_fill
+        cache_class.load = counted_load
+        cached_label_class.prerendered = counted_prerendered
+
+def percentile(ordered, p):
+    """
+    Return the p-th percentile of a sorted list, by the nearest rank.
+    """
+    i = max(0, min(len(ordered) - 1, round(len(ordered) * p / 100) - 1))
+    return ordered[i]
+
+############################################################################
+
+# Each scenario is called with the bench before it runs, and returns the
+# time step per frame and an optional action to perform before each frame.
+# Its docstring describes it in the --list output.
+
+def scenario(start):
+    def decorate(fn):
+        fn.start = start
+        SCENARIOS[fn.__name__] = fn
+        return fn
+    return decorate
+
+SCENARIOS = {}
+
+@scenario(START)
+def steady(bench):
+    """
+    Sweeping hands at the configured frame rate, mostly within a second.
+    """
+    from main import config
+    return 1 / config['frame_rate'], None
+
+@scenario(START)
+def second_rollover(bench):
+    """
+    Every frame moves on a second.
+    """
+    return 1, None
+
+@scenario(START)
+def minute_rollover(bench):
+    """
+    Every frame moves on a minute, which updates the word clock and the
+    digital clocks.
+    """
+    return 60, None
+
+@scenario(datetime(2016, 12, 31, 23, 59, 59))
+def day_rollover(bench):
+    """
+    Every frame moves on a day, starting at the end of a year, which
+    updates every display including the date.
+    """
+    return timedelta(days=1), None
+
+@scenario(START)
+def resize_storm(bench):
+    """
+    The window changes size on every frame.
+    """
+    sizes = cycle(WINDOW_SIZES)
+    window = bench.window
+
+    def resize():
+        window.size = next(sizes)
+
+    return 1 / 30, resize
+
+@scenario(START)
+def roman_flip(bench):
+    """
+    Flips an hour label between decimal and Roman numerals on every
+    frame, as in a (very fast) flip sequence.
+    """
+    face = bench.root.clock_face
+
+    def flip():
+        face.flip_next_hour_label()
+        face._flip_event.cancel()
+
+    return 1 / 30, flip
+
+############################################################################
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark whole frames of the clock."
+    )
+    parser.add_argument(
+        'scenarios', nargs='*', metavar='SCENARIO',
+        help="scenarios to run (default: all)"
+    )
+    parser.add_argument(
+        '-n', '--frames', type=int, default=300,
+        help="frames to measure per scenario (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--warmup', type=int, default=30,
+        help="frames to run before measuring (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--size', default='800x600', metavar='WxH',
+        help="window size (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--set', action='append', default=[], metavar='KEY=VALUE',
+        help="override a config entry, e.g. glyph_atlas=True"
+    )
+    parser.add_argument(
+        '--visible', action='store_true',
+        help="use a real window rather than an offscreen one"
+    )
+    parser.add_argument(
+        '-o', '--output', metavar='FILE', help="save the results as JSON"
+    )
+    parser.add_argument(
+        '--compare', metavar='FILE',
+        help="compare the results with an earlier run"
+    )
+    parser.add_argument(
+        '--list', action='store_true', help="list the scenarios"
+    )
+    return parser.parse_args(argv)
+
+def parse_overrides(items):
+    """
+    Turn a list of KEY=VALUE strings into a dict of config overrides.
+    Values are Python literals, or else taken as strings.
+    """
+    overrides = {}
+    for item in items:
+        key, _, value = item.partition('=')
+        try:
+            overrides[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            overrides[key] = value
+    return overrides
+
+def build(size='800x600', visible=False, overrides=None):
+    """
+    Set up Kivy and build the clock in a window of the given size,
+    stopped so that only we move it on. Returns a Bench.
+    """
+    # The kv file and config refer to the fonts by relative paths.
+    os.chdir(ROOT)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+    if not visible:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'offscreen')
+    os.environ['KIVY_NO_ARGS'] = '1'
+
+    # Kivy mustn't wait between frames, and the window size must be set
+    # before the window is created.
+    from kivy.config import Config
+    width, height = size.split('x')
+    Config.set('graphics', 'maxfps', '0')
+    Config.set('graphics', 'vsync', '0')
+    Config.set('graphics', 'width', width)
+    Config.set('graphics', 'height', height)
+
+    from kivy.base import EventLoop
+    from kivy.clock import Clock
+    from kivy.core.text import LabelBase
+    from kivy.core.window import Window
+    from kivy.lang import Builder
+
+    import main
+    from texturecache import TextureCache
+    main.config.update(overrides or {})
+
+    Builder.load_file('bkclock.kv')
+    root = main.BKClock()
+    root.build_deferred()
+    root.scheduler.stop()
+    Clock.unschedule(root.clock_face.flip_hour_labels)
+    Window.add_widget(root)
+    EventLoop.ensure_window()
+
+    bench = Bench(root, Window, EventLoop)
+    bench.count_uploads(LabelBase, TextureCache, main.CachedLabel)
+    return bench
+
+def compare(old, new):
+    """
+    Print a comparison of two sets of results.
+    """
+    print()
+    print('{0:16} {1:^17} {2:^21} {3:^17}'.format(
+        '', 'fps', 'p99 ms', 'alloc bytes'
+    ))
+    for name, n in new['scenarios'].items():
+        o = old['scenarios'].get(name)
+        if o is None:
+            continue
+        row = '{0:16} {1:>7} → {2:<7} {3:>9} → {4:<9} {5:>7} → {6:<7}'
+        print(row.format(
+            name, o['fps'], n['fps'],
+            o['latency_ms']['p99'], n['latency_ms']['p99'],
+            o['alloc_bytes_per_frame']['mean'],
+            n['alloc_bytes_per_frame']['mean'],
+        ))
+
+def run(argv=None):
+    args = parse_args(argv)
+
+    if args.list:
+        for name, fn in SCENARIOS.items():
+            print('{0:16} {1}'.format(name, ' '.join(fn.__doc__.split())))
+        return
+
+    names = args.scenarios or list(SCENARIOS)
+    for name in names:
+        if name not in SCENARIOS:
+            sys.exit("Unknown scenario: {0}".format(name))
+
+    overrides = parse_overrides(args.set)
+    bench = build(args.size, args.visible, overrides)
+
+    import kivy
+    import main as bkclock
+    results = {
+        'date': datetime.now().strftime('%Y-%m-%dT%H:%M:%S'),
+        'bkclock': bkclock.__version__,
+        'python': platform.python_version(),
+        'kivy': kivy.__version__,
+        'machine': platform.machine(),
+        'size': args.size,
+        'config': overrides,
+        'scenarios': {},
+    }
+    for name in names:
+        r = bench.run(SCENARIOS[name], args.frames, args.warmup)
+        results['scenarios'][name] = r
+        print('{0:16} {1:7.1f} fps  p50/p90/p99/max {2} ms  '
+              '{3} B/frame  {4} uploads/frame'.format(
+            name, r['fps'],
+            '/'.join(map(str, r['latency_ms'].values())),
+            r['alloc_bytes_per_frame']['mean'],
+            r['texture_uploads_per_frame']
+        ))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), results)
+
+if __name__ == '__main__':
+    run()
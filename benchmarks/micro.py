@@ -0,0 +1,298 @@
+# vi: set ts=4 et fileencoding=utf-8 ff=unix:
+############################################################################
+#                                                                          #
+# Copyright © 2016 Julian R Yon <julian@julianyon.net>                     #
+#                                                                          #
+# This program is free software: you can redistribute it and/or modify it  #
+# under the terms of the GNU General Public License as published by the    #
+# Free Software Foundation, either version 3 of the License, or (at your   #
+# option) any later version.                                               #
+#                                                                          #
+# This program is distributed in the hope that it will be useful, but      #
+# WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General #
+# Public License for more details.                                         #
+#                                                                          #
+# You should have received a copy of the GNU General Public License along  #
+# with this program. If not, see <http://www.gnu.org/licenses/>.           #
+#                                                                          #
+############################################################################
+
+"""
+Microbenchmarks for the functions which run on every frame (or every
+second, or minute), and for building the tables of texts.
+
+Each benchmark calls one function over its whole domain: every second of
+the day for the digital clocks and hands, every minute for the word clock
+and every day of a (leap) year for the date. It reports the time per call
+in nanoseconds and the memory allocated per call. The widgets are built
+as for the clock itself (see frames.py), but nothing is drawn; frames.py
+measures the rendering.
+
+    python3 benchmarks/micro.py -o before.json
+    python3 benchmarks/micro.py --compare before.json word_clock
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import frames
+
+# The domains: every second of the day, every minute of the day, and
+# every day of a leap year.
+SECONDS = [
+    (h, m, s) for h in range(24) for m in range(60) for s in range(60)
+]
+MINUTES = [ (h, m) for h in range(24) for m in range(60) ]
+DAYS = [ date(2016, 1, 1) + timedelta(days=i) for i in range(366) ]
+
+############################################################################
+
+class Micro:
+    """
+    A function to be called once with each of a list of argument tuples.
+    The optional `setup` is called before each pass over the list.
+    """
+    def __init__(self, name, fn, args, setup=None):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.setup = setup
+
+    def time(self, repeat):
+        """
+        Return the best time per call over `repeat` passes, in ns.
+        """
+        fn, args, setup = self.fn, self.args, self.setup
+        perf_counter_ns = time.perf_counter_ns
+        best = None
+        for i in range(repeat):
+            if setup is not None:
+                setup()
+            t0 = perf_counter_ns()
+            for a in args:
+                fn(*a)
+            t = perf_counter_ns() - t0
+            if best is None or t < best:
+                best = t
+        return best / len(args)
+
+    def allocations(self):
+        """
+        Return the mean peak bytes allocated and the mean net bytes
+        kept per call, over one pass.
+        """
+        from framestats import AllocationMeter
+
+        fn, args = self.fn, self.args
+        if self.setup is not None:
+            self.setup()
+        meter = AllocationMeter()
+        total_bytes = total_retained = 0
+        meter.start()
+        try:
+            for a in args:
+                meter.begin()
+                fn(*a)
+                b, n = meter.end()
+                total_bytes += b
+                total_retained += n
+        finally:
+            meter.stop()
+        return total_bytes / len(args), total_retained / len(args)
+
+def micros(root):
+    """
+    Return the list of benchmarks, for the widgets in the tree `root`.
+    """
+    import main
+    from main import (
+        _c, _c_H, _num_strings, DigitalTime24, DigitalTime12,
+        WordClock, DateDisplay, ClockHand, HourLabel
+    )
+
+    face = root.clock_face
+    d24, d12 = root.digital_24, root.digital_12
+    word, date_display = root.word_clock, root.date_display
+
+    keys = sorted(main._colors_h)
+    rim = ClockHand.rim_texts
+    c_args = [
+        (keys[i % len(keys)], rim[i % 60]) for i in range(len(SECONDS))
+    ]
+
+    def hand_args(hand, value):
+        return [ (hand, -value(h, m, s) * hand.unit_angle)
+                 for h, m, s in SECONDS ]
+
+    def clear_word_cache():
+        word._texts = None
+
+    def fill_word_cache():
+        for h, m in MINUTES:
+            word.update(h, m)
+
+    b = []
+    b.append(Micro('_c', _c, c_args))
+    b.append(Micro('_c_H', _c_H, [ (a[1],) for a in c_args ]))
+
+    for name, w, cls in ('digital_24', d24, DigitalTime24), \
+            ('digital_12', d12, DigitalTime12):
+        args = [ (w, h, m, s) for h, m, s in SECONDS ]
+        b.append(Micro(name + '.format_time', cls.format_time, args))
+        b.append(Micro(name + '.cells', cls.cells, args))
+        b.append(Micro(name + '.update', cls.update, args))
+
+    args = [ (word, h, m) for h, m in MINUTES ]
+    b.append(Micro('word_clock.format_time', WordClock.format_time, args))
+    b.append(Micro(
+        'word_clock.update (cold)', WordClock.update, args, clear_word_cache
+    ))
+    b.append(Micro(
+        'word_clock.update (warm)', WordClock.update, args, fill_word_cache
+    ))
+
+    b.append(Micro('date_display.text_for', DateDisplay.text_for, [
+        (d.year, d.month, d.day, date_display.font_size) for d in DAYS
+    ]))
+
+    b.append(Micro('hour_hand.points', ClockHand.points, hand_args(
+        face.hour_hand, lambda h, m, s: h % 24 + m/60 + s/3600
+    )))
+    b.append(Micro('minute_hand.points', ClockHand.points, hand_args(
+        face.minute_hand, lambda h, m, s: m + s/60
+    )))
+    b.append(Micro('second_hand.points', ClockHand.points, hand_args(
+        face.second_hand, lambda h, m, s: s
+    )))
+
+    # The offset is kept until the hour or the radius changes, which it
+    # only does on a resize, so forget it to time working it out.
+    def pos_offset_cold(label):
+        label._hour = None
+        return label.pos_offset()
+
+    labels = face.hour_labels
+    label_args = [ (labels[i % 12],) for i in range(len(SECONDS)) ]
+    b.append(Micro(
+        'hour_label.pos_offset (cold)', pos_offset_cold, label_args
+    ))
+    b.append(Micro(
+        'hour_label.pos_offset (warm)', HourLabel.pos_offset, label_args
+    ))
+
+    # The tables are built once at startup, so there's no domain as such;
+    # just build them enough times to get a stable figure.
+    once = [ () ] * 100
+    b.append(Micro('table num_strings', _num_strings, once))
+    b.append(Micro('table time_strings', WordClock._time_strings, once))
+    b.append(Micro(
+        'table alt_time_strings', WordClock._alt_time_strings, once
+    ))
+    b.append(Micro('table ampm_table', WordClock._ampm_table, [
+        (WordClock._ampm_strings(),)
+    ] * 100))
+
+    return b
+
+############################################################################
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the per-frame functions of the clock."
+    )
+    parser.add_argument(
+        'names', nargs='*', metavar='NAME',
+        help="run only benchmarks whose names start with these"
+    )
+    parser.add_argument(
+        '-r', '--repeat', type=int, default=3,
+        help="passes to take the best time of (default: %(default)s)"
+    )
+    parser.add_argument(
+        '--no-alloc', action='store_true',
+        help="skip measuring allocations, which is slow"
+    )
+    parser.add_argument(
+        '--set', action='append', default=[], metavar='KEY=VALUE',
+        help="override a config entry, e.g. glyph_atlas=True"
+    )
+    parser.add_argument(
+        '-o', '--output', metavar='FILE', help="save the results as JSON"
+    )
+    parser.add_argument(
+        '--compare', metavar='FILE',
+        help="compare the results with an earlier run"
+    )
+    return parser.parse_args(argv)
+
+def compare(old, new):
+    """
+    Print a comparison of two sets of results.
+    """
+    print()
+    print('{0:28} {1:^23} {2:^21}'.format('', 'ns/call', 'bytes/call'))
+    for name, n in new['micro'].items():
+        o = old['micro'].get(name)
+        if o is None:
+            continue
+        print('{0:28} {1:>9} → {2:<9} {3:>8} → {4:<8}'.format(
+            name, o['ns_per_call'], n['ns_per_call'],
+            o.get('alloc_bytes_per_call', '-'),
+            n.get('alloc_bytes_per_call', '-')
+        ))
+
+def run(argv=None):
+    args = parse_args(argv)
+    overrides = frames.parse_overrides(args.set)
+    bench = frames.build(overrides=overrides)
+
+    import kivy
+    import main
+    results = {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'bkclock': main.__version__,
+        'python': platform.python_version(),
+        'kivy': kivy.__version__,
+        'machine': platform.machine(),
+        'config': overrides,
+        'micro': {},
+    }
+
+    print('{0:28} {1:>7} {2:>11} {3:>10} {4:>11}'.format(
+        '', 'calls', 'ns/call', 'bytes/call', 'kept/call'
+    ))
+    for m in micros(bench.root):
+        if args.names and not any(m.name.startswith(n) for n in args.names):
+            continue
+        r = results['micro'][m.name] = {
+            'calls': len(m.args),
+            'ns_per_call': round(m.time(args.repeat)),
+        }
+        if not args.no_alloc:
+            alloc_bytes, retained = m.allocations()
+            r['alloc_bytes_per_call'] = round(alloc_bytes, 1)
+            r['retained_bytes_per_call'] = round(retained, 1)
+        print('{0:28} {1:7} {2:11} {3:>10} {4:>11}'.format(
+            m.name, r['calls'], r['ns_per_call'],
+            r.get('alloc_bytes_per_call', '-'),
+            r.get('retained_bytes_per_call', '-')
+        ))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(json.load(f), results)
+
+if __name__ == '__main__':
+    run()
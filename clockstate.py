@@ -0,0 +1,460 @@
+# vi: set ts=4 et fileencoding=utf-8 ff=unix:
+############################################################################
+#                                                                          #
+# Copyright © 2016 Julian R Yon <julian@julianyon.net>                     #
+#                                                                          #
+# This program is free software: you can redistribute it and/or modify it  #
+# under the terms of the GNU General Public License as published by the    #
+# Free Software Foundation, either version 3 of the License, or (at your   #
+# option) any later version.                                               #
+#                                                                          #
+# This program is distributed in the hope that it will be useful, but      #
+# WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General #
+# Public License for more details.                                         #
+#                                                                          #
+# You should have received a copy of the GNU General Public License along  #
+# with this program. If not, see <http://www.gnu.org/licenses/>.           #
+#                                                                          #
+############################################################################
+
+"""
+The wall-clock time model shared by all of the displays, and the time
+sources which drive it.
+
+This module deliberately doesn't import Kivy, so that it can be used
+(and poked at) without a window.
+"""
+
+from datetime import datetime, timedelta
+import math
+import time
+
+############################################################################
+
+# Granularities a display can subscribe to. They are bit flags so that a
+# display interested in more than one can simply OR them together.
+SUBSECOND = 1
+SECOND    = 2
+MINUTE    = 4
+HOUR      = 8
+DAY       = 16
+BLINK     = 32
+
+ALL = SUBSECOND | SECOND | MINUTE | HOUR | DAY | BLINK
+
+# A change to any unit implies a change to every finer one, even if the
+# finer value happens to be numerically the same (e.g. after a jump of
+# exactly one minute).
+_DAY_CHANGED    = DAY | HOUR | MINUTE | SECOND | SUBSECOND
+_HOUR_CHANGED   = HOUR | MINUTE | SECOND | SUBSECOND
+_MINUTE_CHANGED = MINUTE | SECOND | SUBSECOND
+_SECOND_CHANGED = SECOND | SUBSECOND
+
+class ClockState:
+    """
+    Works out the wall-clock state once per tick, and tells each
+    subscriber only about the units of time which have changed since the
+    last tick.
+
+    Subscribers are called with the state object itself, in the order in
+    which they subscribed, and at most once per tick. The `changed`
+    attribute holds the mask of granularities that changed, for the
+    benefit of subscribers interested in more than one. The part of the
+    current second which has passed is held in `fraction`, as a float.
+
+    Within a second, a tick from a time source with timestamps doesn't
+    allocate any objects at all (apart from floats, which Python keeps
+    on a free list), so that steady frames leave nothing for the garbage
+    collector.
+    """
+    __slots__ = (
+        'year', 'month', 'day', 'hour', 'minute', 'second',
+        'fraction', 'blink', 'changed', 'source', '_subscribers',
+        '_second_start', '_second_end'
+    )
+
+    def __init__(self, source=None):
+        self.source = source if source is not None else RealTime()
+        self.year = self.month = self.day = None
+        self.hour = self.minute = self.second = None
+        self.fraction = self.blink = None
+        self.changed = 0
+        self._subscribers = []
+
+        # The span of source timestamps within the current second.
+        self._second_start = self._second_end = 0.0
+
+    def subscribe(self, callback, granularity):
+        """
+        Arrange for `callback` to be called whenever any of the units in
+        the `granularity` mask change.
+        """
+        self._subscribers.append((callback, granularity))
+
+    def unsubscribe(self, callback):
+        """
+        Remove all subscriptions for `callback`.
+        """
+        self._subscribers = [
+            (cb, g) for cb, g in self._subscribers if cb != callback
+        ]
+
+    def tick(self, now=None):
+        """
+        Read the time from the time source (or take the supplied
+        datetime) and notify the subscribers whose units have changed.
+        Returns the mask of changed granularities.
+        """
+        if now is None:
+            t = self.source.timestamp()
+            if t is None:
+                now = self.source.now()
+            elif self._second_start <= t < self._second_end:
+                # Still within the same second, so only the fraction can
+                # have changed and there's no need for a datetime.
+                fraction = t - self._second_start
+                if fraction == self.fraction:
+                    self.changed = 0
+                    return 0
+                self.fraction = fraction
+                self.changed = SUBSECOND
+                self._notify(SUBSECOND)
+                return SUBSECOND
+            else:
+                now = self.source.fromtimestamp(t)
+                start = math.floor(t)
+                self._second_start = float(start)
+                self._second_end = float(start + 1)
+        else:
+            self._second_start = self._second_end = 0.0
+
+        fraction = now.microsecond / 1000000
+
+        # Work from the coarsest unit down so that we can stop comparing
+        # as soon as we find a difference.
+        if (now.day != self.day or now.month != self.month
+                or now.year != self.year):
+            changed = _DAY_CHANGED
+        elif now.hour != self.hour:
+            changed = _HOUR_CHANGED
+        elif now.minute != self.minute:
+            changed = _MINUTE_CHANGED
+        elif now.second != self.second:
+            changed = _SECOND_CHANGED
+        elif fraction != self.fraction:
+            changed = SUBSECOND
+        else:
+            changed = 0
+
+        if changed & DAY:
+            self.year, self.month, self.day = now.year, now.month, now.day
+        if changed & HOUR:
+            self.hour = now.hour
+        if changed & MINUTE:
+            self.minute = now.minute
+        if changed & SECOND:
+            self.second = now.second
+            blink = self.second % 2
+            if blink != self.blink:
+                self.blink = blink
+                changed |= BLINK
+        self.fraction = fraction
+
+        self.changed = changed
+        if changed:
+            self._notify(changed)
+        return changed
+
+    def refresh(self):
+        """
+        Call every subscriber as though everything had changed, e.g.
+        after the displays have been rebuilt.
+        """
+        if self.day is not None:
+            self.changed = ALL
+            self._notify(ALL)
+
+    def _notify(self, changed):
+        # Indexing rather than iterating, since even an iterator is an
+        # allocation and this happens on every frame.
+        subscribers = self._subscribers
+        i, n = 0, len(subscribers)
+        while i < n:
+            callback, granularity = subscribers[i]
+            if granularity & changed:
+                callback(self)
+            i += 1
+
+    @property
+    def microsecond(self):
+        return int(self.fraction * 1000000)
+
+    @property
+    def minute_of_day(self):
+        return self.hour*60 + self.minute
+
+    def __repr__(self):
+        if self.day is None:
+            return "<ClockState (not ticked)>"
+        return "<ClockState {0}-{1:02d}-{2:02d} {3:02d}:{4:02d}:{5:02d}>".format(
+            self.year, self.month, self.day,
+            self.hour, self.minute, self.second
+        )
+
+############################################################################
+
+class TimeSource:
+    """
+    Base class for time sources. A time source has a now() method which
+    returns a datetime, and a `rate` attribute saying how many of its
+    seconds pass per real second. The rate is None for sources whose
+    readings are scripted rather than following the real clock.
+
+    Sources which follow the real clock can also give their readings as
+    a float timestamp(), on a scale whose whole numbers fall on the
+    source's second boundaries, and convert one to a datetime with
+    fromtimestamp(). That's cheaper than building a datetime on every
+    frame. Sources which can't return None from timestamp().
+    """
+    rate = 1
+
+    def now(self):
+        raise NotImplementedError(
+            "You must implement this method in a subclass."
+        )
+
+    def timestamp(self):
+        return None
+
+    def fromtimestamp(self, t):
+        raise NotImplementedError(
+            "This time source doesn't have timestamps."
+        )
+
+class RealTime(TimeSource):
+    """
+    The local time, as normal.
+    """
+    def now(self):
+        return datetime.now()
+
+    def timestamp(self):
+        return time.time()
+
+    def fromtimestamp(self, t):
+        return datetime.fromtimestamp(t)
+
+class OffsetTime(TimeSource):
+    """
+    The local time plus a fixed offset, which may be given as a
+    timedelta or a number of seconds.
+    """
+    def __init__(self, offset):
+        if not isinstance(offset, timedelta):
+            offset = timedelta(seconds=offset)
+        self.offset = offset
+        self._seconds = offset.total_seconds()
+
+    def now(self):
+        return datetime.now() + self.offset
+
+    def timestamp(self):
+        return time.time() + self._seconds
+
+    def fromtimestamp(self, t):
+        return datetime.fromtimestamp(t - self._seconds) + self.offset
+
+class ScaledTime(TimeSource):
+    """
+    Time which passes `scale` times faster than real time (or slower, if
+    scale is less than one), starting from `start` or the current time.
+    """
+    def __init__(self, scale, start=None):
+        self.rate = scale
+        self.start = start if start is not None else datetime.now()
+        self._t0 = time.monotonic()
+
+        # Timestamps count seconds from the start of its second.
+        self._base = self.start.replace(microsecond=0)
+        self._offset = self.start.microsecond / 1000000
+
+    def now(self):
+        elapsed = (time.monotonic() - self._t0) * self.rate
+        return self.start + timedelta(seconds=elapsed)
+
+    def timestamp(self):
+        return self._offset + (time.monotonic() - self._t0) * self.rate
+
+    def fromtimestamp(self, t):
+        return self._base + timedelta(seconds=t)
+
+class SteppedTime(TimeSource):
+    """
+    Time which moves on by a fixed `step` (a timedelta or a number of
+    seconds) each time it is read, regardless of how much real time has
+    passed. This makes fast-forwarding deterministic: stepping by one
+    second from midnight, 86400 readings cover the whole day.
+    """
+    rate = None
+
+    def __init__(self, start, step=1):
+        if not isinstance(step, timedelta):
+            step = timedelta(seconds=step)
+        self.step = step
+        self._next = start
+
+    def now(self):
+        now = self._next
+        self._next = now + self.step
+        return now
+
+class ReplayTime(TimeSource):
+    """
+    Plays back a scripted sequence of datetimes, one per reading. Once
+    the script runs out the last time is held.
+    """
+    rate = None
+
+    def __init__(self, times):
+        self._times = iter(times)
+        self._last = None
+
+    def now(self):
+        self._last = next(self._times, self._last)
+        if self._last is None:
+            raise ValueError("Replay script is empty.")
+        return self._last
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Load a script from a file with one time per line, in the form
+        YYYY-MM-DD HH:MM:SS (optionally followed by .ffffff). Blank
+        lines and lines starting with # are ignored.
+        """
+        return cls(read_times(path))
+
+class SharedTime(TimeSource):
+    """
+    Reads another time source once per frame, so that several clocks can
+    share the reading (see ZonedTime). Until the next read(), every call
+    returns the same time.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.rate = source.rate
+        self._t = None
+        self._now = None
+
+    def read(self):
+        """
+        Take a new reading from the source.
+        """
+        self._t = self.source.timestamp()
+        self._now = self.source.now() if self._t is None else None
+
+    def now(self):
+        if self._now is None:
+            return self.source.fromtimestamp(self._t)
+        return self._now
+
+    def timestamp(self):
+        return self._t
+
+    def fromtimestamp(self, t):
+        return self.source.fromtimestamp(t)
+
+class ZonedTime(TimeSource):
+    """
+    The time of a SharedTime in another time zone: `zone` is a tzinfo
+    (e.g. a zoneinfo.ZoneInfo, which follows daylight saving time), or a
+    fixed number of hours ahead of the local time. Timestamps are passed
+    through unchanged, since zones differ by whole minutes and so agree
+    on where the seconds fall.
+    """
+    def __init__(self, shared, zone):
+        self.shared = shared
+        self.rate = shared.rate
+        if isinstance(zone, (int, float)):
+            self.zone, self.offset = None, timedelta(hours=zone)
+        else:
+            self.zone, self.offset = zone, None
+
+    def convert(self, local):
+        """
+        Return a naive local datetime as the time in the zone.
+        """
+        if self.zone is None:
+            return local + self.offset
+        return local.astimezone(self.zone).replace(tzinfo=None)
+
+    def now(self):
+        return self.convert(self.shared.now())
+
+    def timestamp(self):
+        return self.shared.timestamp()
+
+    def fromtimestamp(self, t):
+        return self.convert(self.shared.fromtimestamp(t))
+
+def read_times(path):
+    """
+    Return the list of datetimes in a file with one time per line, as
+    for ReplayTime.from_file().
+    """
+    with open(path, encoding='utf-8') as f:
+        lines = [ l.strip() for l in f ]
+    return [ parse_time(l) for l in lines if l and not l.startswith('#') ]
+
+def parse_time(text):
+    """
+    Parse a time in the form YYYY-MM-DD HH:MM:SS, with optional
+    microseconds. A T is also accepted in place of the space.
+    """
+    text = text.replace('T', ' ')
+    fmt = '%Y-%m-%d %H:%M:%S.%f' if '.' in text else '%Y-%m-%d %H:%M:%S'
+    return datetime.strptime(text, fmt)
+
+def frame_delay(source, mode='sweep', rate=30, margin=0.002):
+    """
+    Return how long to wait, in real seconds, before drawing the next
+    frame in a loop of our own rather than Kivy's: until just after the
+    time source's next whole second in 'tick' mode, and no longer than
+    a frame at `rate` in 'sweep' mode, as FrameScheduler does. For time
+    sources which don't follow the real clock it's just a frame (or a
+    second in tick mode).
+    """
+    interval = 1 / rate
+    if not source.rate:
+        return interval if mode == 'sweep' else 1
+    t = source.timestamp()
+    if t is not None:
+        fraction = t % 1
+    else:
+        fraction = source.now().microsecond / 1000000
+    delay = (1 - fraction) / source.rate + margin
+    return min(delay, interval) if mode == 'sweep' else delay
+
+def make_time_source(offset=0, scale=1, start=None, step=None, replay=None):
+    """
+    Build a time source from configuration values. A replay script takes
+    precedence over stepped time, which takes precedence over scaled
+    time. An offset applies to the starting point of stepped and scaled
+    time if no explicit start is given.
+    """
+    if replay is not None:
+        return ReplayTime.from_file(replay)
+
+    if isinstance(start, str):
+        start = parse_time(start)
+    elif start is None and (step is not None or scale != 1):
+        start = datetime.now() + timedelta(seconds=offset)
+
+    if step is not None:
+        return SteppedTime(start, step)
+    if scale != 1 or start is not None:
+        return ScaledTime(scale, start)
+    if offset:
+        return OffsetTime(offset)
+    return RealTime()
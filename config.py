@@ -58,3 +58,191 @@ roman_numerals = 'ⅠⅡⅢⅣⅤⅥⅦⅧⅨⅩⅪⅫ'
 minus_sign = '−'
 em_dash = '—'
 #date_separator = '‐'
+
+############################################################################
+# Rendering options. These trade a little fidelity or memory for less
+# work on slow hardware such as the Pi Zero, and are all off by default.
+
+# Draw the digital displays from a pre-rendered atlas of digits instead
+# of laying out and rasterising text every second. Kerning between the
+# characters is lost, which is unnoticeable with a monospaced font.
+#glyph_atlas = True
+
+# Round the clock hands to whole pixels, as older versions did. This
+# means recalculating their shape in Python on every frame, rather than
+# letting the GPU rotate them.
+#snap_hands = True
+
+# Render the rim and the numbers of the analogue clock into an offscreen
+# buffer, which is only redrawn when the window is resized or a numeral
+# changes. This assumes the default black background.
+#cache_face = True
+
+# How often the clock is redrawn. In 'sweep' mode (the default) it is
+# redrawn frame_rate times a second so that the hour and minute hands
+# move smoothly. In 'tick' mode it is only redrawn once a second, just
+# after the second changes, which uses a lot less power.
+#frame_mode = 'tick'
+#frame_rate = 30
+
+############################################################################
+# Where the time comes from. These are mostly useful for testing and for
+# checking performance, and can also be given on the command line, e.g.
+# "python3 main.py -- --time-scale 60". Normally the clock just shows the
+# local time.
+
+# Show the time this many seconds ahead (or behind, if negative).
+#time_offset = 300
+
+# Run the clock faster (or slower) than real time, optionally starting
+# at a particular time.
+#time_scale = 1000
+#time_start = '2016-03-23 23:59:00'
+
+# Move the clock on by exactly this many seconds every frame, so runs
+# are repeatable.
+#time_step = 1
+
+# Play back a file of times, one per line in the same form as time_start.
+#time_replay = 'times.txt'
+
+############################################################################
+# Timing statistics. If enabled, the time taken by each display on every
+# frame is recorded, along with how late frames are and how many have
+# been dropped. Press S to show or hide them over the clock. They can
+# also be appended to a log file every stats_interval seconds, as one
+# line of name=count/p50/p90/p99/max entries (in microseconds).
+
+#stats = True
+#stats_overlay = True
+#stats_log = 'bkclock-stats.log'
+#stats_interval = 60
+
+############################################################################
+# Memory. Once it has warmed up, the clock shouldn't allocate any memory
+# on a frame where only the sweeping hands move, so that the garbage
+# collector has nothing to do. To check, alloc_debug stops the clock with
+# an error if such a frame allocates more than alloc_budget bytes. Kivy
+# itself needs a few hundred bytes whenever a hand's rotation is updated,
+# which is why the budget isn't zero. This slows everything down a lot.
+#alloc_debug = True
+#alloc_budget = 512
+
+# Don't let the garbage collector run in the middle of a frame. Instead
+# it runs just after the frame for each new second.
+#gc_pause = True
+
+############################################################################
+# Starting up. Only the analogue clock is built before the first frame;
+# the other displays follow straight after it. To see how long each phase
+# takes, set this or run with --profile-startup.
+#profile_startup = True
+
+############################################################################
+# Texture cache. Rendered text (the numerals, rim numbers, digits, words
+# and date) can be kept in a directory as raw bitmaps, so that after a
+# restart, or on resizing back to a size seen before, it's loaded rather
+# than rendered again. The least recently used bitmaps are deleted to
+# keep the directory under texture_cache_size bytes.
+#texture_cache = '~/.cache/bkclock'
+#texture_cache_size = 32 * 1024 * 1024
+
+# Render the next text for the digital clocks, word clock and date in a
+# background thread while the current one is showing, so that when the
+# time comes the new text only has to be swapped in rather than laid out
+# and rendered in the middle of a frame.
+#prerender_text = True
+
+# Draw the word clock and date as separate pieces of text, one for each
+# run of a single colour and size, so that when the text changes only
+# the pieces not seen before have to be rendered. Each piece is another
+# texture to draw, though, which may cost more than it saves on some
+# graphics hardware.
+#segmented_text = True
+
+############################################################################
+# Framebuffer output. Running "python3 fbclock.py" instead of main.py
+# draws the clock straight on a framebuffer device, with no window system
+# and no OpenGL, which suits a kiosk with little memory to spare. Only
+# the parts of the screen which change are redrawn, so frame_mode = 'tick'
+# is much the cheapest. The size and pixel format ('rgba', 'bgra' or
+# 'rgb565') of a device are found out unless they're given here; to try
+# it out, name a plain file as the device and give its size.
+#fb_device = '/dev/fb0'
+#fb_size = (800, 480)
+#fb_format = 'rgb565'
+
+############################################################################
+# Terminal output. Running "python3 termclock.py" shows the clock in a
+# terminal instead, e.g. over SSH, writing only the characters which
+# change from one frame to the next. The analogue clock is drawn with
+# Braille dots unless term_face is 'ascii', for fonts without them. Set
+# term_colors to '256' for terminals without 24-bit colour. The clock
+# fills the terminal, and follows it if it's resized, unless term_size
+# is given as (columns, rows).
+#term_face = 'ascii'
+#term_colors = '256'
+#term_size = (80, 24)
+
+############################################################################
+# Web server. Running "python3 server.py" serves the clock to any number
+# of web browsers on server_port, from one copy of the clock: each second
+# the changes are sent to every browser at once. A browser which falls
+# more than server_buffer bytes behind misses out on the changes until it
+# catches up. By default it listens on every address.
+#server_host = '127.0.0.1'
+#server_port = 8080
+#server_buffer = 65536
+
+############################################################################
+# World clocks. Instead of the usual displays, show a grid of analogue
+# clocks, each with a caption, for different time zones. A zone is either
+# a name from the tz database, which follows daylight saving time, or a
+# number of hours ahead of the local time. The clocks are laid out in
+# roughly as many columns as rows unless world_clock_columns is given.
+#world_clocks = [
+#    ('Here', 0),
+#    ('London', 'Europe/London'),
+#    ('New York', 'America/New_York'),
+#    ('Tokyo', 'Asia/Tokyo'),
+#]
+#world_clock_columns = 2
+
+############################################################################
+# Cues. Things to show at set times of the week, each for a number of
+# minutes: a line of text, which the word clock shows in place of its
+# small line, and/or colours to use in place of those above. Each cue is
+# (days, start time, minutes, text or dict). The days are 'daily',
+# 'weekdays', 'weekends', or names and ranges of days such as 'Sat' or
+# 'Mon-Wed, Fri'. If cues overlap, the text of the one which started
+# last is shown, and its colours take precedence. There can be as many
+# as you like; only the next one due is ever looked at.
+#cues = [
+#    ('weekdays', '08:00', 20, 'School run'),
+#    ('daily', '19:30', 30, {'text': 'Bedtime',
+#                            'colors': {'on': (255, 175, 95)}}),
+#    ('Sat', '09:00', 60, {'colors': {'rim': (255, 215, 0)}}),
+#]
+
+############################################################################
+# Idle periods. Times when nobody is looking at the clock, e.g. overnight,
+# given as for cues above but with nothing to show: (days, start time,
+# minutes). While idle the clock isn't animated; it's dimmed to
+# idle_opacity and only moved on once a minute, or blanked altogether if
+# idle_display is 'blank'. It also goes idle after idle_timeout seconds
+# without a touch or a key press, if that's given. Any input wakes it
+# up, and holds off going idle again for idle_timeout (or a minute).
+#idle = [
+#    ('daily', '00:00', 360),
+#]
+#idle_timeout = 600
+#idle_display = 'blank'
+#idle_opacity = 0.3
+
+############################################################################
+# Changes to the colours, the fonts and the characters above (the Roman
+# numerals, minus sign, em dash and date separator) are shown as soon as
+# this file is saved, without restarting; only what uses them is drawn
+# again. Anything else needs a restart. Set config_watch to False to stop
+# the file being watched.
+#config_watch = False
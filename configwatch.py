@@ -0,0 +1,145 @@
+# vi: set ts=4 et fileencoding=utf-8 ff=unix:
+############################################################################
+#                                                                          #
+# Copyright © 2016 Julian R Yon <julian@julianyon.net>                     #
+#                                                                          #
+# This program is free software: you can redistribute it and/or modify it  #
+# under the terms of the GNU General Public License as published by the    #
+# Free Software Foundation, either version 3 of the License, or (at your   #
+# option) any later version.                                               #
+#                                                                          #
+# This program is distributed in the hope that it will be useful, but      #
+# WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General #
+# Public License for more details.                                         #
+#                                                                          #
+# You should have received a copy of the GNU General Public License along  #
+# with this program. If not, see <http://www.gnu.org/licenses/>.           #
+#                                                                          #
+############################################################################
+
+"""
+Watches a file (config.py) for changes, calling back from a thread of its
+own once it has been written. On Linux the thread just waits for inotify
+to tell it something has happened; elsewhere it looks at the file's size
+and modification time every couple of seconds.
+
+Like clockstate, this doesn't import Kivy.
+"""
+
+import ctypes
+import os
+import select
+import struct
+import threading
+import time
+
+############################################################################
+
+# From <sys/inotify.h>.
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+
+_event = struct.Struct('iIII')
+
+def _inotify():
+    """
+    Return libc if it has inotify, or else None.
+    """
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.inotify_init1, libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+class FileWatcher:
+    """
+    Calls `callback` (with no arguments, from another thread) whenever
+    the file at `path` has been changed. Editors often save a file in
+    several steps, or replace it with a new one, so it's the directory
+    which is watched, and the callback is only made once things have
+    been quiet for `settle` seconds.
+    """
+    def __init__(self, path, callback, interval=2, settle=0.2):
+        self.path = os.path.abspath(path)
+        self.callback = callback
+        self.interval = interval
+        self.settle = settle
+        self.method = None
+        self._thread = None
+
+    def start(self):
+        """
+        Start watching, by inotify if possible. Returns the method used.
+        """
+        libc = _inotify()
+        fd = -1
+        if libc is not None:
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd >= 0:
+            directory = os.path.dirname(self.path)
+            mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+            if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+                os.close(fd)
+                fd = -1
+
+        if fd >= 0:
+            self.method = 'inotify'
+            target, args = self._watch, (fd,)
+        else:
+            self.method = 'polling'
+            target, args = self._poll, ()
+        self._thread = threading.Thread(
+            target=target, args=args, name='configwatch', daemon=True
+        )
+        self._thread.start()
+        return self.method
+
+    def _watch(self, fd):
+        name = os.fsencode(os.path.basename(self.path))
+        while True:
+            # Wait for something to happen to the file, then for the
+            # directory to go quiet, since an editor may still be busy
+            # with its other files.
+            if self._read(fd, name, None):
+                while self._read(fd, name, self.settle) is not None:
+                    pass
+                self.callback()
+
+    @staticmethod
+    def _read(fd, name, timeout):
+        """
+        Wait for events, and return whether any of them were for the
+        file with the given name, or None if there were none before the
+        timeout.
+        """
+        if not select.select([fd], [], [], timeout)[0]:
+            return None
+        data = os.read(fd, 4096)
+        pos, seen = 0, False
+        while pos < len(data):
+            wd, mask, cookie, length = _event.unpack_from(data, pos)
+            pos += _event.size
+            seen = seen or data[pos:pos + length].rstrip(b'\0') == name
+            pos += length
+        return seen
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _poll(self):
+        last = self._stat()
+        while True:
+            time.sleep(self.interval)
+            now = self._stat()
+            if now != last:
+                last = now
+                if now is not None:
+                    self.callback()
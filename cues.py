@@ -0,0 +1,242 @@
+# vi: set ts=4 et fileencoding=utf-8 ff=unix:
+############################################################################
+#                                                                          #
+# Copyright © 2016 Julian R Yon <julian@julianyon.net>                     #
+#                                                                          #
+# This program is free software: you can redistribute it and/or modify it  #
+# under the terms of the GNU General Public License as published by the    #
+# Free Software Foundation, either version 3 of the License, or (at your   #
+# option) any later version.                                               #
+#                                                                          #
+# This program is distributed in the hope that it will be useful, but      #
+# WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General #
+# Public License for more details.                                         #
+#                                                                          #
+# You should have received a copy of the GNU General Public License along  #
+# with this program. If not, see <http://www.gnu.org/licenses/>.           #
+#                                                                          #
+############################################################################
+
+"""
+Cues: things for the clock to show at set times of the week, such as
+"Bedtime" under the word clock, or a different set of colours, each for
+a while. See `cues` in config.py for how they're written.
+
+The next start or end of every cue is kept in a heap, so however many
+there are, only the first is looked at until it's due, and each start or
+end costs O(log n) to deal with. Whoever drives the scheduler (BKClock)
+sets a timer for the first one.
+
+Like clockstate, this doesn't import Kivy.
+"""
+
+from datetime import datetime, time as dtime, timedelta
+import heapq
+import re
+
+############################################################################
+
+DAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+DAY_SETS = {
+    'daily': range(7),
+    'weekdays': range(5),
+    'weekends': range(5, 7),
+}
+
+def parse_days(text):
+    """
+    Return the set of weekdays (0 for Monday) in a description such as
+    'daily', 'weekdays', 'weekends', 'Sat' or 'Mon-Wed, Fri'.
+    """
+    days = set()
+    for part in re.split(r'[\s,]+', text.strip().lower()):
+        if not part:
+            continue
+        if part in DAY_SETS:
+            days.update(DAY_SETS[part])
+            continue
+        first, _, last = part.partition('-')
+        try:
+            a = DAY_NAMES.index(first[:3])
+            b = DAY_NAMES.index(last[:3]) if last else a
+        except ValueError:
+            raise ValueError("Unknown day in cue: {0!r}".format(part))
+        days.update( d % 7 for d in range(a, a + (b - a) % 7 + 1) )
+    if not days:
+        raise ValueError("No days given for cue: {0!r}".format(text))
+    return frozenset(days)
+
+def parse_time_of_day(text):
+    """
+    Return a time of day given as HH:MM or HH:MM:SS.
+    """
+    return dtime(*map(int, text.split(':')))
+
+############################################################################
+
+class Cue:
+    """
+    Something to show from a time of day on some days of the week, for
+    a number of minutes: a line of text for the word clock and/or some
+    colours to use in place of the configured ones.
+    """
+    __slots__ = ('days', 'time', 'duration', 'text', 'colors')
+
+    def __init__(self, days, time, minutes, what):
+        self.days = parse_days(days) if isinstance(days, str) else days
+        self.time = parse_time_of_day(time) if isinstance(time, str) else time
+        self.duration = timedelta(minutes=minutes)
+        if isinstance(what, str):
+            what = {'text': what}
+        self.text = what.get('text')
+        self.colors = what.get('colors') or {}
+
+    def next_start(self, after):
+        """
+        Return the first start of the cue strictly after the datetime
+        `after`.
+        """
+        day = after.date()
+        for i in range(8):
+            if day.weekday() in self.days:
+                start = datetime.combine(day, self.time)
+                if start > after:
+                    return start
+            day += timedelta(days=1)
+
+    def last_start(self, before):
+        """
+        Return the last start of the cue at or before the datetime
+        `before`.
+        """
+        day = before.date()
+        for i in range(8):
+            if day.weekday() in self.days:
+                start = datetime.combine(day, self.time)
+                if start <= before:
+                    return start
+            day -= timedelta(days=1)
+
+    def __repr__(self):
+        return "<Cue {0} {1} {2} {3!r}>".format(
+            ''.join( str(d) for d in sorted(self.days) ), self.time,
+            self.duration, self.text or self.colors
+        )
+
+# What's in the heap: a cue starting, or ending.
+START = 0
+END = 1
+
+class CueScheduler:
+    """
+    Keeps track of which cues are showing, as the time moves on.
+    `on_change` is called with the scheduler whenever that changes; its
+    `text` is the text of the cue which started most recently (or None),
+    and its `colors` the colours of all the cues showing, later ones
+    taking precedence.
+
+    Times are naive datetimes, as the clock shows them. It's up to the
+    caller to turn the gap until next_due() into a real delay, allowing
+    for daylight saving time.
+    """
+    def __init__(self, cues, on_change=None):
+        self.cues = [ c if isinstance(c, Cue) else Cue(*c) for c in cues ]
+        self.on_change = on_change
+        self.heap = []
+        self.showing = {}
+        self.now = None
+        self._seq = 0
+
+    def _push(self, when, kind, index):
+        # The sequence number keeps the order of equal times stable, and
+        # stops the comparison from ever reaching the cues.
+        self._seq += 1
+        heapq.heappush(self.heap, (when, kind, self._seq, index))
+
+    def reset(self, now):
+        """
+        Work out from scratch which cues are showing at `now`, and when
+        each one next starts or ends. This is O(n), and needed at the
+        start and whenever the time goes backwards.
+        """
+        self.heap = []
+        self.showing = {}
+        for i, cue in enumerate(self.cues):
+            start = cue.last_start(now)
+            if start is not None and now < start + cue.duration:
+                self.showing[i] = start
+                self.heap.append((start + cue.duration, END, i, i))
+            self.heap.append((cue.next_start(now), START, i, i))
+        self._seq = len(self.cues)
+        heapq.heapify(self.heap)
+        self.now = now
+        self.changed()
+
+    def next_due(self):
+        """
+        Return when the next cue starts or ends.
+        """
+        return self.heap[0][0] if self.heap else None
+
+    def advance(self, now):
+        """
+        Move on to `now`, starting and ending the cues which are due.
+        Only the first of the heap is looked at if nothing is due. If the
+        time has gone backwards, start again from scratch.
+        """
+        if self.now is None or now < self.now:
+            self.reset(now)
+            return
+        self.now = now
+        heap, cues, showing = self.heap, self.cues, self.showing
+        changed = False
+        while heap and heap[0][0] <= now:
+            when, kind, seq, i = heapq.heappop(heap)
+            cue = cues[i]
+            if kind == END:
+                if showing.get(i) == when - cue.duration:
+                    del showing[i]
+                    changed = True
+                continue
+
+            # After a jump forward a start may have been missed
+            # altogether, in which case it isn't shown, and the next one
+            # is found after now rather than after this one, so that no
+            # cue is seen more than once however far the jump.
+            end = when + cue.duration
+            if end > now:
+                showing[i] = when
+                self._push(end, END, i)
+                changed = True
+            self._push(cue.next_start(max(when, now)), START, i)
+        if changed:
+            self.changed()
+
+    def changed(self):
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def order(self):
+        """
+        Return the cues showing, in the order they started.
+        """
+        return [
+            self.cues[i] for i, start in
+            sorted(self.showing.items(), key=lambda item: (item[1], item[0]))
+        ]
+
+    @property
+    def text(self):
+        for cue in reversed(self.order()):
+            if cue.text:
+                return cue.text
+        return None
+
+    @property
+    def colors(self):
+        colors = {}
+        for cue in self.order():
+            colors.update(cue.colors)
+        return colors
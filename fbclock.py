@@ -0,0 +1,887 @@
+#! /usr/bin/env python3
+# vi: set ts=4 et fileencoding=utf-8 ff=unix:
+############################################################################
+#                                                                          #
+# Copyright © 2016 Julian R Yon <julian@julianyon.net>                     #
+#                                                                          #
+# This program is free software: you can redistribute it and/or modify it  #
+# under the terms of the GNU General Public License as published by the    #
+# Free Software Foundation, either version 3 of the License, or (at your   #
+# option) any later version.                                               #
+#                                                                          #
+# This program is distributed in the hope that it will be useful, but      #
+# WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General #
+# Public License for more details.                                         #
+#                                                                          #
+# You should have received a copy of the GNU General Public License along  #
+# with this program. If not, see <http://www.gnu.org/licenses/>.           #
+#                                                                          #
+############################################################################
+
+"""
+Shows the clock straight on a Linux framebuffer device such as /dev/fb0,
+for kiosks which can't spare the memory for a window system. There's no
+Kivy window and no OpenGL: everything is drawn in Python into an RGBA
+buffer, and only the rectangles which have changed since the last frame
+are copied to the device.
+
+The layout, fonts and colours are those of the windowed clock (see
+bkclock.kv and config.py), and so are the texts, since Kivy's text
+provider still renders them. Text is drawn the way Kivy would draw it
+but the shapes are only approximately so: the hands aren't antialiased
+(nor are they in a window) and the rim is.
+
+A plain file will do in place of the device, given its size, e.g.
+
+    python3 fbclock.py --fb-device /tmp/fb.raw --fb-size 800x480 \\
+        --frames 30
+
+which leaves the last frame in the file as raw RGBA.
+"""
+
+import os
+
+# Our command line is our own, not Kivy's.
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+from kivy.core.text.markup import MarkupLabel
+
+from main import (
+    config, _render_data, _text_key, texture_cache, argument_parser,
+    apply_args, ClockHand, HourHand, MinuteHand, SecondHand,
+    DigitalTime24, DigitalTime12, WordClock, DateDisplay
+)
+from clockstate import (
+    ClockState, frame_delay, make_time_source,
+    SUBSECOND, SECOND, MINUTE, DAY, BLINK
+)
+
+import fcntl
+import math
+import mmap
+import random
+import re
+import struct
+import time
+
+############################################################################
+
+def font(name):
+    """
+    Return the font file for the named part of the clock, as bkclock.kv
+    chooses it.
+    """
+    fonts = config['fonts']
+    default = fonts.setdefault('default', 'fonts/android/Roboto-Regular.ttf')
+    return fonts.get(name, default)
+
+def intersect(a, b):
+    """
+    Return the intersection of two rectangles, or None if they don't
+    overlap. Rectangles are (left, top, right, bottom) in pixels from
+    the top left, with the right and bottom exclusive.
+    """
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[2], b[2]), min(a[3], b[3])
+    if x0 < x1 and y0 < y1:
+        return (x0, y0, x1, y1)
+    return None
+
+def union(a, b):
+    """
+    Return the smallest rectangle containing both of two rectangles.
+    """
+    return (min(a[0], b[0]), min(a[1], b[1]),
+            max(a[2], b[2]), max(a[3], b[3]))
+
+def blend_tables(rgb, alpha):
+    """
+    Return a table per channel for bytes.translate(), which blends the
+    colour `rgb` (floats, as in config['colors']) over each value with
+    the given opacity.
+    """
+    return [
+        bytes( round(v*(1 - alpha) + c*255*alpha) for v in range(256) )
+        for c in rgb
+    ]
+
+############################################################################
+
+class Sprite:
+    """
+    A rendered piece of text, as RGBA pixels (top row first, colour not
+    premultiplied). To draw it quickly, each row is split into runs of
+    opaque pixels, which are simply copied, and the partly transparent
+    pixels at the edges of the glyphs, which have to be blended one by
+    one. Transparent pixels are skipped.
+    """
+    _opaque = re.compile(rb'\xff+')
+    _partial = re.compile(rb'[\x01-\xfe]')
+
+    def __init__(self, width, height, pixels):
+        self.width = width
+        self.height = height
+        self.pixels = bytes(pixels)
+        self.runs = []
+        self.edges = []
+        stride = width * 4
+        for y in range(height):
+            alpha = self.pixels[y*stride + 3:(y + 1)*stride:4]
+            self.runs.append(
+                [ m.span() for m in self._opaque.finditer(alpha) ]
+            )
+            self.edges.append(
+                [ m.start() for m in self._partial.finditer(alpha) ]
+            )
+
+# Sprites are kept for as long as they're likely to be wanted again, like
+# the windowed clock's TextPool.
+_sprites = {}
+_sprites_limit = 64
+
+def render(text, font_name, font_size, color=(1, 1, 1, 1), halign='left'):
+    """
+    Return a Sprite of the marked up text, rendered by Kivy's text
+    provider without a texture. Where there's a texture cache it's used
+    as for the windowed clock, so that text is only rendered once.
+    """
+    key = (text, font_name, font_size, tuple(color), halign)
+    sprite = _sprites.get(key)
+    if sprite is not None:
+        return sprite
+
+    label = MarkupLabel(
+        font_name=font_name, font_size=font_size, color=color,
+        halign=halign
+    )
+    label.text = text
+
+    cache = texture_cache()
+    if cache is not None:
+        label.resolve_font_name()
+        cache_key = cache.key(label.options['font_name_r'], *_text_key(label))
+        bitmap = cache.load(cache_key)
+        if bitmap is not None:
+            with bitmap:
+                sprite = Sprite(bitmap.width, bitmap.height, bitmap.pixels)
+
+    if sprite is None:
+        data = _render_data(MarkupLabel, label.options, text)
+        if data is None:
+            sprite = Sprite(0, 0, b'')
+        else:
+            sprite = Sprite(data.width, data.height, data.data)
+            if cache is not None:
+                cache.store(cache_key, data.width, data.height, data.data)
+
+    if len(_sprites) >= _sprites_limit:
+        _sprites.clear()
+    _sprites[key] = sprite
+    return sprite
+
+############################################################################
+
+class Surface:
+    """
+    An opaque RGBA image in memory, top row first. Everything drawn on
+    it is clipped to a rectangle, which must lie within it.
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.stride = width * 4
+        self.pixels = bytearray(b'\0\0\0\xff' * (width * height))
+
+    @property
+    def rect(self):
+        return (0, 0, self.width, self.height)
+
+    def copy(self, source, rect):
+        """
+        Copy a rectangle from another surface of the same size.
+        """
+        x0, y0, x1, y1 = rect
+        px, src, s = self.pixels, source.pixels, self.stride
+        for o in range(y0*s, y1*s, s):
+            px[o + x0*4:o + x1*4] = src[o + x0*4:o + x1*4]
+
+    def fill(self, rect, rgb=(0, 0, 0)):
+        """
+        Fill a rectangle with a colour given as floats.
+        """
+        x0, y0, x1, y1 = rect
+        row = bytes( round(c * 255) for c in rgb ) + b'\xff'
+        row *= x1 - x0
+        px, s = self.pixels, self.stride
+        for o in range(y0*s, y1*s, s):
+            px[o + x0*4:o + x1*4] = row
+
+    def blend_span(self, y, x0, x1, tables):
+        """
+        Blend a colour (see blend_tables()) over part of one row.
+        """
+        px = self.pixels
+        o0 = y*self.stride + x0*4
+        o1 = o0 + (x1 - x0)*4
+        span = px[o0:o1]
+        px[o0:o1:4] = span[0::4].translate(tables[0])
+        px[o0 + 1:o1:4] = span[1::4].translate(tables[1])
+        px[o0 + 2:o1:4] = span[2::4].translate(tables[2])
+
+    def blend(self, rect, tables, clip):
+        """
+        Blend a colour over a rectangle.
+        """
+        rect = intersect(rect, clip)
+        if rect is not None:
+            x0, y0, x1, y1 = rect
+            for y in range(y0, y1):
+                self.blend_span(y, x0, x1, tables)
+
+    def blit(self, sprite, x, y, clip):
+        """
+        Draw a sprite with its top left corner at (x, y).
+        """
+        rect = intersect((x, y, x + sprite.width, y + sprite.height), clip)
+        if rect is None:
+            return
+        x0, y0, x1, y1 = rect
+        px, src = self.pixels, sprite.pixels
+        s, ss = self.stride, sprite.width * 4
+
+        # The columns of the sprite which are inside the clip.
+        lo, hi = x0 - x, x1 - x
+        for sy in range(y0 - y, y1 - y):
+            o = (y + sy)*s + x*4
+            so = sy*ss
+            for a, b in sprite.runs[sy]:
+                a, b = max(a, lo), min(b, hi)
+                if a < b:
+                    px[o + a*4:o + b*4] = src[so + a*4:so + b*4]
+            for i in sprite.edges[sy]:
+                if lo <= i < hi:
+                    d, t = o + i*4, so + i*4
+                    alpha = src[t + 3]
+                    inv = 255 - alpha
+                    px[d] = (src[t]*alpha + px[d]*inv + 127) // 255
+                    px[d + 1] = (src[t + 1]*alpha + px[d + 1]*inv + 127) // 255
+                    px[d + 2] = (src[t + 2]*alpha + px[d + 2]*inv + 127) // 255
+
+    def triangle(self, spans, tables, clip):
+        """
+        Blend a colour over a triangle, given as its spans (see
+        triangle_spans()).
+        """
+        cx0, cy0, cx1, cy1 = clip
+        for y, x0, x1 in spans:
+            if cy0 <= y < cy1:
+                x0, x1 = max(x0, cx0), min(x1, cx1)
+                if x0 < x1:
+                    self.blend_span(y, x0, x1, tables)
+
+    def ring(self, cx, cy, radius, width, rgb, clip):
+        """
+        Draw an antialiased circle of the given line width centred on
+        (cx, cy), as Kivy's SmoothLine does: solid for width - 1 pixels
+        either side of the radius, then fading out over 1.2 pixels.
+        """
+        solid = max(0, width - 1)
+        outer = radius + solid + 1.2
+        inner = max(0, radius - solid - 1.2)
+        cx0, cy0, cx1, cy1 = clip
+        px, s = self.pixels, self.stride
+        rgb = [ c * 255 for c in rgb ]
+
+        # Only the pixels between the inner and outer edges of each row
+        # are looked at.
+        for y in range(max(cy0, math.floor(cy - outer)),
+                       min(cy1, math.ceil(cy + outer) + 1)):
+            dy = y + 0.5 - cy
+            if abs(dy) > outer:
+                continue
+            xo = math.sqrt(outer*outer - dy*dy)
+            xi = math.sqrt(inner*inner - dy*dy) if abs(dy) < inner else 0
+            for a, b in (cx - xo, cx - xi), (cx + xi, cx + xo):
+                for x in range(max(cx0, math.floor(a - 0.5)),
+                               min(cx1, math.ceil(b + 0.5))):
+                    d = math.hypot(x + 0.5 - cx, dy)
+                    cover = min(1, max(0, 1 - (abs(d - radius) - solid)/1.2))
+                    if cover:
+                        o = y*s + x*4
+                        for k in 0, 1, 2:
+                            px[o + k] = round(
+                                rgb[k]*cover + px[o + k]*(1 - cover)
+                            )
+
+def triangle_spans(points):
+    """
+    Return (y, left, right) for each row of pixels whose centres are
+    inside the triangle, as OpenGL fills it (without antialiasing).
+    """
+    (ax, ay), (bx, by), (cx, cy) = points
+    edges = ((ax, ay, bx, by), (bx, by, cx, cy), (cx, cy, ax, ay))
+    spans = []
+    top = math.ceil(min(ay, by, cy) - 0.5)
+    bottom = math.ceil(max(ay, by, cy) - 0.5)
+    for y in range(top, bottom):
+        yc = y + 0.5
+        xs = [
+            x0 + (yc - y0)*(x1 - x0)/(y1 - y0)
+            for x0, y0, x1, y1 in edges
+            if y0 <= yc < y1 or y1 <= yc < y0
+        ]
+        if len(xs) >= 2:
+            left = math.ceil(min(xs) - 0.5)
+            right = math.ceil(max(xs) - 0.5)
+            if left < right:
+                spans.append((y, left, right))
+    return spans
+
+def spans_rect(spans):
+    """
+    Return the bounding rectangle of a list of spans, or None.
+    """
+    if not spans:
+        return None
+    return (min(s[1] for s in spans), spans[0][0],
+            max(s[2] for s in spans), spans[-1][0] + 1)
+
+############################################################################
+
+class Box:
+    """
+    The area of a widget in the window's layout. Kivy measures from the
+    bottom left of the window, and the framebuffer from the top left,
+    so the box converts between them.
+    """
+    def __init__(self, x, y, width, height, window_height):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.window_height = window_height
+
+    def place(self, sprite, cx, cy):
+        """
+        Return the top left corner, in the framebuffer, of a sprite
+        centred on (cx, cy) in the box, as a Label whose size is that of
+        its texture places it.
+        """
+        x = self.x + int(cx - sprite.width/2)
+        y = self.y + int(cy - sprite.height/2)
+        return round(x), round(self.window_height - y - sprite.height)
+
+    def point(self, x, y):
+        """
+        Return a point in the box as a point in the framebuffer.
+        """
+        return self.x + x, self.window_height - self.y - y
+
+class Text:
+    """
+    A display of marked up text, centred on a point in a box as a Label
+    the size of its texture is.
+    """
+    def __init__(self, clock, box, center, font_name, font_size,
+                 color=(1, 1, 1, 1), halign='left'):
+        self.clock = clock
+        self.box = box
+        self.center = center
+        self.font = (font_name, font_size, color, halign)
+        self.sprite = None
+        self.rect = None
+
+    def show(self, text):
+        sprite = render(text, *self.font)
+        if sprite is self.sprite:
+            return
+        self.clock.damage(self.rect)
+        self.sprite = sprite
+        self.pos = self.box.place(sprite, *self.center)
+        self.rect = (self.pos[0], self.pos[1],
+                     self.pos[0] + sprite.width, self.pos[1] + sprite.height)
+        self.clock.damage(self.rect)
+
+    def draw(self, surface, clip):
+        if self.sprite is not None:
+            surface.blit(self.sprite, self.pos[0], self.pos[1], clip)
+
+class Numeral(Text):
+    """
+    One of the numbers around the clock face, which can flip between
+    decimal and Roman numbers.
+    """
+    def __init__(self, clock, box, hour, radius):
+        # Placed as HourLabel.pos_offset() places it.
+        a = math.radians(30 * hour)
+        center = (box.width/2 + 0.85*radius*math.sin(a),
+                  box.height/2 + 0.85*radius*math.cos(a))
+        super().__init__(
+            clock, box, center, font('clock-face'), radius/5,
+            config['colors']['numerals'] + (1.0,)
+        )
+        self.texts = (str(hour), config['roman_numerals'][hour - 1])
+        self.roman = False
+
+class Hand:
+    """
+    One of the clock hands and its label on the rim, drawn as the
+    ClockHand subclass `kind` draws them.
+    """
+    def __init__(self, clock, box, kind, radius):
+        self.clock = clock
+        self.box = box
+        self.kind = kind
+        self.radius = radius
+        self.tables = blend_tables(kind.color, kind.alpha)
+        self.rim_tables = blend_tables(kind.color, 0.5)
+        self.rim_font = (
+            font('rim-text'), radius/10, config['colors']['rim_text'] + (1.0,)
+        )
+        self.angle = None
+        self.whole = None
+        self.rect = None
+
+        # As ClockHand.visible_step().
+        r = radius * 1.1
+        self.min_step = math.degrees(0.25 / r) if r else 0
+
+    def points(self, angle):
+        """
+        Return the corners of the hand in the framebuffer, as
+        ClockHand.points() works them out.
+        """
+        a = math.radians(angle)
+        cos, sin = math.cos(a), math.sin(a)
+        box = self.box
+        outer, inner = self.radius, min(box.width, box.height) / 60
+        cx, cy = box.width/2, box.height/2
+        points = []
+        for i, (x, y) in enumerate(self.kind.point_vectors):
+            scale = outer if i == 0 else inner
+            x, y = cx + scale*(x*cos - y*sin), cy + scale*(y*cos + x*sin)
+            if config['snap_hands']:
+                x, y = int(x), int(y)
+            points.append(box.point(x, y))
+        return points
+
+    def update(self, value):
+        angle = -value * self.kind.unit_angle
+        whole = math.floor(value)
+        if (self.angle is not None and abs(angle - self.angle) < self.min_step
+                and whole == self.whole):
+            return
+        self.angle = angle
+        box = self.box
+
+        self.spans = triangle_spans(self.points(angle))
+
+        # The rim label, placed as ClockHand.update_rim() places it.
+        if whole != self.whole:
+            self.sprite = render(
+                ClockHand.rim_texts[whole % 60], *self.rim_font
+            )
+            self.whole = whole
+        sprite = self.sprite
+        a = math.radians(angle)
+        r = self.radius * 1.1
+        x = box.width/2 - r*math.sin(a)
+        y = box.height/2 + r*math.cos(a)
+        w = sprite.width + box.height/25
+        h = sprite.height + box.height/37.5
+        left, top = box.point(x - w/2, y + h/2)
+        self.back = (math.ceil(left - 0.5), math.ceil(top - 0.5),
+                     math.ceil(left + w - 0.5), math.ceil(top + h - 0.5))
+        self.pos = box.place(sprite, x, y)
+
+        rect = self.back
+        spans = spans_rect(self.spans)
+        if spans is not None:
+            rect = union(rect, spans)
+        self.clock.damage(self.rect)
+        self.clock.damage(rect)
+        self.rect = rect
+
+    def draw(self, surface, clip):
+        if self.angle is None:
+            return
+        surface.blend(self.back, self.rim_tables, clip)
+        surface.blit(self.sprite, self.pos[0], self.pos[1], clip)
+        surface.triangle(self.spans, self.tables, clip)
+
+############################################################################
+
+class Framebuffer:
+    """
+    A framebuffer device, or a plain file standing in for one, mapped
+    into memory. A device is asked for its size and pixel format unless
+    they're given; a file has to be told its size, and holds RGBA unless
+    told otherwise. Panning isn't supported, so the clock is always
+    drawn at the top left of the device's memory.
+    """
+    formats = {'rgba': 4, 'bgra': 4, 'rgb565': 2}
+
+    # The FBIOGET_VSCREENINFO ioctl and the start of the structure it
+    # fills in: the resolutions, offsets, bits per pixel and greyscale
+    # flag, then the offset, length and msb_right of the red, green,
+    # blue and alpha channels.
+    _get_vscreeninfo = 0x4600
+    _vscreeninfo = struct.Struct('=8I12I')
+
+    def __init__(self, path, size=None, fmt=None):
+        self.path = path
+        mode = 'r+b' if os.path.exists(path) else 'w+b'
+        device = os.path.exists(path) and not os.path.isfile(path)
+        if size is None and not device:
+            raise ValueError(
+                "The size of a file standing in for a framebuffer must be"
+                " given (fb_size)."
+            )
+        self._file = open(path, mode, buffering=0)
+        fd = self._file.fileno()
+        stride = None
+
+        if not device:
+            fmt = fmt or 'rgba'
+        else:
+            info = self._vscreeninfo.unpack(fcntl.ioctl(
+                fd, self._get_vscreeninfo, bytes(160)
+            )[:self._vscreeninfo.size])
+            if size is None:
+                size = info[0:2]
+            if fmt is None:
+                bpp, red = info[6], info[8]
+                fmt = 'rgb565' if bpp == 16 else 'rgba' if red == 0 else 'bgra'
+            stride = self._sysfs('stride') or info[2] * info[6] // 8
+
+        if fmt not in self.formats:
+            raise ValueError("Unknown framebuffer format: {0!r}".format(fmt))
+        self.width, self.height = size
+        self.format = fmt
+        self.bpp = self.formats[fmt]
+        self.stride = stride or self.width * self.bpp
+        self._convert = getattr(self, '_from_rgba_to_' + fmt)
+
+        length = self.stride * self.height
+        if stride is None and os.fstat(fd).st_size < length:
+            os.ftruncate(fd, length)
+        self.map = mmap.mmap(fd, length)
+
+    def _sysfs(self, name):
+        """
+        Return an attribute of the device from sysfs as an integer, or
+        None if it can't be read.
+        """
+        device = os.path.basename(os.path.realpath(self.path))
+        try:
+            with open('/sys/class/graphics/{0}/{1}'.format(device, name)) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def write(self, surface, rect):
+        """
+        Copy a rectangle of an RGBA surface to the framebuffer.
+        """
+        rect = intersect(rect, (0, 0, self.width, self.height))
+        if rect is None:
+            return
+        x0, y0, x1, y1 = rect
+        src, s = surface.pixels, surface.stride
+        out, stride, bpp = self.map, self.stride, self.bpp
+        convert = self._convert
+        n = (x1 - x0) * bpp
+        for y in range(y0, y1):
+            o = y*stride + x0*bpp
+            out[o:o + n] = convert(src[y*s + x0*4:y*s + x1*4])
+
+    def close(self):
+        self.map.close()
+        self._file.close()
+
+    @staticmethod
+    def _from_rgba_to_rgba(row):
+        return row
+
+    @staticmethod
+    def _from_rgba_to_bgra(row):
+        out = bytearray(row)
+        out[0::4] = row[2::4]
+        out[2::4] = row[0::4]
+        return out
+
+    # For RGB565 each output byte takes bits from two channels, so each
+    # channel is translated into its share of the byte, and the shares
+    # combined by ORing whole rows as (big) integers.
+    _565 = (
+        bytes( v & 0xf8 for v in range(256) ),          # red, high byte
+        bytes( v >> 5 for v in range(256) ),            # green, high byte
+        bytes( (v << 3) & 0xe0 for v in range(256) ),   # green, low byte
+        bytes( v >> 3 for v in range(256) ),            # blue, low byte
+    )
+
+    @classmethod
+    def _from_rgba_to_rgb565(cls, row):
+        r, g, b = row[0::4], row[1::4], row[2::4]
+        n = len(r)
+        t = cls._565
+
+        def combine(a, b):
+            return (int.from_bytes(a, 'little')
+                    | int.from_bytes(b, 'little')).to_bytes(n, 'little')
+
+        out = bytearray(2 * n)
+        out[0::2] = combine(g.translate(t[2]), b.translate(t[3]))
+        out[1::2] = combine(r.translate(t[0]), g.translate(t[1]))
+        return out
+
+############################################################################
+
+class FbClock:
+    """
+    The whole clock, drawn on a surface and copied to a framebuffer.
+
+    The parts which rarely change (the rim and the numerals) are drawn
+    once on a base surface. Anything that changes marks the rectangles
+    it covered and now covers as damaged, and on each frame those are
+    copied from the base, the moving parts are drawn over them in the
+    same order as in the window, and the results are copied to the
+    framebuffer.
+    """
+    # The rows of the layout in bkclock.kv, from the top, with their
+    # size hints.
+    rows = (('date', 0.2), ('face', 1), ('word', 0.2), ('digital_12', 0.2))
+
+    def __init__(self, fb, source):
+        self.fb = fb
+        width, height = fb.width, fb.height
+        self.base = Surface(width, height)
+        self.frame = Surface(width, height)
+        self.damaged = []
+
+        boxes = {}
+        top = height
+        total = sum(hint for name, hint in self.rows)
+        for name, hint in self.rows:
+            h = height * hint / total
+            top -= h
+            boxes[name] = Box(0, top, width, h, height)
+
+        # The analogue clock, as in bkclock.kv.
+        face = self.face = boxes['face']
+        self.face_size = min(face.width, face.height)
+        self.radius = self.face_size / 2.2
+        self.numerals = [
+            Numeral(self, face, hour, self.radius) for hour in range(1, 13)
+        ]
+        self.hands = [
+            Hand(self, face, kind, self.radius)
+            for kind in (HourHand, MinuteHand, SecondHand)
+        ]
+        self.digital_24 = Text(
+            self, face, (face.width/2, face.height/3),
+            font('digital-24'), self.radius/6
+        )
+
+        # The other displays, sized by the face as they are in a window.
+        date_box, word_box = boxes['date'], boxes['word']
+        digital_box = boxes['digital_12']
+        self.date = Text(
+            self, date_box, (date_box.width/2, date_box.height/2),
+            font('date'), self.face_size/18, halign='center'
+        )
+        self.word_clock = Text(
+            self, word_box, (word_box.width/2, word_box.height/2),
+            font('word-clock'), self.face_size/15, halign='center'
+        )
+        self.digital_12 = Text(
+            self, digital_box, (digital_box.width/2, digital_box.height/2),
+            font('digital-12'), self.face_size/10
+        )
+
+        # Everything which moves, in the order it's drawn.
+        self.items = self.hands + [
+            self.digital_24, self.date, self.word_clock, self.digital_12
+        ]
+
+        for numeral in self.numerals:
+            numeral.show(numeral.texts[0])
+        self.draw_static(self.base.rect)
+
+        self.state = ClockState(source)
+        self.state.subscribe(self.tick_face, SUBSECOND)
+        self.state.subscribe(self.tick_digital_24, SECOND)
+        self.state.subscribe(self.tick_digital_12, MINUTE | BLINK)
+        self.state.subscribe(self.tick_word_clock, MINUTE)
+        self.state.subscribe(self.tick_date, DAY)
+
+        # The numerals first flip to Roman numbers after seven seconds,
+        # as in ClockFace.start().
+        self._flip_index = 0
+        self._flip_to = True
+        self.flip_due = time.monotonic() + 7
+
+    def damage(self, rect):
+        """
+        Mark a rectangle as needing to be drawn again.
+        """
+        if rect is not None:
+            self.damaged.append(rect)
+
+    def draw_static(self, rect):
+        """
+        Draw the rim and the numerals within a rectangle of the base.
+        """
+        base, face = self.base, self.face
+        base.fill(rect)
+        cx, cy = face.point(face.width/2, face.height/2)
+        base.ring(
+            cx, cy, self.radius, math.ceil(self.face_size / 240),
+            config['colors']['rim'], rect
+        )
+        for numeral in self.numerals:
+            numeral.draw(base, rect)
+
+    def flip_next_numeral(self):
+        """
+        Flip the next numeral in sequence, as
+        ClockFace.flip_next_hour_label() does.
+        """
+        numeral = self.numerals[self._flip_index]
+        numeral.roman = self._flip_to
+        old = numeral.rect
+        numeral.show(numeral.texts[numeral.roman])
+        self.draw_static(union(old, numeral.rect))
+        self._flip_index = (self._flip_index + 1) % 12
+
+        if self._flip_index:
+            interval = 0.05
+        else:
+            self._flip_to = not self._flip_to
+            interval = random.randint(20, 700)/100
+        self.flip_due = time.monotonic() + interval
+
+    def tick_face(self, state):
+        s = state.second + state.fraction
+        m = state.minute + s/60
+        h = state.hour % 24 + m/60
+        self.hands[0].update(h)
+        self.hands[1].update(m)
+        if state.changed & SECOND:
+            self.hands[2].update(state.second)
+
+    def tick_digital_24(self, state):
+        self.digital_24.show(DigitalTime24.text_for(
+            state.hour, state.minute, state.second
+        ))
+
+    def tick_digital_12(self, state):
+        self.digital_12.show(DigitalTime12.text_for(
+            state.hour, state.minute, state.second
+        ))
+
+    def tick_word_clock(self, state):
+        self.word_clock.show(WordClock.text_for(
+            state.hour, state.minute, self.word_clock.font[1]
+        ))
+
+    def tick_date(self, state):
+        self.date.show(DateDisplay.text_for(
+            state.year, state.month, state.day, self.date.font[1]
+        ))
+
+    def flush(self):
+        """
+        Redraw the damaged rectangles and copy them to the framebuffer.
+        Overlapping rectangles are merged first, so that nothing is
+        drawn twice.
+        """
+        screen = self.frame.rect
+        rects = []
+        for rect in self.damaged:
+            rect = intersect(rect, screen)
+            if rect is None:
+                continue
+            i = 0
+            while i < len(rects):
+                if intersect(rect, rects[i]) is not None:
+                    rect = union(rect, rects.pop(i))
+                    i = 0
+                else:
+                    i += 1
+            rects.append(rect)
+        self.damaged = []
+
+        frame = self.frame
+        for rect in rects:
+            frame.copy(self.base, rect)
+            for item in self.items:
+                if item.rect is not None and intersect(item.rect, rect):
+                    item.draw(frame, rect)
+            self.fb.write(frame, rect)
+        return rects
+
+    def run(self, frames=None):
+        """
+        Show the clock until interrupted, or for the given number of
+        frames.
+        """
+        self.damage(self.frame.rect)
+        n = 0
+        next_frame = time.monotonic()
+        while frames is None or n < frames:
+            now = time.monotonic()
+            if now >= self.flip_due:
+                self.flip_next_numeral()
+            if now >= next_frame:
+                self.state.tick()
+                n += 1
+                next_frame = now + frame_delay(
+                    self.state.source, config['frame_mode'],
+                    config['frame_rate']
+                )
+            self.flush()
+            time.sleep(max(0, min(next_frame, self.flip_due) - time.monotonic()))
+
+############################################################################
+
+def parse_args(argv=None):
+    parser = argument_parser(
+        "Show the clock on a framebuffer device, without a window."
+    )
+    parser.add_argument(
+        '--fb-device', metavar='PATH',
+        help="the framebuffer device, or a file to stand in for one"
+    )
+    parser.add_argument(
+        '--fb-size', metavar='WxH',
+        type=lambda s: tuple(map(int, s.split('x'))),
+        help="the size of the framebuffer (needed for a file)"
+    )
+    parser.add_argument(
+        '--fb-format', choices=sorted(Framebuffer.formats),
+        help="the pixel format of the framebuffer"
+    )
+    parser.add_argument(
+        '--frames', type=int, metavar='N',
+        help="stop after drawing N frames"
+    )
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parse_args()
+    apply_args(args)
+    source = make_time_source(
+        offset=config['time_offset'], scale=config['time_scale'],
+        start=config['time_start'], step=config['time_step'],
+        replay=config['time_replay']
+    )
+    fb = Framebuffer(config['fb_device'], config['fb_size'],
+                     config['fb_format'])
+    try:
+        FbClock(fb, source).run(args.frames)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fb.close()
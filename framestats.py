@@ -0,0 +1,308 @@
+# vi: set ts=4 et fileencoding=utf-8 ff=unix:
+############################################################################
+#                                                                          #
+# Copyright © 2016 Julian R Yon <julian@julianyon.net>                     #
+#                                                                          #
+# This program is free software: you can redistribute it and/or modify it  #
+# under the terms of the GNU General Public License as published by the    #
+# Free Software Foundation, either version 3 of the License, or (at your   #
+# option) any later version.                                               #
+#                                                                          #
+# This program is distributed in the hope that it will be useful, but      #
+# WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General #
+# Public License for more details.                                         #
+#                                                                          #
+# You should have received a copy of the GNU General Public License along  #
+# with this program. If not, see <http://www.gnu.org/licenses/>.           #
+#                                                                          #
+############################################################################
+
+"""
+Opt-in timing statistics for the per-frame work, and for starting up.
+
+Like clockstate, this doesn't import Kivy.
+"""
+
+from datetime import datetime
+import math
+import os
+import time
+import tracemalloc
+
+############################################################################
+
+class Histogram:
+    """
+    A histogram of durations with logarithmically sized buckets, four
+    to each doubling, starting from one microsecond. Percentiles are
+    only as accurate as the buckets (about ±10%) but recording a value
+    is cheap and the memory used is fixed.
+    """
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    buckets = 128
+
+    def __init__(self):
+        self.counts = [0] * self.buckets
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        """
+        Record a duration, in seconds.
+        """
+        us = seconds * 1000000
+        if us > 1:
+            i = min(int(math.log2(us) * 4) + 1, self.buckets - 1)
+        else:
+            i = 0
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """
+        Return (the upper bound of the bucket containing) the p-th
+        percentile, in seconds.
+        """
+        if not self.count:
+            return 0.0
+        wanted = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= wanted:
+                return min(2 ** (i/4) / 1000000, self.max)
+        return self.max
+
+############################################################################
+
+class FrameStats:
+    """
+    Collects a histogram per named measurement (e.g. each display's
+    update), along with the number of dropped frames.
+    """
+    percentiles = (50, 90, 99)
+
+    def __init__(self):
+        self.histograms = {}
+        self.dropped = 0
+        self.since = datetime.now()
+
+    def record(self, name, seconds):
+        """
+        Add a duration to the named histogram.
+        """
+        h = self.histograms.get(name)
+        if h is None:
+            h = self.histograms[name] = Histogram()
+        h.add(seconds)
+
+    def timed(self, name, fn):
+        """
+        Return a wrapper around `fn` which records how long each call
+        takes under `name`.
+        """
+        perf_counter, record = time.perf_counter, self.record
+
+        def wrapper(*args, **kwargs):
+            t0 = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, perf_counter() - t0)
+
+        return wrapper
+
+    def reset(self):
+        """
+        Start collecting afresh.
+        """
+        self.histograms = {}
+        self.dropped = 0
+        self.since = datetime.now()
+
+    def summary(self):
+        """
+        Return a list of (name, count, percentiles..., max) tuples, with
+        the durations in microseconds.
+        """
+        return [
+            (name, h.count)
+            + tuple( round(h.percentile(p) * 1000000) for p in self.percentiles )
+            + (round(h.max * 1000000),)
+            for name, h in sorted(self.histograms.items())
+        ]
+
+    def format_table(self):
+        """
+        Return the summary as a text table, e.g. for an overlay.
+        """
+        heads = ('', 'n') + tuple( 'p{0}'.format(p) for p in self.percentiles )
+        rows = [ heads + ('max',) ] + [
+            tuple(map(str, row)) for row in self.summary()
+        ]
+        rows.append(('dropped', str(self.dropped)))
+        widths = [ max(len(r[i]) for r in rows if i < len(r))
+                   for i in range(len(rows[0])) ]
+        return '\n'.join(
+            ' '.join(
+                c.ljust(w) if i == 0 else c.rjust(w)
+                for i, (c, w) in enumerate(zip(row, widths))
+            ) for row in rows
+        )
+
+    def format_line(self):
+        """
+        Return the summary as a single compact line for a log file:
+        the time followed by name=count/p50/p90/p99/max entries, with
+        the durations in microseconds.
+        """
+        return ' '.join(
+            [ datetime.now().strftime('%Y-%m-%dT%H:%M:%S') ]
+            + [ '{0}={1}'.format(row[0], '/'.join(map(str, row[1:])))
+                for row in self.summary() ]
+            + [ 'dropped={0}'.format(self.dropped) ]
+        )
+
+    def write(self, path):
+        """
+        Append the summary to the log file at `path`.
+        """
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(self.format_line() + '\n')
+
+############################################################################
+
+class AllocationBudgetError(RuntimeError):
+    """
+    Raised when a call metered with a budget allocates more than it.
+    """
+
+class AllocationMeter:
+    """
+    Measures how much memory Python allocates over a stretch of code,
+    using tracemalloc. Bracket the code with begin() and end(); end()
+    returns a pair of:
+
+    * the peak number of bytes allocated above the starting point,
+      which counts temporary objects even if they were freed again;
+    * the net number of bytes still allocated, which shows whether
+      anything was kept (or, if negative, released).
+
+    Tracing slows Python down considerably, so don't time code while
+    it's being metered.
+    """
+    def __init__(self):
+        self._own = False
+        self._bytes = 0
+
+    def start(self):
+        """
+        Start tracing, unless something else already is.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own = True
+
+    def stop(self):
+        """
+        Stop tracing, if we started it.
+        """
+        if self._own:
+            tracemalloc.stop()
+            self._own = False
+
+    def begin(self):
+        # Resetting the peak comes last, so that the meter's own
+        # allocations aren't counted.
+        self._bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    def end(self):
+        current, peak = tracemalloc.get_traced_memory()
+        return peak - self._bytes, current - self._bytes
+
+    def budgeted(self, fn, budget, applies=None, warmup=0):
+        """
+        Return a wrapper around `fn` which raises AllocationBudgetError
+        if a call allocates more than `budget` bytes. The first `warmup`
+        calls aren't checked, and nor are calls after which `applies()`
+        (if given) returns false.
+        """
+        begin, end = self.begin, self.end
+
+        # Counting down rather than up, since Python allocates integers
+        # above 256 and counting up would blow the budget.
+        remaining = warmup
+
+        def wrapper(*args, **kwargs):
+            nonlocal remaining
+            begin()
+            result = fn(*args, **kwargs)
+            allocated, kept = end()
+            if remaining:
+                remaining -= 1
+            elif allocated > budget and (applies is None or applies()):
+                raise AllocationBudgetError(
+                    "{0} allocated {1} bytes (keeping {2}), over the"
+                    " budget of {3}".format(
+                        getattr(fn, '__qualname__', fn), allocated, kept,
+                        budget
+                    )
+                )
+            return result
+
+        return wrapper
+
+############################################################################
+
+class PhaseTimer:
+    """
+    Records when each phase of something (such as starting up) ends, to
+    show how long each one took. Where the operating system says when
+    the process started (i.e. on Linux), the time taken to get as far as
+    creating the timer is shown as the first phase.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = []
+        try:
+            with open('/proc/self/stat') as f:
+                # The start time is the 22nd field, after the command
+                # name which may contain spaces but is in parentheses.
+                ticks = int(f.read().rpartition(')')[2].split()[19])
+            with open('/proc/uptime') as f:
+                uptime = float(f.read().split()[0])
+        except (OSError, ValueError, IndexError):
+            return
+        # The uptime includes any time spent suspended, unlike our own
+        # clock, so ignore it if it gives a silly answer.
+        elapsed = uptime - ticks / os.sysconf('SC_CLK_TCK')
+        if 0 <= elapsed < 600:
+            self.marks.append(('interpreter', self.start))
+            self.start -= elapsed
+
+    def mark(self, name):
+        """
+        Record the end of the phase called `name`.
+        """
+        self.marks.append((name, time.perf_counter()))
+
+    def format_table(self):
+        """
+        Return the phases as a text table of the milliseconds taken by
+        each, and in total.
+        """
+        rows = [ '{0:24} {1:>8} {2:>8}'.format('', 'ms', 'total') ]
+        last = self.start
+        for name, t in self.marks:
+            rows.append('{0:24} {1:8.1f} {2:8.1f}'.format(
+                name, (t - last) * 1000, (t - self.start) * 1000
+            ))
+            last = t
+        return '\n'.join(rows)
@@ -21,45 +21,131 @@
 
 __version__ = '1.0.0'
 
+# Time each phase of starting up; see --profile-startup.
+from framestats import PhaseTimer
+startup = PhaseTimer()
+
 import kivy
 kivy.require('1.9.0')
 
+try:
+    import config as _conf
+except ImportError:
+    _conf = None
+
+# Kivy's clock wakes up at its maximum frame rate whether or not there's
+# anything to do. In tick mode (see FrameScheduler) there's very little,
+# so lower the cap; it has to be set before kivy.clock is first imported.
+if getattr(_conf, 'frame_mode', 'sweep') == 'tick':
+    from kivy.config import Config
+    Config.set('graphics', 'maxfps', '10')
+
 from kivy.app import App
 from kivy.clock import Clock
-from kivy.graphics.context_instructions import Color
-from kivy.graphics.vertex_instructions import Line, Triangle
+from kivy.core.text import Label as CoreLabel
+from kivy.factory import Factory
+from kivy.graphics.context_instructions import (
+    Color, PopMatrix, PushMatrix, Rotate
+)
+from kivy.graphics.texture import Texture
+from kivy.logger import Logger
+from kivy.graphics.vertex_instructions import (
+    Line, Mesh, Rectangle, Triangle
+)
 from kivy.properties import (
-    NumericProperty, BooleanProperty, ObjectProperty
+    NumericProperty, BooleanProperty, ObjectProperty, StringProperty
 )
 from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.gridlayout import GridLayout
 from kivy.uix.label import Label
 from kivy.uix.relativelayout import RelativeLayout
 from kivy.uix.widget import Widget
+from kivy.utils import escape_markup, get_color_from_hex, get_hex_from_color
 from kivy.vector import Vector
 
+from clockstate import (
+    ClockState, SharedTime, ZonedTime, make_time_source,
+    SUBSECOND, SECOND, MINUTE, HOUR, DAY, BLINK
+)
+from configwatch import FileWatcher
+from cues import Cue, CueScheduler
+from framestats import AllocationMeter, FrameStats
+from texturecache import TextureCache
+startup.mark('import kivy')
+
 from collections import defaultdict
-from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 from functools import partial
-from itertools import chain, cycle
+from itertools import cycle
+import gc
+import importlib
 import math
 import random
+import re
+import threading
+import time
 
 ############################################################################
 
 config = {}
-try:
-    import config as _conf
-except ImportError:
-    _conf = None
 
-config['fonts'] = getattr(_conf, 'fonts', {})
-config['roman_numerals'] = getattr(_conf, 'roman_numerals', (
-    'I', 'II', 'III', 'IV', 'V', 'VI',
-    'VII', 'VIII', 'IX', 'X', 'XI', 'XII'
-))
-config['minus_sign'] = getattr(_conf, 'minus_sign', '-')
-config['em_dash'] = getattr(_conf, 'em_dash', '-')
-config['date_separator'] = getattr(_conf, 'date_separator', '/')
+# The settings which, along with the colours, can be changed while the
+# clock is running; see reload_config().
+_live_defaults = {
+    'fonts': {},
+    'roman_numerals': (
+        'I', 'II', 'III', 'IV', 'V', 'VI',
+        'VII', 'VIII', 'IX', 'X', 'XI', 'XII'
+    ),
+    'minus_sign': '-',
+    'em_dash': '-',
+    'date_separator': '/',
+}
+
+for k, v in _live_defaults.items():
+    config[k] = getattr(_conf, k, v)
+config['glyph_atlas'] = getattr(_conf, 'glyph_atlas', False)
+config['snap_hands'] = getattr(_conf, 'snap_hands', False)
+config['cache_face'] = getattr(_conf, 'cache_face', False)
+config['frame_mode'] = getattr(_conf, 'frame_mode', 'sweep')
+config['frame_rate'] = getattr(_conf, 'frame_rate', 30)
+config['time_offset'] = getattr(_conf, 'time_offset', 0)
+config['time_scale'] = getattr(_conf, 'time_scale', 1)
+config['time_start'] = getattr(_conf, 'time_start', None)
+config['time_step'] = getattr(_conf, 'time_step', None)
+config['time_replay'] = getattr(_conf, 'time_replay', None)
+config['stats'] = getattr(_conf, 'stats', False)
+config['stats_overlay'] = getattr(_conf, 'stats_overlay', False)
+config['stats_log'] = getattr(_conf, 'stats_log', None)
+config['stats_interval'] = getattr(_conf, 'stats_interval', 60)
+config['alloc_debug'] = getattr(_conf, 'alloc_debug', False)
+config['alloc_budget'] = getattr(_conf, 'alloc_budget', 512)
+config['gc_pause'] = getattr(_conf, 'gc_pause', False)
+config['profile_startup'] = getattr(_conf, 'profile_startup', False)
+config['texture_cache'] = getattr(_conf, 'texture_cache', None)
+config['texture_cache_size'] = getattr(
+    _conf, 'texture_cache_size', 32 * 1024 * 1024
+)
+config['prerender_text'] = getattr(_conf, 'prerender_text', False)
+config['segmented_text'] = getattr(_conf, 'segmented_text', False)
+config['fb_device'] = getattr(_conf, 'fb_device', '/dev/fb0')
+config['fb_size'] = getattr(_conf, 'fb_size', None)
+config['fb_format'] = getattr(_conf, 'fb_format', None)
+config['term_size'] = getattr(_conf, 'term_size', None)
+config['term_face'] = getattr(_conf, 'term_face', 'braille')
+config['term_colors'] = getattr(_conf, 'term_colors', 'truecolor')
+config['server_host'] = getattr(_conf, 'server_host', None)
+config['server_port'] = getattr(_conf, 'server_port', 8080)
+config['server_buffer'] = getattr(_conf, 'server_buffer', 65536)
+config['world_clocks'] = getattr(_conf, 'world_clocks', None)
+config['world_clock_columns'] = getattr(_conf, 'world_clock_columns', None)
+config['cues'] = getattr(_conf, 'cues', None)
+config['idle'] = getattr(_conf, 'idle', None)
+config['idle_timeout'] = getattr(_conf, 'idle_timeout', None)
+config['idle_display'] = getattr(_conf, 'idle_display', 'dim')
+config['idle_opacity'] = getattr(_conf, 'idle_opacity', 0.3)
+config['config_watch'] = getattr(_conf, 'config_watch', True)
 _conf_colors = getattr(_conf, 'colors', {})
 
 # Colour data. The idea is that display elements which represent the
@@ -84,6 +170,9 @@ _colors_d = {
     'numerals': (255, 255, 255)
 }
 
+# Kept for reload_config().
+_default_colors = dict(_colors_d)
+
 for k in _colors_d.keys():
     if k in _conf_colors:
         _colors_d[k] = _conf_colors[k]
@@ -99,6 +188,70 @@ for k, v in _colors_d.items():
 
 config['colors'] = _colors_f
 
+# The colours as configured, which cues (see cues.py) change for a while.
+_configured_colors = dict(_colors_d)
+
+def set_colors(colors):
+    """
+    Change some of the colours, given in decimal as in the config file,
+    and rebuild the marked up texts made from them. The dicts above are
+    updated in place, since other modules import them. Returns the set
+    of keys which actually changed, for BKClock.restyle().
+    """
+    changed = set()
+    for k, v in colors.items():
+        if k in _colors_d and tuple(v) != tuple(_colors_d[k]):
+            _colors_d[k] = v
+            _colors_f[k] = (v[0]/255, v[1]/255, v[2]/255)
+            _colors_h[k] = "{:02x}{:02x}{:02x}".format(*v)
+            changed.add(k)
+
+    _rebuild_tables(changed)
+    for cls in HourHand, MinuteHand, SecondHand:
+        cls.color = _colors_f[cls.color_key]
+    return changed
+
+def _rebuild_tables(changed):
+    """
+    Build again only the tables of marked up text which use any of the
+    changed colours or other settings.
+    """
+    for cls in DigitalTime24, DigitalTime12, WordClock, DateDisplay:
+        if changed & cls.style_keys:
+            cls.build_tables()
+
+def reload_config():
+    """
+    Read config.py again, and take in any changes to the colours, fonts
+    and characters; anything else needs a restart. Returns the set of
+    changed keys, for BKClock.restyle(): the names of the settings, and
+    of the colours individually. Displays showing a cue keep its colours.
+    """
+    global _conf
+    try:
+        _conf = importlib.reload(_conf)
+    except Exception:
+        Logger.exception("Config: Couldn't reload config.py")
+        return set()
+
+    changed = set()
+    for k, default in _live_defaults.items():
+        v = getattr(_conf, k, default)
+        if k == 'fonts':
+            # bkclock.kv fills in the default font if it isn't given.
+            v = dict(v)
+            v.setdefault('default', config['fonts']['default'])
+        if v != config[k]:
+            config[k] = v
+            changed.add(k)
+    _rebuild_tables(changed)
+
+    colors = getattr(_conf, 'colors', {})
+    _configured_colors.update(
+        (k, colors.get(k, v)) for k, v in _default_colors.items()
+    )
+    return changed
+
 # Shortcut to get a [color] tag (for label text) from the above data.
 def _c(k, s):
     return "[color={0}]{1}[/color]".format(_colors_h[k], s)
@@ -117,25 +270,299 @@ _c_off = partial(_c, 'off')
 _c_high = partial(_c, 'high')
 
 # Number texts for the word clock, in (capitalized, lowercase) pairs.
-num_strings = list(
-    map(lambda s: (s.capitalize(), s), (
-        "zero", "one", "two", "three", "four", "five", "six", "seven",
-        "eight", "nine", "ten", "eleven", "twelve", "thirteen", "fourteen",
-        "fifteen", "sixteen", "seventeen", "eighteen", "nineteen"
+def _num_strings():
+    strings = list(
+        map(lambda s: (s.capitalize(), s), (
+            "zero", "one", "two", "three", "four", "five", "six", "seven",
+            "eight", "nine", "ten", "eleven", "twelve", "thirteen",
+            "fourteen", "fifteen", "sixteen", "seventeen", "eighteen",
+            "nineteen"
+        )
+    ))
+
+    for stem in "twenty", "thirty", "forty", "fifty":
+        stem_ = stem.capitalize()
+        strings.append((stem_, stem))
+        strings += [(stem_+'-'+s[1],stem+'-'+s[1]) for s in strings[1:10]]
+
+    return strings
+
+############################################################################
+
+# Rendered text can be kept on disk, so that the font is only needed the
+# first time a given text is shown at a given size; see render_text().
+# False until the cache is first wanted, then None if it's turned off.
+_texture_cache = False
+
+def texture_cache():
+    """
+    Return the texture cache, or None if there isn't one.
+    """
+    global _texture_cache
+    if _texture_cache is False:
+        _texture_cache = None
+        if config['texture_cache']:
+            _texture_cache = TextureCache(
+                config['texture_cache'], config['texture_cache_size']
+            )
+    return _texture_cache
+
+# Label options which don't affect the rendered text, or which the cache
+# key covers some other way: the font file by its contents, and the text
+# because a core label only keeps the text it was created with here.
+_uncached_options = (
+    'font_name', 'font_name_r', 'font_context', 'mipmap', 'text'
+)
+
+def _text_key(label):
+    """
+    Return everything but the font file which affects how a core label
+    renders its current text.
+    """
+    return (
+        CoreLabel.__name__, type(label).__name__, label.text,
+        sorted( (k, v) for k, v in label.options.items()
+                if k not in _uncached_options )
     )
-))
 
-for stem in "twenty", "thirty", "forty", "fifty":
-    stem_ = stem.capitalize()
-    num_strings.append((stem_, stem))
-    num_strings += [(stem_+'-'+s[1],stem+'-'+s[1]) for s in num_strings[1:10]]
+# Text can also be rendered ahead of time by a background thread; see
+# CachedLabel.prerender(). The font renderer isn't thread safe, so all
+# of our text is rendered holding this lock, including that of any plain
+# Label which renders while the clock runs (see StatsOverlay).
+_text_lock = threading.Lock()
+_text_worker = None
+
+def text_worker():
+    """
+    Return the executor for rendering text in the background.
+    """
+    global _text_worker
+    if _text_worker is None:
+        _text_worker = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='text'
+        )
+    return _text_worker
+
+def _render(label):
+    """
+    Render a core label's text, returning its texture along with the
+    image data that went into it (or None if there wasn't any).
+    """
+    captured = []
+    render_end = label._render_end
+
+    def capture():
+        data = render_end()
+        captured.append(data)
+        return data
+
+    # The text isn't actually rendered until the texture is first used.
+    label._render_end = capture
+    try:
+        with _text_lock:
+            label.refresh()
+            label.texture.bind()
+    finally:
+        del label._render_end
+    return label.texture, captured[-1] if captured else None
+
+class _Capture:
+    """
+    Stands in for a core label's texture, to catch the image data which
+    would otherwise be uploaded to it.
+    """
+    data = None
+
+    def blit_data(self, data):
+        self.data = data
+
+def _render_data(cls, options, text):
+    """
+    Render `text` as a core label of class `cls` would with the given
+    options, but without a texture, so that it can be done away from
+    the main thread. Returns the image data, or None if there's nothing
+    to show.
+    """
+    with _text_lock:
+        label = cls(**options)
+        label.text = text
+        width, height = label.render()
+        if width <= 1 or height <= 1:
+            return None
+        # As refresh() does, before rendering for real.
+        label._size_texture = label._size = (width, height)
+        label.texture = _Capture()
+        label.render(real=True)
+        return label.texture.data
+
+def _reload_data(data, texture):
+    # The GL context was lost, so the texture needs its pixels again.
+    texture.blit_data(data)
+
+def _reload_text(key, texture):
+    # The GL context was lost, so the texture needs its pixels again.
+    bitmap = texture_cache().load(key)
+    if bitmap is not None:
+        with bitmap:
+            texture.blit_buffer(bitmap.pixels, colorfmt='rgba')
+
+def render_text(label, measure=None):
+    """
+    Render a core label's text, and return its texture along with the
+    result of `measure(label)` (or None), for anything else which needs
+    the font. With a texture cache both come from there if possible, in
+    which case the font isn't touched at all.
+    """
+    cache = texture_cache()
+    if cache is None:
+        texture = _render(label)[0]
+        if measure is None:
+            return texture, None
+        with _text_lock:
+            return texture, measure(label)
+
+    label.resolve_font_name()
+    options = label.options
+    key = cache.key(options['font_name_r'], *_text_key(label))
+
+    bitmap = cache.load(key)
+    if bitmap is not None:
+        with bitmap:
+            texture = Texture.create(
+                size=(bitmap.width, bitmap.height), colorfmt='rgba'
+            )
+            texture.flip_vertical()
+            texture.blit_buffer(bitmap.pixels, colorfmt='rgba')
+        texture.add_reload_observer(partial(_reload_text, key))
+        return texture, bitmap.meta
+
+    texture, data = _render(label)
+    meta = None
+    if measure is not None:
+        with _text_lock:
+            meta = measure(label)
+    if data is not None and data.fmt == 'rgba':
+        cache.store(key, data.width, data.height, data.data, meta)
+    return texture, meta
+
+class CachedLabel(Label):
+    """
+    A Label whose texture comes from the texture cache, when there is
+    one. It can also be told what its next text will be, so that (if
+    prerender_text is set) that's rendered in the background and the
+    change only has to swap textures.
+    """
+    _ahead_text = None
+    _ahead_key = None
+    _ahead = None
 
+    def __init__(self, *args, **kwargs):
+        self._submit = Clock.create_trigger(self.submit_prerender)
+        super().__init__(*args, **kwargs)
+
+    def markup_text(self, text):
+        """
+        Return the text as it's actually rendered. Label colours marked
+        up text by wrapping it in a colour tag, since the colour option
+        doesn't apply to it.
+        """
+        if not self.markup:
+            return text
+        return '[color={0}]{1}[/color]'.format(
+            get_hex_from_color(self.color), text
+        )
+
+    def text_key(self):
+        """
+        Return what identifies the core label's current rendering.
+        """
+        label = self._label
+        label.resolve_font_name()
+        options = label.options
+        return (options['font_name_r'],) + _text_key(label)
+
+    def texture_update(self, *args):
+        label = self._label
+        if not label.text or (
+            texture_cache() is None and not config['prerender_text']
+        ):
+            return super().texture_update(*args)
+
+        label.text = self.markup_text(self.text)
+        self.texture = None
+        if self._ahead is not None and self.text_key() == self._ahead_key:
+            texture = self._ahead
+            self._ahead = self._ahead_key = None
+        else:
+            texture = render_text(label)[0]
+        label.text = self.text
+        self.texture = texture
+        self.texture_size = list(texture.size)
+
+    def prerender(self, text):
+        """
+        Render `text` in the background, ready for when the label is
+        given it. The work is only handed over on the next frame, so as
+        not to compete with rendering this one.
+        """
+        if config['prerender_text'] and text and text != self.text:
+            self._ahead_text = text
+            self._submit()
+
+    def submit_prerender(self, *args):
+        label = self._label
+        current = label.text
+        label.text = self.markup_text(self._ahead_text)
+        key = self.text_key()
+        text, options = label.text, dict(label.options)
+        label.text = current
+        if key == self._ahead_key:
+            return
+
+        # There's no need if the text can be loaded from disk instead.
+        cache = texture_cache()
+        if cache is not None and cache.key(*key) in cache:
+            return
+
+        self._ahead_key = key
+        self._ahead = None
+        future = text_worker().submit(
+            _render_data, type(label), options, text
+        )
+        future.add_done_callback(
+            lambda f: Clock.schedule_once(partial(self.prerendered, key, f))
+        )
+
+    def prerendered(self, key, future, *args):
+        """
+        Upload text rendered in the background to the texture which will
+        be swapped in when the label is given that text.
+        """
+        if key != self._ahead_key:
+            return
+        data = future.result()
+        if data is None:
+            self._ahead_key = None
+            return
+
+        texture = Texture.create(size=data.size, colorfmt=data.fmt)
+        texture.flip_vertical()
+        texture.blit_data(data)
+        texture.add_reload_observer(partial(_reload_data, data))
+        self._ahead = texture
+
+        cache = texture_cache()
+        if cache is not None and data.fmt == 'rgba':
+            cache.store(cache.key(*key), data.width, data.height, data.data)
 
 ############################################################################
 
 class HourLabel(Label):
     """
-    Represents one of the numbers around the clock face.
+    Represents one of the numbers around the clock face. Its texture
+    comes from a TextPool, which is also asked for the other style of
+    numeral at the same time, so flipping between decimal and Roman
+    numbers only swaps one texture for another.
     """
     hour = NumericProperty(0)
     roman = BooleanProperty(False)
@@ -159,36 +586,299 @@ class HourLabel(Label):
 
         return self._pos_offset
 
-    def update(self, *args):
+    def texts(self):
         """
-        Update the label's text and position to match its attributes.
+        Return the (decimal, Roman) texts for the label.
         """
-        if self.roman:
-            self.text = config['roman_numerals'][self.hour-1]
-        else:
-            self.text = str(self.hour)
+        return (str(self.hour), config['roman_numerals'][self.hour-1])
+
+    def texture_update(self, *args):
+        """
+        Pick up the pre-rendered texture for the current text, rather
+        than rendering it.
+        """
+        if not self.hour:
+            return super().texture_update(*args)
 
+        pool = TextPool.get(self.font_name, self.font_size, self.color)
+        textures = [ pool[t] for t in self.texts() ]
+        self.texture = textures[self.roman]
+        self.texture_size = list(self.texture.size)
+
+    def update_text(self, *args):
+        """
+        Update the label's text to match its attributes.
+        """
+        self.text = self.texts()[self.roman]
+
+    def update_position(self, *args):
+        """
+        Update the label's position to match its attributes.
+        """
+        if self.parent is None:
+            return
         offset = self.pos_offset()
         self.center_x = self.parent.width/2 + offset.x
         self.center_y = self.parent.height/2 + offset.y
 
-    on_roman = on_hour = update
+    def update(self, *args):
+        """
+        Update the label's text and position to match its attributes.
+        """
+        self.update_text()
+        self.update_position()
+
+    on_hour = update
+    on_roman = update_text
+
+    # The texture size changes with the font size, so we need to centre
+    # ourselves again, whichever order that happens in relative to the
+    # clock face's resize.
+    on_size = update_position
+
+############################################################################
+
+class GlyphAtlas:
+    """
+    A single texture holding every character the digital displays can
+    show, rendered once for a given font and size. Each glyph is then
+    available as a region of that texture.
+    """
+    glyphs = tuple('0123456789:') + ('am', 'pm')
+    sep = '  '
+
+    # Atlases are shared between displays, but there's no point hanging
+    # on to lots of them for sizes we've long since resized away from.
+    _cache = {}
+    _cache_limit = 8
+
+    @classmethod
+    def get(cls, font_name, font_size):
+        """
+        Return the atlas for the given font and size, creating it if
+        necessary.
+        """
+        key = (font_name, font_size)
+        atlas = cls._cache.get(key)
+        if atlas is None:
+            if len(cls._cache) >= cls._cache_limit:
+                cls._cache.clear()
+            atlas = cls._cache[key] = cls(font_name, font_size)
+        return atlas
+
+    def __init__(self, font_name, font_size):
+        # All the glyphs are rendered as one line of text, spaced out so
+        # that they can't overlap, and then measured to find where each
+        # one ended up (unless the texture cache remembers).
+        label = CoreLabel(
+            text=self.sep.join(self.glyphs),
+            font_name=font_name, font_size=font_size
+        )
+        self.texture, extents = render_text(label, self.measure)
+        self.height = self.texture.height
+
+        self.regions = {}
+        for g, (x, width) in zip(self.glyphs, extents):
+            self.regions[g] = self.texture.get_region(
+                x, 0, width, self.height
+            )
+
+    @classmethod
+    def measure(cls, label):
+        """
+        Return the (x, width) of each glyph in the rendered label.
+        """
+        extents = []
+        prefix = ''
+        for g in cls.glyphs:
+            x = label.get_extents(prefix)[0] if prefix else 0
+            extents.append((x, label.get_extents(g)[0]))
+            prefix += g + cls.sep
+        return extents
+
+class TextPool:
+    """
+    Textures for a set of short texts in one font and size, each one
+    rendered the first time it's asked for and then kept. Unless told
+    otherwise the texts are rendered in white, so that they can be
+    tinted with a Color.
+    """
+    _cache = {}
+    _cache_limit = 16
+
+    @classmethod
+    def get(cls, font_name, font_size, color=(1, 1, 1, 1)):
+        """
+        Return the pool for the given font, size and colour, creating it
+        if necessary.
+        """
+        key = (font_name, font_size, tuple(color))
+        pool = cls._cache.get(key)
+        if pool is None:
+            if len(cls._cache) >= cls._cache_limit:
+                cls._cache.clear()
+            pool = cls._cache[key] = cls(*key)
+        return pool
+
+    def __init__(self, font_name, font_size, color=(1, 1, 1, 1)):
+        self.font_name = font_name
+        self.font_size = font_size
+        self.color = color
+        self.textures = {}
+
+    def __getitem__(self, text):
+        texture = self.textures.get(text)
+        if texture is None:
+            label = CoreLabel(
+                text=text, font_name=self.font_name,
+                font_size=self.font_size, color=self.color
+            )
+            texture = self.textures[text] = render_text(label)[0]
+        return texture
 
 ############################################################################
 
-class DigitalTime(Label):
+class DigitalTime(CachedLabel):
     """
     Base class for the digital clock displays.
+
+    Normally the time is shown as marked up label text. If `glyph_atlas`
+    is set the label text is left empty and each character is instead
+    drawn as a quad textured from a shared GlyphAtlas, so that a tick
+    only swaps texture regions and colours rather than laying out and
+    rasterising the whole string again.
     """
-    def update(self, h, m, s):
+    granularity = SECOND
+    glyph_atlas = BooleanProperty(False)
+
+    # Colour keys for the two states of the blinking colon.
+    blink_keys = ('on', 'off')
+    digits = '0123456789'
+
+    # The colours and other settings the display uses; see restyle().
+    style_keys = frozenset()
+
+    _time = None
+    _atlas = None
+
+    def __init__(self, *args, **kwargs):
+        self._cells = ()
+        self._quads = []
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    def text_for(cls, h, m, s):
+        """
+        Return the marked up text for the specified time. This doesn't
+        need a widget, so that other ways of showing the clock can use
+        it too.
+        """
         raise NotImplementedError(
             "You must implement this method in a subclass."
         )
 
+    def format_time(self, h, m, s):
+        """
+        Return the marked up text for the specified time.
+        """
+        raise NotImplementedError(
+            "You must implement this method in a subclass."
+        )
+
+    def cells(self, h, m, s):
+        """
+        Return a sequence of (colour key, glyph) pairs for the specified
+        time, for drawing from the glyph atlas.
+        """
+        raise NotImplementedError(
+            "You must implement this method in a subclass."
+        )
+
+    def update(self, h, m, s):
+        """
+        Update the display to a new time.
+        """
+        self._time = (h, m, s)
+        if self.glyph_atlas:
+            self._cells = self.cells(h, m, s)
+            self.draw_glyphs()
+        else:
+            self.text = self.format_time(h, m, s)
+            if config['prerender_text']:
+                t = (h*3600 + m*60 + s + 1) % 86400
+                self.prerender(
+                    self.format_time(t // 3600, t // 60 % 60, t % 60)
+                )
+
+    def tick(self, state):
+        """
+        ClockState callback.
+        """
+        self.update(state.hour, state.minute, state.second)
+
+    def restyle(self, changed):
+        """
+        Show the current time again in the changed colours.
+        """
+        if self._time is not None:
+            self.update(*self._time)
+
+    def draw_glyphs(self, *args):
+        """
+        Position the glyph quads for the current time, centred in the
+        widget.
+        """
+        cells, quads = self._cells, self._quads
+        if self._atlas is None:
+            self._atlas = GlyphAtlas.get(self.font_name, self.font_size)
+        regions = self._atlas.regions
+
+        # The instructions only need to be recreated if the number of
+        # characters changes, which is rare.
+        if len(quads) != len(cells):
+            self.canvas.after.clear()
+            with self.canvas.after:
+                quads[:] = [ (Color(), Rectangle()) for c in cells ]
+
+        x = self.center_x - sum(regions[g].width for k, g in cells)/2
+        y = int(self.center_y - self._atlas.height/2)
+        for (k, g), (color, rect) in zip(cells, quads):
+            region = regions[g]
+            color.rgb = _colors_f[k]
+            rect.texture = region
+            rect.pos = (int(x), y)
+            rect.size = region.size
+            x += region.width
+
+    def on_glyph_atlas(self, *args):
+        if not self.glyph_atlas:
+            self.canvas.after.clear()
+            self._quads = []
+        else:
+            self.text = ''
+        if self._time is not None:
+            self.update(*self._time)
+
+    def on_font_name(self, *args):
+        self._atlas = None
+        if self._quads:
+            self.draw_glyphs()
+
+    on_font_size = on_font_name
+
+    def on_pos(self, *args):
+        if self._quads:
+            self.draw_glyphs()
+
+    on_size = on_pos
+
 class DigitalTime24(DigitalTime):
     """
     24-hour digital clock display, with seconds.
     """
+    style_keys = frozenset(('hour', 'minute', 'second', 'on', 'off'))
+
+    @staticmethod
     def _fmt(k):
         return ''.join((
             _c_H('{:02d}'), _c(k,':'),
@@ -196,29 +886,55 @@ class DigitalTime24(DigitalTime):
             _c_S('{:02d}')
         ))
 
-    fmt = (_fmt('on'), _fmt('off'))
-
-    def update(self, h, m, s):
+    @classmethod
+    def build_tables(cls):
         """
-        Update the display to a new time.
+        Build the format strings from the current colours.
         """
-        self.text = self.fmt[s % 2].format(h, m, s)
+        cls.fmt = (cls._fmt('on'), cls._fmt('off'))
+
+    @classmethod
+    def text_for(cls, h, m, s):
+        return cls.fmt[s % 2].format(h, m, s)
+
+    def format_time(self, h, m, s):
+        return self.text_for(h, m, s)
+
+    def cells(self, h, m, s):
+        d, k = self.digits, self.blink_keys[s % 2]
+        return (
+            ('hour', d[h // 10]), ('hour', d[h % 10]), (k, ':'),
+            ('minute', d[m // 10]), ('minute', d[m % 10]), (k, ':'),
+            ('second', d[s // 10]), ('second', d[s % 10])
+        )
 
 class DigitalTime12(DigitalTime):
     """
     12-hour digital clock display, without seconds.
     """
+    # Without seconds the text only changes on the minute, or when the
+    # colon blinks.
+    granularity = MINUTE | BLINK
+    style_keys = frozenset(('hour', 'minute', 'ampm', 'on', 'off'))
+
+    @staticmethod
     def _fmt(k):
         return ''.join((
             _c_H('{:d}'), _c(k,':'),
             _c_M('{:02d}'), _c_am('{:s}')
         ))
 
-    fmt = (_fmt('on'), _fmt('off'))
+    @classmethod
+    def build_tables(cls):
+        """
+        Build the format strings from the current colours.
+        """
+        cls.fmt = (cls._fmt('on'), cls._fmt('off'))
 
-    def update(self, h, m, s):
+    @staticmethod
+    def _12h(h):
         """
-        Update the display to a new time.
+        Convert a 24-hour value to a 12-hour value and am/pm.
         """
         if h >= 12:
             ampm = "pm"
@@ -229,7 +945,29 @@ class DigitalTime12(DigitalTime):
         if h == 0:
             h = 12
 
-        self.text = self.fmt[s % 2].format(h, m, ampm)
+        return h, ampm
+
+    @classmethod
+    def text_for(cls, h, m, s):
+        h, ampm = cls._12h(h)
+        return cls.fmt[s % 2].format(h, m, ampm)
+
+    def format_time(self, h, m, s):
+        return self.text_for(h, m, s)
+
+    def cells(self, h, m, s):
+        d, k = self.digits, self.blink_keys[s % 2]
+        h, ampm = self._12h(h)
+        cells = (
+            ('hour', d[h % 10]), (k, ':'),
+            ('minute', d[m // 10]), ('minute', d[m % 10]), ('ampm', ampm)
+        )
+        if h >= 10:
+            cells = (('hour', d[h // 10]),) + cells
+        return cells
+
+DigitalTime24.build_tables()
+DigitalTime12.build_tables()
 
 ############################################################################
 
@@ -238,62 +976,198 @@ class ClockHand(Widget):
     Base class for the clock hands.
     """
     alpha = 0.6
-    rim_text = ObjectProperty(None)
+    rim_font_name = StringProperty('')
+    rim_font_size = NumericProperty(15)
+
+    # Texts for the label on the clock rim, which shows the hand's value
+    # in whole units.
+    rim_texts = tuple( "{0:02d}".format(i) for i in range(60) )
+
+    # If set, the hand's points are rotated in Python and rounded to
+    # whole pixels every time it moves. Otherwise it is drawn upright
+    # once and the GPU rotates it into position.
+    snap = BooleanProperty(False)
+
+    # In a grid of clocks, the HandBatch which draws the hand along with
+    # those of the same kind on the other clocks.
+    batch = None
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.hand = None
+        self.hand_color = None
+        self.rotation = None
         self.angle = 0
+        self.value = 0
+        self.min_step = 0
+        self._rim_pool = None
+        self._rim_value = None
 
-    def points(self):
+    def points(self, angle=None, snap=True):
         """
-        Calculate the points needed to draw the hand at its current
-        angle.
+        Calculate the points needed to draw the hand at the specified
+        angle, which defaults to its current angle.
         """
-        rotated = [ v.rotate(self.angle) for v in self.point_vectors ]
+        if angle is None:
+            angle = self.angle
+        a = math.radians(angle)
+        cos, sin = math.cos(a), math.sin(a)
 
         # Index 0 is the outside point, while the others are at the
         # spindle end.
-        rotated[0] *= self.parent.radius
-        for r in rotated[1:]:
-            r *= self.parent.min_wh() / 60
-
-        # Add the centre offset, convert from a list of vectors to a
-        # flat list, and round to integer values to avoid distracting
-        # aliasing effects.
-        center = (self.parent.width/2, self.parent.height/2)
-        points = map(int, chain.from_iterable(
-            [ v+center for v in rotated ]
-        ))
-
-        return list(points)
+        face = self.parent
+        outer, inner = face.radius, face.min_wh() / 60
+        (x0, y0), (x1, y1), (x2, y2) = self.point_vectors
+
+        # Rotate and scale each point, add the centre offset, and
+        # (unless told not to) round to integer values to avoid
+        # distracting aliasing effects.
+        cx, cy = face.width/2, face.height/2
+        points = [
+            cx + outer*(x0*cos - y0*sin), cy + outer*(y0*cos + x0*sin),
+            cx + inner*(x1*cos - y1*sin), cy + inner*(y1*cos + x1*sin),
+            cx + inner*(x2*cos - y2*sin), cy + inner*(y2*cos + x2*sin)
+        ]
+        if snap:
+            points = list(map(int, points))
+
+        return points
+
+    def visible_step(self):
+        """
+        Return the smallest change of angle, in degrees, that moves the
+        rim label (the part furthest from the centre) by a quarter of a
+        pixel.
+        """
+        r = self.parent.radius * 1.1
+        return math.degrees(0.25 / r) if r else 0
 
     def update(self, value):
         """
         Update the hand to the specified value.
         """
-        self.angle = -value * self.unit_angle
-        if self.hand is not None:
-            points = self.points()
-            self.hand.points = points
+        self.value = value
+        angle = -value * self.unit_angle
+        if self.hand is None and self.batch is None:
+            self.angle = angle
+            return
+
+        # The sweeping hands move by a tiny fraction of a pixel on each
+        # frame, so leave the instructions alone (which saves Kivy
+        # recalculating them) until the movement would be visible.
+        if (abs(angle - self.angle) < self.min_step
+                and math.floor(value) == self._rim_value):
+            return
+
+        self.angle = angle
+        if self.batch is not None:
+            self.batch.move(
+                self._batch_index, self.points(snap=self.snap),
+                self.parent.pos
+            )
+        elif self.rotation is None:
+            self.hand.points = self.points()
+        else:
+            self.rotation.angle = angle
 
-            # Update the label on the clock rim
-            center = (self.parent.width/2, self.parent.height/2)
-            v = Vector(0, 1).rotate(self.angle)
-            v *= self.parent.radius * 1.1
-            self.rim_text.center = v + center
-            self.rim_text.text = "{0:02d}".format(math.floor(value))
+        self.update_rim(value)
+
+    def update_rim(self, value):
+        """
+        Move the label on the clock rim to the hand's current angle,
+        swapping in the texture for its value if that has changed.
+        """
+        face = self.parent
+        texture = self.rim_face.texture
+        whole = math.floor(value)
+        if whole != self._rim_value or texture is None:
+            if self._rim_pool is None:
+                self._rim_pool = TextPool.get(
+                    self.rim_font_name, self.rim_font_size
+                )
+            texture = self._rim_pool[self.rim_texts[whole % 60]]
+            self.rim_face.texture = texture
+            self.rim_face.size = texture.size
+            self._rim_value = whole
+
+        # Work out the centre point without going via Vector, since this
+        # happens on every frame for the sweeping hands.
+        a = math.radians(self.angle)
+        r = face.radius * 1.1
+        x = face.width/2 - r*math.sin(a)
+        y = face.height/2 + r*math.cos(a)
+
+        # The background is padded out around the text.
+        w = texture.width + face.height/25
+        h = texture.height + face.height/37.5
+        self.rim_back.pos = (x - w/2, y - h/2)
+        self.rim_back.size = (w, h)
+        self.rim_face.pos = (int(x - texture.width/2), int(y - texture.height/2))
+
+    def on_rim_font_name(self, *args):
+        self._rim_pool = None
+        self._rim_value = None
+
+    on_rim_font_size = on_rim_font_name
 
     def construct(self):
         """
         Create the instructions to draw the hand.
         """
+        # The rim label goes underneath the hand.
+        with self.canvas:
+            self.rim_back_color = Color(
+                self.color[0], self.color[1], self.color[2], 0.5,
+                mode='rgba'
+            )
+            self.rim_back = Rectangle()
+            self.rim_face_color = Color(*config['colors']['rim_text'])
+            self.rim_face = Rectangle(texture=None)
+
+        self.min_step = self.visible_step()
+        batches = self.parent.hand_batches
+        if batches is not None:
+            self.batch = batches[type(self)]
+            self._batch_index = self.batch.add()
+            return
         with self.canvas.after:
-            Color(
+            self.hand_color = Color(
                 self.color[0], self.color[1], self.color[2], self.alpha,
                 mode='rgba'
             )
-            self.hand = Triangle(points=self.points())
+            if self.snap:
+                self.hand = Triangle(points=self.points())
+            else:
+                PushMatrix()
+                self.rotation = Rotate(
+                    angle=self.angle,
+                    origin=(self.parent.width/2, self.parent.height/2)
+                )
+                self.hand = Triangle(points=self.points(0, snap=False))
+                PopMatrix()
+
+    def refresh(self, *args):
+        """
+        Redraw the hand at its current value, e.g. after a resize.
+        """
+        # The upright shape only depends on the size of the clock.
+        if self.rotation is not None:
+            self.rotation.origin = (self.parent.width/2, self.parent.height/2)
+            self.hand.points = self.points(0, snap=False)
+        self.min_step = self.visible_step()
+        self._rim_value = None
+        self.update(self.value)
+
+    def restyle(self, changed):
+        """
+        Change the colours of the instructions, after set_colors().
+        """
+        if self.color_key in changed:
+            self.rim_back_color.rgb = self.color
+            if self.hand_color is not None:
+                self.hand_color.rgb = self.color
+        if 'rim_text' in changed:
+            self.rim_face_color.rgb = _colors_f['rim_text']
 
 class HourHand(ClockHand):
     """
@@ -301,7 +1175,8 @@ class HourHand(ClockHand):
     """
     unit_angle = 30
     point_vectors = (Vector(0, 0.6), Vector(-1, -2), Vector(1, -2))
-    color = _colors_f['hour']
+    color_key = 'hour'
+    color = _colors_f[color_key]
 
 class MinuteHand(ClockHand):
     """
@@ -309,7 +1184,8 @@ class MinuteHand(ClockHand):
     """
     unit_angle = 6
     point_vectors = (Vector(0, 0.95), Vector(-0.5, -2), Vector(0.5, -2))
-    color = _colors_f['minute']
+    color_key = 'minute'
+    color = _colors_f[color_key]
 
 class SecondHand(ClockHand):
     """
@@ -317,7 +1193,8 @@ class SecondHand(ClockHand):
     """
     unit_angle = 6
     point_vectors = (Vector(0, 0.95), Vector(-0.25, -2), Vector(0.25, -2))
-    color = _colors_f['second']
+    color_key = 'second'
+    color = _colors_f[color_key]
 
 ############################################################################
 
@@ -326,21 +1203,43 @@ class ClockFace(RelativeLayout):
     Analogue clock display.
     """
     radius = NumericProperty(0)
+    granularity = SUBSECOND
+
+    # If set, the parts of the face which rarely change are rendered
+    # into an Fbo and drawn from there.
+    cache_face = BooleanProperty(False)
+
+    # In a grid of clocks, the HandBatch for each kind of hand, which
+    # draws them instead of the hands themselves.
+    hand_batches = None
+
+    style_keys = frozenset((
+        'hour', 'minute', 'second', 'rim', 'rim_text', 'numerals',
+        'roman_numerals'
+    ))
 
     def __init__(self, *args, **kwargs):
         self.hour_labels = []
+        self.face_fbo = None
+        self.face_owner = None
+        self._flip_index = 0
+        self._flip_to = True
+        self._flip_event = None
         super().__init__(*args, **kwargs)
 
     def min_wh(self):
         return min(self.width, self.height)
 
-    def update(self, hours, minutes, seconds, microseconds):
+    def update(self, hours, minutes, seconds, fraction=0.0,
+               second_hand=True):
         """
-        Update all the clock hands to the specified values.
+        Update the clock hands to the specified values, where `fraction`
+        is the part of the current second which has passed. The second
+        hand is left alone if `second_hand` is false.
         """
         # We want fractional values for the hour and minute hands so
         # that they display the correct in-between position.
-        s = seconds + microseconds/1000000
+        s = seconds + fraction
         m = minutes + s/60
         h = hours % 24 + m/60
 
@@ -349,7 +1248,44 @@ class ClockFace(RelativeLayout):
 
         # However, for the second hand we stick to whole numbers in
         # order to have a visible tick.
-        self.second_hand.update(seconds)
+        if second_hand:
+            self.second_hand.update(seconds)
+
+    def tick(self, state):
+        """
+        ClockState callback. The hour and minute hands sweep so they
+        move on every tick, but the second hand only needs to move when
+        the second changes.
+        """
+        self.update(
+            state.hour, state.minute, state.second, state.fraction,
+            state.changed & SECOND
+        )
+
+    def refresh_hands(self, *args):
+        """
+        Redraw all the hands at their current values.
+        """
+        self.hour_hand.refresh()
+        self.minute_hand.refresh()
+        self.second_hand.refresh()
+
+    def restyle(self, changed):
+        """
+        Change the colours of the face and the hands, after set_colors(),
+        and the Roman numerals, after reload_config(). If the face is
+        cached in an Fbo it renders again by itself.
+        """
+        if 'rim' in changed:
+            self.rim_color.rgb = _colors_f['rim']
+        if 'numerals' in changed:
+            for hl in self.hour_labels:
+                hl.color = _colors_f['numerals'] + (1.0,)
+        if 'roman_numerals' in changed:
+            for hl in self.hour_labels:
+                hl.update_text()
+        for hand in self.hour_hand, self.minute_hand, self.second_hand:
+            hand.restyle(changed)
 
     def update_hour_labels(self, *args):
         """
@@ -358,32 +1294,35 @@ class ClockFace(RelativeLayout):
         for hl in self.hour_labels:
             hl.update()
 
-    def flip_next_hour_label(self, seq, flip_to, *args):
+    def flip_next_hour_label(self, *args):
         """
-        Callback. Flips the next label in sequence.
+        Callback. Flips the next label in sequence, and schedules itself
+        again for the one after that. There is only ever one of these
+        pending, whether within a sequence or between sequences.
         """
-        hour = next(seq)
-        hl = self.hour_labels[hour]
-        hl.roman = flip_to
-        return hour < 11
+        hl = self.hour_labels[self._flip_index]
+        hl.roman = self._flip_to
+        self._flip_index = (self._flip_index + 1) % 12
+
+        if self._flip_index:
+            interval = 0.05
+        else:
+            # Schedule the next flip sequence after a random interval.
+            self._flip_to = not self._flip_to
+            interval = random.randint(20,700)/100
+
+        self._flip_event = Clock.schedule_once(
+            self.flip_next_hour_label, interval
+        )
 
     def flip_hour_labels(self, *args):
         """
         Kick off the sequence of flipping the hour labels from decimal
         to Roman numbers, or vice versa.
         """
-        seq = iter(range(0,12))
-        flip_to = not self.hour_labels[0].roman
-
-        # Partial instantiation of the callback function essentially
-        # creates a closure around the above variables.
-        fn = partial(self.flip_next_hour_label, seq, flip_to)
-        Clock.schedule_interval(fn, 0.05)
-
-        # Schedule the next flip sequence after a random interval.
-        interval = random.randint(20,700)/100
-        Clock.schedule_once(self.flip_hour_labels, interval)
-        return True
+        self._flip_index = 0
+        self._flip_to = not self.hour_labels[0].roman
+        self.flip_next_hour_label()
 
     def start(self):
         """
@@ -404,6 +1343,12 @@ class ClockFace(RelativeLayout):
         # Sort the hour labels into numerical order.
         self.hour_labels = sorted(self.hour_labels, key=lambda h:h.hour)
 
+        # Keep hold of the rim's colour, which may be moved into an Fbo.
+        self.rim_color = next(
+            instr for instr in self.canvas.before.get_group('static')
+            if isinstance(instr, Color)
+        )
+
         # The labels are set initially fully transparent to avoid the
         # irritating flash from them being initially in the wrong place.
         for hl in self.hour_labels:
@@ -414,100 +1359,424 @@ class ClockFace(RelativeLayout):
         self.minute_hand.construct()
         self.second_hand.construct()
 
+        if self.cache_face:
+            self.cache_static_face()
+
         # Schedule our first switch from decimal to Roman numbers.
-        Clock.schedule_once(self.flip_hour_labels, 7)
+        self.start_flipping()
+
+    def start_flipping(self):
+        """
+        Start flipping the hour labels every so often, the first time
+        after a few seconds.
+        """
+        if self.hour_labels:
+            self._flip_event = Clock.schedule_once(self.flip_hour_labels, 7)
+
+    def stop_flipping(self):
+        """
+        Stop flipping the hour labels, leaving them as they are.
+        """
+        Clock.unschedule(self.flip_hour_labels)
+        if self._flip_event is not None:
+            self._flip_event.cancel()
+
+    def cache_static_face(self):
+        """
+        Move the drawing of the rim and the hour labels into an Fbo, so
+        that they are drawn as a single texture. The Fbo only renders
+        again when one of its instructions changes, which is to say on
+        a resize or when a numeral flips.
+        """
+        # This is optional, so only import it if it's wanted.
+        from kivy.graphics.fbo import Fbo
+        from kivy.graphics.gl_instructions import ClearBuffers, ClearColor
+
+        self.face_fbo = Fbo(size=self.size)
+
+        # Clearing to opaque black (like the window) rather than
+        # transparent avoids fringes on the antialiased edges when the
+        # texture is blended back in.
+        with self.face_fbo:
+            ClearColor(0, 0, 0, 1)
+            ClearBuffers()
+
+        for instr in self.canvas.before.get_group('static'):
+            self.canvas.before.remove(instr)
+            self.face_fbo.add(instr)
+
+        for hl in self.hour_labels:
+            self.canvas.remove(hl.canvas)
+            self.face_fbo.add(hl.canvas)
+
+        self.canvas.before.add(self.face_fbo)
+        with self.canvas.before:
+            Color(1, 1, 1, 1)
+            self.face_rect = Rectangle(
+                size=self.size, texture=self.face_fbo.texture
+            )
+
+    def share_static_face(self, owner):
+        """
+        Draw the rim and the hour labels from the Fbo of another face of
+        the same size (see cache_static_face()), rather than our own.
+        Our hour labels are no longer drawn or updated, and only the
+        owner's flip.
+        """
+        self.face_owner = owner
+        for instr in self.canvas.before.get_group('static'):
+            self.canvas.before.remove(instr)
+        for hl in self.hour_labels:
+            self.canvas.remove(hl.canvas)
+        self.hour_labels = []
+        Clock.unschedule(self.flip_hour_labels)
+
+        with self.canvas.before:
+            Color(1, 1, 1, 1)
+            self.face_rect = Rectangle(
+                size=self.size, texture=owner.face_fbo.texture
+            )
+
+    def update_shared_face(self, *args):
+        # After a resize the owner's Fbo has a new texture.
+        self.face_rect.size = self.size
+        self.face_rect.texture = self.face_owner.face_fbo.texture
 
     def on_size(self, *args):
         Clock.schedule_once(self.update_hour_labels, -1)
+        Clock.schedule_once(self.refresh_hands, -1)
+
+        if self.face_fbo is not None:
+            self.face_fbo.size = self.size
+            self.face_rect.size = self.size
+            self.face_rect.texture = self.face_fbo.texture
+        elif self.face_owner is not None:
+            Clock.schedule_once(self.update_shared_face, -1)
+
+    def on_pos(self, *args):
+        # Batched hands are drawn by the grid, so they move with us.
+        if self.hand_batches is not None:
+            Clock.schedule_once(self.refresh_hands, -1)
 
 ############################################################################
 
-class WordClock(Label):
+class SegmentedLabel(CachedLabel):
     """
-    Clock displaying the time in English words.
+    Base class for the displays with long marked up texts.
+
+    Normally the text is shown as one label texture. If `segmented` is
+    set the label text is left empty and each run of text in a single
+    colour and size is instead drawn as a quad with its own texture from
+    a TextPool, rendered in white and tinted, so that a new text only
+    renders the runs which haven't been seen before. Only the color and
+    size tags are understood, and lines are only broken at newlines
+    (which is all that the Label does here, as it has no text_size).
     """
-    # Some shorthand in the name of DRY.
-    Hh = _c_H("{h}")
-    Hh_ = _c_H("{h_}")
-    HH = _c_H("{H}")
-    past = _c_on(" past ") + Hh
-    to = _c_on(" to ") + Hh_
-
-    # Create a table with texts for each minute of the hour, initialised
-    # with a suitably generic version so we don't have to specify them
-    # all.
-    _m_past = _c_M("{M}") + _c_on(" minutes past ") + Hh
-    _m_to = _c_M("{M_}") + _c_on(" minutes to ") + Hh_
-    time_strings = [_m_past]*30 + [_m_to]*30
-
-    _m_after = ' '.join((
-        _c_M("{MM}"), _c_on("minutes after"),
-        _c_H("{HH}"), _c_on("o'clock"), _c_off(config['em_dash']),
-        _c_high("60 "+config['minus_sign']), _c_M("{MM}"),
-        _c_high("="), _c_M("{MM_}")
-    ))
+    segmented = BooleanProperty(False)
 
-    _m_until = ' '.join((
-        _c_high("60 "+config['minus_sign']), _c_M("{MM}"),
-        _c_high("="), _c_M("{MM_}"), _c_on("minutes until"),
-        _c_H("{HH_}"), _c_on("o'clock")
-    ))
+    tag = re.compile(r'\[(/?)(color|size)(?:=([^\]]*))?\]')
+    escapes = (('&bl;', '['), ('&br;', ']'), ('&amp;', '&'))
 
-    alt_time_strings = [''] + [_m_until]*29 + [_m_after]*30
+    # The colours used are few, so there's no need to convert each one
+    # from hex more than once.
+    _colors = {}
 
-    # Texts for (almost) on the hour.
-    time_strings[0] = ' '.join((_c_H("{H}"), _c_M("o'clock")))
-    time_strings[1] = ' '.join((
-        _c_on("Just gone"), Hh, _c_M("o'clock")
-    ))
-    time_strings[59] = ' '.join((
-        _c_on("Almost"), Hh_, _c_M("o'clock")
+    _source = None
+
+    def __init__(self, *args, **kwargs):
+        self._lines = ()
+        self._quads = []
+        super().__init__(*args, **kwargs)
+
+    def show(self, text):
+        """
+        Show the marked up text, one way or the other.
+        """
+        self._source = text
+        if self.segmented:
+            self._lines = self.parse(text)
+            self.draw_segments()
+        else:
+            self.text = text
+
+    def prerender(self, text):
+        if not self.segmented:
+            super().prerender(text)
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Split marked up text into lines, each a pair of the size at the
+        start of the line and a list of (colour, size, text) runs. The
+        colours and sizes are None where the text doesn't give them.
+        """
+        lines = [ (None, []) ]
+        colors, sizes = [ None ], [ None ]
+        pos = 0
+        while True:
+            match = cls.tag.search(text, pos)
+            chunk = text[pos:match.start() if match else len(text)]
+            for i, part in enumerate(chunk.split('\n')):
+                if i:
+                    lines.append((sizes[-1], []))
+                if part:
+                    for escape, c in cls.escapes:
+                        part = part.replace(escape, c)
+                    lines[-1][1].append((colors[-1], sizes[-1], part))
+            if match is None:
+                return lines
+
+            pos = match.end()
+            close, tag, value = match.groups()
+            stack = colors if tag == 'color' else sizes
+            if close:
+                if len(stack) > 1:
+                    stack.pop()
+            elif tag == 'color':
+                color = cls._colors.get(value)
+                if color is None:
+                    color = cls._colors[value] = tuple(
+                        get_color_from_hex(value)
+                    )
+                stack.append(color)
+            else:
+                stack.append(int(float(value)))
+
+    def draw_segments(self, *args):
+        """
+        Position the quads for the runs of text, with each line centred
+        and the lines together centred in the widget.
+        """
+        lines, quads = self._lines, self._quads
+        font_name, font_size = self.font_name, self.font_size
+
+        # The instructions only need to be recreated if the number of
+        # runs changes.
+        n = sum(len(runs) for size, runs in lines)
+        if len(quads) != n:
+            self.canvas.after.clear()
+            with self.canvas.after:
+                quads[:] = [ (Color(), Rectangle()) for i in range(n) ]
+
+        # As with the Label, a line is at least as high as a line of text
+        # in the size at its start, and smaller runs sit a fifth of the
+        # difference in height above its bottom.
+        layout = []
+        for start, runs in lines:
+            textures = [
+                TextPool.get(font_name, size or font_size)[text]
+                for color, size, text in runs
+            ]
+            height = max(
+                [ t.height for t in textures ]
+                + [ TextPool.get(font_name, start or font_size)[' '].height ]
+            )
+            layout.append((textures, sum(t.width for t in textures), height))
+
+        # Rounded in the same way as the Label's texture and its lines.
+        i = 0
+        widest = max(w for t, w, h in layout)
+        left = int(self.center_x - widest/2)
+        y = self.center_y + sum(h for t, w, h in layout)/2
+        for (start, runs), (textures, width, height) in zip(lines, layout):
+            y -= height
+            x = left + int((widest - width)/2)
+            for (color, size, text), texture in zip(runs, textures):
+                c, rect = quads[i]
+                c.rgba = color or self.color
+                rect.texture = texture
+                rect.pos = (int(x), int(y + (height - texture.height)/5))
+                rect.size = texture.size
+                x += texture.width
+                i += 1
+
+    def on_segmented(self, *args):
+        if self.segmented:
+            self.text = ''
+        else:
+            self.canvas.after.clear()
+            self._quads = []
+        if self._source is not None:
+            self.show(self._source)
+
+    def on_pos(self, *args):
+        if self._quads:
+            self.draw_segments()
+
+    on_size = on_pos
+    on_color = on_pos
+    on_font_name = on_pos
+    on_font_size = on_pos
+
+class WordClock(SegmentedLabel):
+    """
+    Clock displaying the time in English words.
+    """
+    granularity = MINUTE
+    style_keys = frozenset((
+        'hour', 'minute', 'ampm', 'on', 'off', 'high',
+        'minus_sign', 'em_dash'
     ))
+    _time = None
+    _texts = None
+
+    # A cue (see cues.py) to show in place of the small line of text.
+    cue = StringProperty('')
+
+    # The tables are built by the functions below, on first use rather
+    # than at startup; see build_tables().
+    num_strings = None
+    time_strings = None
+    alt_time_strings = None
+    ampm_strings = None
+    ampm_table = None
+
+    # Texts for each minute of the hour.
+    @staticmethod
+    def _time_strings():
+        # Some shorthand in the name of DRY.
+        Hh = _c_H("{h}")
+        Hh_ = _c_H("{h_}")
+        past = _c_on(" past ") + Hh
+        to = _c_on(" to ") + Hh_
+
+        # Create a table with texts for each minute of the hour,
+        # initialised with a suitably generic version so we don't have
+        # to specify them all.
+        m_past = _c_M("{M}") + _c_on(" minutes past ") + Hh
+        m_to = _c_M("{M_}") + _c_on(" minutes to ") + Hh_
+        time_strings = [m_past]*30 + [m_to]*30
+
+        # Texts for (almost) on the hour.
+        time_strings[0] = ' '.join((_c_H("{H}"), _c_M("o'clock")))
+        time_strings[1] = ' '.join((
+            _c_on("Just gone"), Hh, _c_M("o'clock")
+        ))
+        time_strings[59] = ' '.join((
+            _c_on("Almost"), Hh_, _c_M("o'clock")
+        ))
 
-    # And similarly for the quarter hours.
-    time_strings[15] = _c_M("Quarter past") + " " + Hh
-    time_strings[45] = _c_M("Quarter to")   + " " + Hh_
-    time_strings[30] = _c_M("Half past")    + " " + Hh
-    time_strings[29] = _c_on("Almost ")     + _c_M("half past") + " " + Hh
-    time_strings[31] = _c_on("Just gone ")  + _c_M("half past") + " " + Hh
-
-    # Spelled out versions for the remaining 5 minute intervals.
-    time_strings[5]  = _c_M("Five")        + past
-    time_strings[10] = _c_M("Ten")         + past
-    time_strings[20] = _c_M("Twenty")      + past
-    time_strings[25] = _c_M("Twenty-five") + past
-    time_strings[35] = _c_M("Twenty-five") + to
-    time_strings[40] = _c_M("Twenty")      + to
-    time_strings[50] = _c_M("Ten")         + to
-    time_strings[55] = _c_M("Five")        + to
-
-    # Texts for the “in the afternoon” bit.
-    _midnight  = _c_am("midnight")
-    _night     = ' '.join( (_c_on("at"), _c_am("night")) )
-    _evening   = ' '.join( (_c_on("in the"), _c_am("evening")) )
-    _afternoon = ' '.join( (_c_on("in the"), _c_am("afternoon")) )
-    _midday    = _c_am("midday")
-    _morning   = ' '.join( (_c_on("in the"), _c_am("morning")) )
-    _early     = ' '.join( (_c_on("in the early"), _c_am("morning")) )
-
-    # Map parts of the day to their text; see update() below.
-    ampm_strings = [
-        (1439, _midnight),
-        (1260, _night),
-        ( 990, _evening),
-        ( 722, _afternoon),
-        ( 719, _midday),
-        ( 360, _morning),
-        ( 180, _early),
-        (   2, _night),
-        (  -1, _midnight)
-    ]
+        # And similarly for the quarter hours.
+        time_strings[15] = _c_M("Quarter past") + " " + Hh
+        time_strings[45] = _c_M("Quarter to")   + " " + Hh_
+        time_strings[30] = _c_M("Half past")    + " " + Hh
+        time_strings[29] = _c_on("Almost ")     + _c_M("half past") + " " + Hh
+        time_strings[31] = _c_on("Just gone ")  + _c_M("half past") + " " + Hh
+
+        # Spelled out versions for the remaining 5 minute intervals.
+        time_strings[5]  = _c_M("Five")        + past
+        time_strings[10] = _c_M("Ten")         + past
+        time_strings[20] = _c_M("Twenty")      + past
+        time_strings[25] = _c_M("Twenty-five") + past
+        time_strings[35] = _c_M("Twenty-five") + to
+        time_strings[40] = _c_M("Twenty")      + to
+        time_strings[50] = _c_M("Ten")         + to
+        time_strings[55] = _c_M("Five")        + to
+
+        return time_strings
+
+    @staticmethod
+    def _alt_time_strings():
+        m_after = ' '.join((
+            _c_M("{MM}"), _c_on("minutes after"),
+            _c_H("{HH}"), _c_on("o'clock"), _c_off(config['em_dash']),
+            _c_high("60 "+config['minus_sign']), _c_M("{MM}"),
+            _c_high("="), _c_M("{MM_}")
+        ))
+
+        m_until = ' '.join((
+            _c_high("60 "+config['minus_sign']), _c_M("{MM}"),
+            _c_high("="), _c_M("{MM_}"), _c_on("minutes until"),
+            _c_H("{HH_}"), _c_on("o'clock")
+        ))
+
+        return [''] + [m_until]*29 + [m_after]*30
+
+    # Texts for the “in the afternoon” bit, mapped from the parts of
+    # the day; see update() below.
+    @staticmethod
+    def _ampm_strings():
+        midnight  = _c_am("midnight")
+        night     = ' '.join( (_c_on("at"), _c_am("night")) )
+        evening   = ' '.join( (_c_on("in the"), _c_am("evening")) )
+        afternoon = ' '.join( (_c_on("in the"), _c_am("afternoon")) )
+        midday    = _c_am("midday")
+        morning   = ' '.join( (_c_on("in the"), _c_am("morning")) )
+        early     = ' '.join( (_c_on("in the early"), _c_am("morning")) )
+
+        return [
+            (1439, midnight),
+            (1260, night),
+            ( 990, evening),
+            ( 722, afternoon),
+            ( 719, midday),
+            ( 360, morning),
+            ( 180, early),
+            (   2, night),
+            (  -1, midnight)
+        ]
+
+    # The same, indexed by minute of the day so we needn't search.
+    @staticmethod
+    def _ampm_table(ampm_strings):
+        return [
+            next(text for start, text in ampm_strings if mins >= start)
+            for mins in range(1440)
+        ]
+
+    @classmethod
+    def build_tables(cls):
+        """
+        Build the tables of texts from the current colours. This is done
+        when they're first needed, and again if the colours change.
+        """
+        cls.num_strings = _num_strings()
+        cls.time_strings = cls._time_strings()
+        cls.alt_time_strings = cls._alt_time_strings()
+        cls.ampm_strings = cls._ampm_strings()
+        cls.ampm_table = cls._ampm_table(cls.ampm_strings)
 
     def update(self, h, m):
         """
         Update the word clock display with the specified hour and minute
-        values.
+        values. The text for each minute of the day is only assembled
+        the first time it is needed, and then kept until the font size
+        changes.
+        """
+        self._time = (h, m)
+        if self._texts is None:
+            self._texts = [None] * 1440
+
+        mins = h*60 + min(59, m)
+        text = self._texts[mins]
+        if text is None:
+            text = self._texts[mins] = self.format_time(h, m)
+        self.show(text)
+
+        if config['prerender_text']:
+            mins = (mins + 1) % 1440
+            text = self._texts[mins]
+            if text is None:
+                text = self._texts[mins] = self.format_time(*divmod(mins, 60))
+            self.prerender(text)
+
+    def format_time(self, h, m):
         """
+        Return the marked up text for the specified hour and minute.
+        """
+        return self.text_for(h, m, self.font_size, self.cue)
+
+    @classmethod
+    def text_for(cls, h, m, font_size, cue=None):
+        """
+        Return the marked up text for the specified hour and minute, at
+        the given font size, without needing a widget. If there's a cue
+        it takes the place of the small line of text.
+        """
+        if cls.time_strings is None:
+            cls.build_tables()
+        num_strings = cls.num_strings
+
         hour = h % 12
         hour_ = hour + 1
         if hour==0:
@@ -531,40 +1800,68 @@ class WordClock(Label):
             'MM_': minute_
         }
 
-        # Loop through until we find the right timeframe.
-        mins = h*60 + m
-        for start, text in self.ampm_strings:
-            if mins >= start:
-                ampm = text
-                break
+        ampm = cls.ampm_table[h*60 + minute]
 
         # And then do final assembly of the text.
-        small = math.ceil(self.font_size * 0.67)
-        alt_text = self.alt_time_strings[minute].format(**values).strip()
-        if alt_text:
-            alt_text = ''.join(( _c_on("("), alt_text, _c_on(")") ))
+        small = math.ceil(font_size * 0.67)
+        if cue:
+            alt_text = _c_high(escape_markup(cue))
+        else:
+            alt_text = cls.alt_time_strings[minute].format(**values).strip()
+            if alt_text:
+                alt_text = ''.join(( _c_on("("), alt_text, _c_on(")") ))
 
-        self.text = ''.join((
-            self.time_strings[minute].format(**values),
+        return ''.join((
+            cls.time_strings[minute].format(**values),
             '\n', ampm,
             '\n[size={0}]'.format(small), alt_text, '[/size]'
         ))
 
+    def tick(self, state):
+        """
+        ClockState callback.
+        """
+        self.update(state.hour, state.minute)
+
+    def on_font_size(self, *args):
+        # The small text size depends on the font size, so the cached
+        # texts are no longer any good. We also won't otherwise be
+        # called again until the next minute.
+        self._texts = None
+        if self._time is not None:
+            self.update(*self._time)
+
+    # The same goes for a new cue, or new colours or characters.
+    on_cue = on_font_size
+
+    def restyle(self, changed):
+        self.on_font_size()
+
 ############################################################################
 
-class DateDisplay(Label):
+class DateDisplay(SegmentedLabel):
     """
     Displays the current date in long form and dd/mm/yy.
     """
-    fmt = ''.join((
-        _c_D('%A'), ' ', _c_d('%e'), ' ',
-        _c_m('%B'), _c_on(','), ' ',
-        _c_y('%Y'), '\n[size={0}]',
-        _c_d('%d'), _c_on(config['date_separator']),
-        _c_m('%m'), _c_on(config['date_separator']),
-        _c_y('%y'), '[/size]'
+    granularity = DAY
+    style_keys = frozenset((
+        'dayname', 'day', 'month', 'year', 'on', 'date_separator'
     ))
 
+    @classmethod
+    def build_tables(cls):
+        """
+        Build the format string from the current colours and separator.
+        """
+        cls.fmt = ''.join((
+            _c_D('%A'), ' ', _c_d('%e'), ' ',
+            _c_m('%B'), _c_on(','), ' ',
+            _c_y('%Y'), '\n[size={0}]',
+            _c_d('%d'), _c_on(config['date_separator']),
+            _c_m('%m'), _c_on(config['date_separator']),
+            _c_y('%y'), '[/size]'
+        ))
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.today = None
@@ -578,14 +1875,162 @@ class DateDisplay(Label):
         """
         today = (y, m, d)
         if force or self.today != today:
-            small = math.ceil(self.font_size * 0.75)
-            self.text = date(*today).strftime(self.fmt.format(small))
+            self.show(self.text_for(y, m, d, self.font_size))
             self.today = today
+            if config['prerender_text']:
+                tomorrow = date(*today) + timedelta(days=1)
+                self.prerender(self.text_for(
+                    tomorrow.year, tomorrow.month, tomorrow.day,
+                    self.font_size
+                ))
+
+    @classmethod
+    def text_for(cls, y, m, d, font_size):
+        """
+        Return the marked up text for the specified y/m/d, at the given
+        font size, without needing a widget.
+        """
+        small = math.ceil(font_size * 0.75)
+        return date(y, m, d).strftime(cls.fmt.format(small))
+
+    def tick(self, state):
+        """
+        ClockState callback.
+        """
+        self.update(state.year, state.month, state.day)
 
     def on_size(self, *args, **kwargs):
         if self.today is not None:
             self.update(*self.today, force=True)
 
+    def restyle(self, changed):
+        self.on_size()
+
+DateDisplay.build_tables()
+
+############################################################################
+
+class FrameScheduler:
+    """
+    Calls a function to draw frames, in one of two modes. In 'sweep'
+    mode it is called `rate` times a second so that the hour and minute
+    hands move smoothly. In 'tick' mode it is only called once a second,
+    which is all the second hand and the digital displays need.
+
+    Either way a frame is lined up to land just after each second
+    boundary of the time source, so that the second hand ticks in step
+    with the clock. Kivy only runs scheduled events once per frame, so they
+    tend to be late by up to a frame. The scheduler measures how late
+    it wakes up, asks to be woken that much earlier next time, and then
+    sleeps off whatever is left over.
+    """
+    def __init__(self, callback, mode='sweep', rate=30, margin=0.002,
+                 source=None, stats=None):
+        if mode not in ('sweep', 'tick'):
+            raise ValueError("Unknown frame mode: {0!r}".format(mode))
+        self.callback = callback
+        self.source = source
+        self.stats = stats
+        self.mode = mode
+        self.interval = 1/rate
+        self.margin = margin
+
+        # Never ask to be woken more than this much early, so that the
+        # time spent sleeping in the callback stays small.
+        self.max_correction = 0.1 if mode == 'tick' else self.interval/2
+
+        # How late the last frame was, how much earlier than the due time
+        # we're currently asking to be woken, and how many frames we've
+        # missed altogether by being late.
+        self.lateness = 0
+        self.correction = 0
+        self.dropped = 0
+
+        # One event is reused for every frame, rather than scheduling a
+        # new one each time.
+        self._due = None
+        self._event = Clock.create_trigger(self._fire)
+
+    def start(self):
+        """
+        Start calling the callback.
+        """
+        self.stop()
+        self._schedule(time.time())
+
+    def stop(self):
+        """
+        Stop calling the callback.
+        """
+        self._event.cancel()
+
+    def until_boundary(self, now):
+        """
+        Return how long, in real seconds from `now`, until the time
+        source reaches its next whole second. If the source's time
+        doesn't follow the real clock, just return one frame (or one
+        second in tick mode).
+        """
+        if self.source is None:
+            return math.floor(now) + 1 - now
+
+        rate = self.source.rate
+        if not rate:
+            return 1 if self.mode == 'tick' else self.interval
+        t = self.source.timestamp()
+        if t is not None:
+            fraction = t % 1
+        else:
+            fraction = self.source.now().microsecond / 1000000
+        return (1 - fraction) / rate
+
+    def _schedule(self, now):
+        due = now + self.until_boundary(now) + self.margin
+        if self.mode == 'sweep':
+            due = min(due, now + self.interval)
+        self._due = due
+        self._event.timeout = max(0, due - now - self.correction)
+        self._event()
+
+    def _fire(self, *args):
+        now = time.time()
+        late = now - self._due
+
+        # Being late pushes the correction straight up to cover it, while
+        # being early only brings it down gradually. That way it tracks
+        # the worst case latency, and we are nearly always a little early
+        # rather than late.
+        if late > 0:
+            correction = self.correction + late
+        else:
+            correction = self.correction + late/8
+        self.correction = min(max(0, correction), self.max_correction)
+
+        # If we're early there's nothing to draw yet (in tick mode the
+        # second wouldn't have changed), so wait for the remainder. It's
+        # normally short enough to just sleep, which is more accurate
+        # than going back to Kivy.
+        if late < 0:
+            if -late > self.max_correction:
+                self._event.timeout = -late
+                self._event()
+                return
+            time.sleep(-late)
+            late = 0
+
+        self.lateness = late
+        dropped = 0
+        if self.mode == 'sweep' and late > self.interval:
+            dropped = int(late / self.interval)
+            self.dropped += dropped
+
+        if self.stats is not None:
+            self.stats.record('lateness', late)
+            self.stats.dropped += dropped
+
+        self.callback()
+        self._schedule(time.time())
+
 ############################################################################
 
 class BKClock(BoxLayout):
@@ -593,34 +2038,624 @@ class BKClock(BoxLayout):
     digital_12 = ObjectProperty(None)
     digital_24 = ObjectProperty(None)
     word_clock = ObjectProperty(None)
+    date_display = ObjectProperty(None)
+
+    # The smaller dimension of the clock face, which the other displays
+    # size their text by.
+    face_size = NumericProperty(0)
+
+    # The displays which aren't needed for the first frame, with the
+    # placeholders they replace once it has been drawn.
+    deferred = (
+        ('date_display', 'DateDisplay', 'date_slot'),
+        ('word_clock', 'WordClock', 'word_slot'),
+        ('digital_12', 'DigitalTime12', 'digital_slot'),
+    )
 
     def __init__(self, *args, **kwargs):
+        self._collect = None
+        self._collect_changed = 0
         super().__init__(*args, **kwargs)
         self.clock_face.start()
-        Clock.schedule_interval(self.update, 1/30)
+
+        self.time_source = make_time_source(
+            offset=config['time_offset'], scale=config['time_scale'],
+            start=config['time_start'], step=config['time_step'],
+            replay=config['time_replay']
+        )
+
+        # When debugging, complain loudly about any steady frame (one
+        # where only the sweeping hands move) which allocates more than
+        # its budget, once things have had a couple of seconds to warm
+        # up.
+        update = self.update
+        if config['alloc_debug']:
+            self.alloc_meter = AllocationMeter()
+            self.alloc_meter.start()
+            update = self.alloc_meter.budgeted(
+                update, config['alloc_budget'],
+                applies=lambda: self.state.changed == SUBSECOND,
+                warmup=2 * config['frame_rate']
+            )
+
+        # If wanted, time everything that happens on each frame.
+        self.stats = FrameStats() if config['stats'] else None
+        if self.stats is not None:
+            update = self.stats.timed('frame', update)
+            for name in 'hour_hand', 'minute_hand', 'second_hand':
+                hand = getattr(self.clock_face, name)
+                hand.update = self.stats.timed(name, hand.update)
+            if config['stats_log']:
+                Clock.schedule_interval(
+                    self.write_stats, config['stats_interval']
+                )
+
+        # Each display subscribes to the units of time it actually
+        # shows, so that e.g. the date is only reformatted once a day.
+        # The analogue clock gets the time straight away so that the
+        # very first frame is right.
+        self.state = ClockState(self.time_source)
+        self.subscribe('clock_face')
+        self.subscribe('digital_24')
+        self.state.tick()
+
+        self.scheduler = FrameScheduler(
+            update, config['frame_mode'], config['frame_rate'],
+            source=self.time_source, stats=self.stats
+        )
+        self.scheduler.start()
+
+        # Cues are looked after by a scheduler of their own, which wakes
+        # up when the next one starts or ends rather than on every frame.
+        self.cues = None
+        if config['cues']:
+            self.cues = CueScheduler(config['cues'], self.show_cue)
+
+        # The idle periods are kept track of in the same way, as cues
+        # with nothing to show. Any input holds them off for a while.
+        self.idle_cues = None
+        if config['idle']:
+            self.idle_cues = CueScheduler([
+                Cue(days, start, minutes, {})
+                for days, start, minutes in config['idle']
+            ], self.check_idle)
+        self.asleep = False
+        self._input_seen = True
+        self._input_event = Clock.create_trigger(
+            self.input_timeout, config['idle_timeout'] or self.idle_wake
+        )
+        self._idle_event = Clock.create_trigger(self.idle_tick)
+
+        self._cue_event = Clock.create_trigger(self.fire_cues)
+        if self.cues is not None or self.idle_cues is not None:
+            self.fire_cues()
+        if self.idle_cues is not None or config['idle_timeout']:
+            self._input_event()
+
+        # Changes to config.py are taken in as soon as it's saved. The
+        # watcher calls back from a thread of its own.
+        self.config_watcher = None
+        if config['config_watch'] and _conf is not None:
+            self.config_watcher = FileWatcher(
+                _conf.__file__,
+                lambda: Clock.schedule_once(self.config_changed)
+            )
+            self.config_watcher.start()
+
+        # Events scheduled now run before the first frame is drawn, so
+        # wait for the one after that to build the rest.
+        self._deferred_event = Clock.schedule_once(
+            lambda dt: self._defer_again(), 0
+        )
+
+    def _defer_again(self):
+        self._deferred_event = Clock.schedule_once(self.build_deferred, 0)
+
+    def subscribe(self, name):
+        """
+        Subscribe the named display to the clock state.
+        """
+        display = getattr(self, name)
+        tick = display.tick
+        if self.stats is not None:
+            tick = self.stats.timed(name, tick)
+        self.state.subscribe(tick, display.granularity)
+
+    def build_deferred(self, *args):
+        """
+        Build the displays other than the analogue clock, in place of
+        their placeholders so that the layout doesn't change, and bring
+        them up to date. Does nothing if they've already been built.
+        """
+        self._deferred_event.cancel()
+        if self.word_clock is not None:
+            return
+
+        startup.mark('first frame')
+        for name, cls, slot in self.deferred:
+            placeholder = self.ids[slot]
+            index = self.children.index(placeholder)
+            self.remove_widget(placeholder)
+            display = Factory.get(cls)()
+            self.add_widget(display, index)
+            setattr(self, name, display)
+            self.subscribe(name)
+            if name == 'word_clock' and self.cues is not None:
+                display.cue = self.cues.text or ''
+            display.tick(self.state)
+
+        startup.mark('other displays')
+        if config['profile_startup']:
+            print(startup.format_table())
 
     def update(self, *args):
         """
         Single callback to get the current time and feed it to the clock
-        displays.
+        displays that need it.
+        """
+        changed = self.state.tick()
+        if changed & SECOND and self._collect is not None:
+            self._collect_changed = changed
+            self._collect()
+        return True
+
+    # How long to leave it, at most, before checking the cues again. The
+    # clock may be changed or jump in the meantime; this is how long it
+    # takes for a cue to notice.
+    cue_check = 60
+
+    def fire_cues(self, *args):
+        """
+        Start and end the cues which are due at the time source's time,
+        and then wait for the next one. The cues are given in local
+        time, so the wait is worked out via timestamps to allow for
+        daylight saving time changing in the meantime.
+        """
+        source, state = self.time_source, self.state
+        t = source.timestamp()
+        if t is not None:
+            now = source.fromtimestamp(t)
+        else:
+            # The source's time can't be read without moving it on, so
+            # go by what the displays were last given.
+            now = datetime(
+                state.year, state.month, state.day,
+                state.hour, state.minute, state.second
+            )
+        schedulers = [ cues for cues in (self.cues, self.idle_cues)
+                       if cues is not None ]
+        for cues in schedulers:
+            cues.advance(now)
+
+        delay = self.cue_check
+        if not source.rate:
+            delay = 1
+        else:
+            for cues in schedulers:
+                due = cues.next_due()
+                if due is not None:
+                    delay = min(
+                        delay,
+                        (due.timestamp() - now.timestamp()) / source.rate
+                    )
+        self._cue_event.timeout = max(0, delay)
+        self._cue_event()
+
+    def show_cue(self, cues):
+        """
+        CueScheduler callback: show the text of the latest cue on the word
+        clock, and the colours of all the current cues.
+        """
+        changed = set_colors(dict(_configured_colors, **cues.colors))
+        if changed:
+            self.restyle(changed)
+        if self.word_clock is not None:
+            self.word_clock.cue = cues.text or ''
+
+    def restyle(self, changed):
+        """
+        Redraw the displays which use any of the changed colours or
+        other settings (as returned by set_colors() or reload_config()),
+        and only those.
+        """
+        for name in ('clock_face', 'digital_24', 'digital_12', 'word_clock',
+                     'date_display'):
+            display = getattr(self, name)
+            if display is not None and changed & display.style_keys:
+                display.restyle(changed)
+
+    def config_changed(self, *args):
+        """
+        Take in the changes to config.py, rebuilding and redrawing only
+        what depends on them.
+        """
+        changed = reload_config()
+        cue_colors = self.cues.colors if self.cues is not None else {}
+        changed |= set_colors(dict(_configured_colors, **cue_colors))
+        if 'fonts' in changed:
+            self.set_fonts(config['fonts'])
+        if changed:
+            self.restyle(changed)
+
+    def set_fonts(self, fonts):
+        """
+        Give each display its font from `fonts` (as in config.py). Only
+        the displays whose font has changed render their text again.
+        """
+        face = self.clock_face
+        hands = (face.hour_hand, face.minute_hand, face.second_hand)
+        for key, widgets, prop in (
+            ('clock-face', face.hour_labels, 'font_name'),
+            ('rim-text', hands, 'rim_font_name'),
+            ('digital-24', (self.digital_24,), 'font_name'),
+            ('digital-12', (self.digital_12,), 'font_name'),
+            ('word-clock', (self.word_clock,), 'font_name'),
+            ('date', (self.date_display,), 'font_name'),
+        ):
+            name = fonts.get(key, fonts['default'])
+            for widget in widgets:
+                if widget is not None and getattr(widget, prop) != name:
+                    setattr(widget, prop, name)
+
+    # How long input holds off an idle period, if there's no idle_timeout.
+    idle_wake = 60
+
+    # Kivy's frame rate cap while idle. Its loop still wakes up this often
+    # to look for input, so it's also how long a touch takes to wake us.
+    idle_fps = 4
+
+    def on_input(self, *args):
+        """
+        Window callback for a touch or a key press: wake up if we're idle,
+        and put off going idle again.
+        """
+        self._input_seen = True
+        self._input_event.cancel()
+        self._input_event()
+        if self.asleep:
+            self.wake()
+
+    def input_timeout(self, *args):
+        self._input_seen = False
+        self.check_idle()
+
+    def check_idle(self, *args):
+        """
+        Go idle or wake up, as needed. We're idle during an idle period
+        or once idle_timeout has passed, unless there's been input since.
+        """
+        idle = not self._input_seen and bool(
+            config['idle_timeout']
+            or self.idle_cues is not None and self.idle_cues.showing
+        )
+        if idle and not self.asleep:
+            self.sleep()
+        elif self.asleep and not idle:
+            self.wake()
+
+    def sleep(self):
+        """
+        Stop drawing frames and flipping the numerals. The clock is either
+        dimmed, and then only moved on once a minute, or blanked. Either
+        way Kivy has nothing to redraw in between.
+        """
+        self.asleep = True
+        self.scheduler.stop()
+        self.clock_face.stop_flipping()
+
+        # There's no public way to change the cap once Kivy has started.
+        self._max_fps = Clock._max_fps
+        Clock._max_fps = self.idle_fps
+        if config['idle_display'] == 'blank':
+            self.opacity = 0
+        else:
+            self.opacity = config['idle_opacity']
+            self.idle_tick()
+
+    def idle_tick(self, *args):
         """
-        now = datetime.now()
-        Y, M, D = now.year, now.month, now.day
-        h, m, s = now.hour, now.minute, now.second
-        u = now.microsecond
+        Bring the dimmed clock up to date, and wait until the time
+        source's next minute.
+        """
+        self.update()
+        source = self.time_source
+        t = source.timestamp()
+        delay = 60
+        if source.rate and t is not None:
+            delay = (60 - t % 60) / source.rate + self.scheduler.margin
+        self._idle_event.timeout = delay
+        self._idle_event()
+
+    def wake(self):
+        """
+        Start drawing frames again. The first tick only notifies the
+        displays whose units of time have changed since, and those
+        reuse the text they've already rendered where they can.
+        """
+        self.asleep = False
+        self._idle_event.cancel()
+        Clock._max_fps = self._max_fps
+        self.opacity = 1
+        self.update()
+        self.scheduler.start()
+        self.clock_face.start_flipping()
+
+    def pause_gc(self):
+        """
+        Stop the garbage collector running whenever it likes, which may
+        be in the middle of a frame. Instead the youngest generation is
+        collected straight after the frame for each new second, the next
+        one each minute and everything each hour. Whatever exists by now
+        is frozen, so that the full collections needn't look at it.
+        """
+        gc.collect()
+        gc.freeze()
+        gc.disable()
+        self._collect = Clock.create_trigger(self.collect_garbage)
+
+    def collect_garbage(self, *args):
+        changed = self._collect_changed
+        if changed & HOUR:
+            gc.collect(2)
+        elif changed & MINUTE:
+            gc.collect(1)
+        else:
+            gc.collect(0)
 
-        # Update the individual displays.
-        self.clock_face.update(h, m, s, u)
-        self.digital_12.update(h, m, s)
-        self.digital_24.update(h, m, s)
-        self.word_clock.update(h, m)
-        self.date_display.update(Y, M, D)
+    def write_stats(self, *args):
+        """
+        Append the statistics collected so far to the log file, and then
+        start collecting afresh.
+        """
+        self.stats.write(config['stats_log'])
+        self.stats.reset()
 
+class HandBatch:
+    """
+    The hands of one kind on every clock in a grid, drawn together as a
+    single mesh rather than one triangle per clock. Each hand gives its
+    points in its own face's coordinates, along with the face's position.
+    The mesh is only updated once per frame, by flush().
+    """
+    def __init__(self, canvas, color, alpha):
+        with canvas:
+            Color(color[0], color[1], color[2], alpha, mode='rgba')
+            self.mesh = Mesh(mode='triangles')
+        # Four values per point (x, y, u, v) and three points per hand.
+        self.vertices = []
+        self.changed = False
+
+    def add(self):
+        """
+        Make room for another hand, and return its index.
+        """
+        index = len(self.vertices) // 12
+        self.vertices.extend([0.0] * 12)
+        self.mesh.indices = list(range(3 * (index + 1)))
+        return index
+
+    def move(self, index, points, offset):
+        vertices = self.vertices
+        x, y = offset
+        i = index * 12
+        vertices[i], vertices[i+1] = points[0] + x, points[1] + y
+        vertices[i+4], vertices[i+5] = points[2] + x, points[3] + y
+        vertices[i+8], vertices[i+9] = points[4] + x, points[5] + y
+        self.changed = True
+
+    def flush(self):
+        if self.changed:
+            self.mesh.vertices = self.vertices
+            self.changed = False
+
+class ZoneClock(BoxLayout):
+    """
+    One of the analogue clocks in a grid, with a caption.
+    """
+    clock_face = ObjectProperty(None)
+    caption = StringProperty('')
+
+class ClockGrid(GridLayout):
+    """
+    Analogue clocks side by side, e.g. for different time zones, given
+    as a list of (caption, zone) pairs where the zone is a name such as
+    'Europe/London' or a number of hours ahead of the local time.
+
+    The clocks are far cheaper together than apart. There's one frame
+    scheduler and one reading of the time per frame, which each clock
+    converts to its own zone. The hands of each kind are all drawn as
+    one mesh. Since the clocks are all the same size, the rim and the
+    numerals are only drawn once, into an Fbo which every face shows,
+    and the digital clocks share an atlas of digits.
+    """
+    stats = None
+
+    def __init__(self, zones, **kwargs):
+        super().__init__(**kwargs)
+        self.cols = (config['world_clock_columns']
+                     or math.ceil(math.sqrt(len(zones))))
+
+        self.time_source = make_time_source(
+            offset=config['time_offset'], scale=config['time_scale'],
+            start=config['time_start'], step=config['time_step'],
+            replay=config['time_replay']
+        )
+        self.shared_time = SharedTime(self.time_source)
+
+        kinds = (HourHand, MinuteHand, SecondHand)
+        self.batches = [
+            HandBatch(self.canvas.after, kind.color, kind.alpha)
+            for kind in kinds
+        ]
+        hand_batches = dict(zip(kinds, self.batches))
+
+        self.states = []
+        owner = None
+        for caption, zone in zones:
+            if isinstance(zone, str):
+                from zoneinfo import ZoneInfo
+                zone = ZoneInfo(zone)
+            clock = ZoneClock(caption=caption)
+            face = clock.clock_face
+            face.hand_batches = hand_batches
+            face.digital_time.glyph_atlas = True
+            face.start()
+            if owner is None:
+                owner = face
+                if face.face_fbo is None:
+                    face.cache_static_face()
+            else:
+                face.share_static_face(owner)
+            self.add_widget(clock)
+
+            state = ClockState(ZonedTime(self.shared_time, zone))
+            state.subscribe(face.tick, face.granularity)
+            state.subscribe(
+                face.digital_time.tick, face.digital_time.granularity
+            )
+            self.states.append(state)
+
+        self.update()
+        self.scheduler = FrameScheduler(
+            self.update, config['frame_mode'], config['frame_rate'],
+            source=self.time_source
+        )
+        self.scheduler.start()
+
+    def update(self, *args):
+        """
+        Read the time once, and bring every clock up to date with it.
+        """
+        self.shared_time.read()
+        for state in self.states:
+            state.tick()
+        for batch in self.batches:
+            batch.flush()
         return True
 
+class StatsOverlay(Label):
+    """
+    Shows the frame statistics on top of the clock, refreshed once a
+    second while it's visible.
+    """
+    def __init__(self, stats, **kwargs):
+        self.stats = stats
+        self._event = None
+        super().__init__(**kwargs)
+
+    def refresh(self, *args):
+        self.text = self.stats.format_table()
+
+    def texture_update(self, *args):
+        # The text worker may be rendering at the same time. As in
+        # _render(), the text is only rendered when the texture is used.
+        with _text_lock:
+            super().texture_update(*args)
+            if self.texture is not None:
+                self.texture.bind()
+
+    def toggle(self, window):
+        """
+        Show the overlay on `window` if it's hidden, or vice versa.
+        """
+        if self.parent is None:
+            window.add_widget(self)
+            self.refresh()
+            self._event = Clock.schedule_interval(self.refresh, 1)
+        else:
+            self._event.cancel()
+            window.remove_widget(self)
+
 class BKClockApp(App):
     def build(self):
-        return BKClock()
+        startup.mark('kv')
+        if config['world_clocks']:
+            root = ClockGrid(config['world_clocks'])
+        else:
+            root = BKClock()
+        startup.mark('build')
+        return root
+
+    def on_start(self):
+        startup.mark('started')
+        if config['gc_pause'] and isinstance(self.root, BKClock):
+            self.root.pause_gc()
+
+        # Going idle is held off by any input, which also wakes us.
+        if ((config['idle'] or config['idle_timeout'])
+                and isinstance(self.root, BKClock)):
+            self.root_window.bind(
+                on_touch_down=self.root.on_input,
+                on_key_down=self.root.on_input
+            )
+
+        # The overlay is added straight to the window, so that it floats
+        # above the clock rather than taking part in its layout.
+        if self.root.stats is not None:
+            self.stats_overlay = StatsOverlay(self.root.stats)
+            if config['stats_overlay']:
+                self.stats_overlay.toggle(self.root_window)
+            self.root_window.bind(on_keyboard=self.on_keyboard)
+
+    def on_keyboard(self, window, key, scancode, codepoint, modifiers):
+        if codepoint == 's':
+            self.stats_overlay.toggle(window)
+            return True
+
+def argument_parser(description=None):
+    """
+    Return a parser for the command line options, which override the
+    corresponding entries in config.py. Note that Kivy takes the command
+    line for itself unless our options are separated from its own with
+    --, or it has been told not to with KIVY_NO_ARGS.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description=description
+            or "A colour-coded clock to help with learning the time."
+    )
+    parser.add_argument(
+        '--time-offset', type=float, metavar='SECONDS',
+        help="show the time this many seconds ahead (or behind)"
+    )
+    parser.add_argument(
+        '--time-scale', type=float, metavar='FACTOR',
+        help="run the clock this many times faster than real time"
+    )
+    parser.add_argument(
+        '--time-start', metavar='TIME',
+        help="start the clock at this time (YYYY-MM-DD HH:MM:SS)"
+    )
+    parser.add_argument(
+        '--time-step', type=float, metavar='SECONDS',
+        help="move the clock on by this much every frame"
+    )
+    parser.add_argument(
+        '--time-replay', metavar='FILE',
+        help="play back the times listed in FILE, one per frame"
+    )
+    return parser
+
+def parse_args(argv=None):
+    # Only the windowed clock marks the phases of starting up.
+    parser = argument_parser()
+    parser.add_argument(
+        '--profile-startup', action='store_true', default=None,
+        help="print how long each phase of starting up takes"
+    )
+    return parser.parse_args(argv)
+
+def apply_args(args):
+    """
+    Copy the command line options which were given into the config.
+    """
+    for k, v in vars(args).items():
+        if v is not None and k in config:
+            config[k] = v
+
+startup.mark('main.py')
 
 if __name__ == '__main__':
+    apply_args(parse_args())
     BKClockApp().run()
@@ -0,0 +1,423 @@
+#! /usr/bin/env python3
+# vi: set ts=4 et fileencoding=utf-8 ff=unix:
+############################################################################
+#                                                                          #
+# Copyright © 2016 Julian R Yon <julian@julianyon.net>                     #
+#                                                                          #
+# This program is free software: you can redistribute it and/or modify it  #
+# under the terms of the GNU General Public License as published by the    #
+# Free Software Foundation, either version 3 of the License, or (at your   #
+# option) any later version.                                               #
+#                                                                          #
+# This program is distributed in the hope that it will be useful, but      #
+# WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General #
+# Public License for more details.                                         #
+#                                                                          #
+# You should have received a copy of the GNU General Public License along  #
+# with this program. If not, see <http://www.gnu.org/licenses/>.           #
+#                                                                          #
+############################################################################
+
+"""
+Serves the clock to any number of browsers, e.g. one per classroom, from
+one machine. Once a second the state of the clock is worked out (the
+angles of the hands and the texts of the other displays), and whatever
+has changed is sent to every client as a single JSON object, encoded
+once however many clients there are.
+
+Clients connect with Server-Sent Events (/events) or a WebSocket (/ws),
+and get the whole state first. A client which can't keep up isn't
+waited for: while more than server_buffer bytes are queued for it,
+it's skipped, and once it has caught up it's sent the whole state
+again rather than the changes it missed. The page at / shows the clock.
+
+    python3 server.py --server-port 8080
+
+Only the standard library is needed, but since the texts come from the
+windowed clock, so is Kivy (though not a window).
+"""
+
+import os
+
+# Our command line is our own, not Kivy's.
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+from main import (
+    config, _colors_h, argument_parser, apply_args,
+    HourHand, MinuteHand, SecondHand,
+    DigitalTime24, DigitalTime12, WordClock, DateDisplay
+)
+from clockstate import (
+    ClockState, frame_delay, make_time_source,
+    SECOND, MINUTE, DAY, BLINK
+)
+
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+############################################################################
+
+class ClockFeed:
+    """
+    The state of the clock as a dict of fields, updated once per tick,
+    with each tick's changes encoded for the clients. The texts are
+    marked up as for the windowed clock, with sizes as percentages.
+    """
+    def __init__(self, source):
+        self.fields = {
+            'colors': { k: '#' + v for k, v in _colors_h.items() },
+            'roman_numerals': list(config['roman_numerals']),
+        }
+        self.changes = {}
+        self._snapshot = None
+
+        self.state = ClockState(source)
+        self.state.subscribe(self.tick_hands, SECOND)
+        self.state.subscribe(self.tick_digital_24, SECOND)
+        self.state.subscribe(self.tick_digital_12, MINUTE | BLINK)
+        self.state.subscribe(self.tick_word_clock, MINUTE)
+        self.state.subscribe(self.tick_date, DAY)
+
+    def set(self, name, value):
+        if self.fields.get(name) != value:
+            self.fields[name] = value
+            self.changes[name] = value
+
+    def tick_hands(self, state):
+        # In degrees clockwise from twelve, as ClockFace.update() works
+        # them out; only whole seconds are sent, so the hour and minute
+        # hands move a little with each. The hour hand goes round twice a
+        # day, so that its label can show the 24-hour clock.
+        s = state.second
+        m = state.minute + s/60
+        h = state.hour % 24 + m/60
+        self.set('hour', round(h * HourHand.unit_angle, 2))
+        self.set('minute', round(m * MinuteHand.unit_angle, 2))
+        self.set('second', s * SecondHand.unit_angle)
+
+    def tick_digital_24(self, state):
+        self.set('digital_24', DigitalTime24.text_for(
+            state.hour, state.minute, state.second
+        ))
+
+    def tick_digital_12(self, state):
+        self.set('digital_12', DigitalTime12.text_for(
+            state.hour, state.minute, state.second
+        ))
+
+    def tick_word_clock(self, state):
+        self.set('word_clock', WordClock.text_for(
+            state.hour, state.minute, 100
+        ))
+
+    def tick_date(self, state):
+        self.set('date', DateDisplay.text_for(
+            state.year, state.month, state.day, 100
+        ))
+
+    def tick(self, now=None):
+        """
+        Move the state on, and return the changes as a message (see
+        encode()), or None if nothing changed.
+        """
+        self.changes = {}
+        self.state.tick(now)
+        if not self.changes:
+            return None
+        self._snapshot = None
+        return self.encode(self.changes)
+
+    def snapshot(self):
+        """
+        Return the whole state as a message, for new clients and those
+        which have fallen behind.
+        """
+        if self._snapshot is None:
+            self._snapshot = self.encode(dict(self.fields, full=True))
+        return self._snapshot
+
+    @staticmethod
+    def encode(fields):
+        """
+        Return a message as a pair of the same JSON encoded for each
+        kind of client: as a Server-Sent Event, and as a WebSocket
+        text frame.
+        """
+        data = json.dumps(fields, separators=(',', ':')).encode('utf-8')
+        n = len(data)
+        if n < 126:
+            header = struct.pack('!BB', 0x81, n)
+        elif n < 65536:
+            header = struct.pack('!BBH', 0x81, 126, n)
+        else:
+            header = struct.pack('!BBQ', 0x81, 127, n)
+        return b'data: ' + data + b'\n\n', header + data
+
+############################################################################
+
+class Client:
+    """
+    One connected client. Messages are written straight to its transport
+    without waiting, so that a slow client never holds up the others.
+    """
+    # Which encoding of a message (see ClockFeed.encode()) it wants.
+    kind = 0
+
+    def __init__(self, server, writer):
+        self.server = server
+        self.writer = writer
+        self.transport = writer.transport
+        self.behind = False
+        self.behind_since = None
+
+    def send(self, message):
+        """
+        Send a message, unless too much is already queued for the client,
+        in which case it misses out until it has caught up, and then
+        gets the whole state instead.
+        """
+        transport = self.transport
+        if transport.is_closing():
+            self.server.clients.discard(self)
+            return
+        if transport.get_write_buffer_size() > self.server.buffer_limit:
+            if not self.behind:
+                self.behind = True
+                self.behind_since = time.monotonic()
+            elif time.monotonic() - self.behind_since > self.server.timeout:
+                self.server.clients.discard(self)
+                transport.abort()
+            self.server.skipped += 1
+            return
+        if self.behind:
+            self.behind = False
+            message = self.server.feed.snapshot()
+        transport.write(message[self.kind])
+
+    async def serve(self, reader):
+        """
+        Wait for the client to go away, reading (and ignoring) anything
+        it sends in the meantime.
+        """
+        while await reader.read(4096):
+            pass
+
+class WebSocketClient(Client):
+    """
+    A client connected with a WebSocket, which only needs to be read
+    from to answer pings and to notice it closing.
+    """
+    kind = 1
+
+    async def serve(self, reader):
+        try:
+            while True:
+                head = await reader.readexactly(2)
+                opcode, n = head[0] & 0x0f, head[1] & 0x7f
+                if n == 126:
+                    n = struct.unpack('!H', await reader.readexactly(2))[0]
+                elif n == 127:
+                    n = struct.unpack('!Q', await reader.readexactly(8))[0]
+                if n > 65536:
+                    return
+                # Frames from a client are always masked.
+                mask = await reader.readexactly(4) if head[1] & 0x80 else None
+                data = await reader.readexactly(n)
+                if mask is not None:
+                    data = bytes( b ^ mask[i % 4] for i, b in enumerate(data) )
+                if opcode == 0x8:
+                    self.transport.write(b'\x88\x00')
+                    return
+                if opcode == 0x9:
+                    self.transport.write(
+                        struct.pack('!BB', 0x8a, len(data)) + data
+                    )
+        except asyncio.IncompleteReadError:
+            return
+
+############################################################################
+
+class BroadcastServer:
+    """
+    Serves the page, the event stream and the WebSocket, and sends the
+    feed's changes to every client once per tick.
+    """
+    # The magic number from RFC 6455 for accepting a WebSocket.
+    ws_guid = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+    def __init__(self, feed, buffer_limit=65536, timeout=60):
+        self.feed = feed
+        self.buffer_limit = buffer_limit
+        self.timeout = timeout
+        self.clients = set()
+        self.skipped = 0
+        # The task handling each connection, with its writer.
+        self.connections = {}
+        with open(os.path.join(ROOT, 'web', 'index.html'), 'rb') as f:
+            self.page = f.read()
+
+    def broadcast(self, message):
+        for client in list(self.clients):
+            client.send(message)
+
+    async def run(self, ticks=None):
+        """
+        Tick once a second (of the time source) for ever, or the given
+        number of times.
+        """
+        n = 0
+        while ticks is None or n < ticks:
+            message = self.feed.tick()
+            if message is not None:
+                self.broadcast(message)
+            n += 1
+            await asyncio.sleep(frame_delay(self.feed.state.source, 'tick'))
+
+    async def handle(self, reader, writer):
+        """
+        Handle a connection, which begins with an HTTP request.
+        """
+        task = asyncio.current_task()
+        self.connections[task] = writer
+        try:
+            await self.handle_request(reader, writer)
+        finally:
+            del self.connections[task]
+
+    async def handle_request(self, reader, writer):
+        try:
+            request = await reader.readuntil(b'\r\n\r\n')
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                ConnectionError):
+            writer.close()
+            return
+
+        lines = request.decode('latin-1').split('\r\n')
+        method, path = (lines[0].split() + ['', ''])[:2]
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        path = path.partition('?')[0]
+
+        if method != 'GET':
+            self.respond(writer, '405 Method Not Allowed')
+        elif path == '/':
+            self.respond(
+                writer, '200 OK', 'text/html; charset=utf-8', self.page
+            )
+        elif path == '/events':
+            writer.write(
+                b'HTTP/1.1 200 OK\r\n'
+                b'Content-Type: text/event-stream\r\n'
+                b'Cache-Control: no-cache\r\n'
+                b'Connection: keep-alive\r\n\r\n'
+            )
+            await self.stream(Client(self, writer), reader)
+        elif path == '/ws' and 'sec-websocket-key' in headers:
+            key = headers['sec-websocket-key'].encode('latin-1')
+            accept = base64.b64encode(
+                hashlib.sha1(key + self.ws_guid).digest()
+            )
+            writer.write(
+                b'HTTP/1.1 101 Switching Protocols\r\n'
+                b'Upgrade: websocket\r\n'
+                b'Connection: Upgrade\r\n'
+                b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n'
+            )
+            await self.stream(WebSocketClient(self, writer), reader)
+        else:
+            self.respond(writer, '404 Not Found')
+
+    async def close(self):
+        """
+        Close every connection, and wait for them all to be finished
+        with, so that nothing is left to be cancelled.
+        """
+        for writer in self.connections.values():
+            writer.transport.abort()
+        if self.connections:
+            await asyncio.wait(list(self.connections))
+
+    def respond(self, writer, status, content_type='text/plain', body=None):
+        if body is None:
+            body = status.encode('ascii')
+        writer.write(
+            'HTTP/1.1 {0}\r\nContent-Type: {1}\r\nContent-Length: {2}\r\n'
+            'Connection: close\r\n\r\n'.format(
+                status, content_type, len(body)
+            ).encode('ascii') + body
+        )
+        writer.close()
+
+    async def stream(self, client, reader):
+        """
+        Send the client the whole state, then the changes on every tick
+        until it goes away.
+        """
+        client.transport.write(self.feed.snapshot()[client.kind])
+        self.clients.add(client)
+        try:
+            await client.serve(reader)
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(client)
+            client.writer.close()
+
+async def serve(host, port, ticks=None):
+    source = make_time_source(
+        offset=config['time_offset'], scale=config['time_scale'],
+        start=config['time_start'], step=config['time_step'],
+        replay=config['time_replay']
+    )
+    server = BroadcastServer(ClockFeed(source), config['server_buffer'])
+    listener = await asyncio.start_server(
+        server.handle, host, port, backlog=1024
+    )
+    async with listener:
+        await server.run(ticks)
+
+        # Stop taking new connections, then close the ones there are.
+        listener.close()
+        await server.close()
+
+############################################################################
+
+def parse_args(argv=None):
+    parser = argument_parser("Serve the clock to web browsers.")
+    parser.add_argument(
+        '--server-host', metavar='HOST',
+        help="the address to listen on (default: all of them)"
+    )
+    parser.add_argument(
+        '--server-port', type=int, metavar='PORT',
+        help="the port to listen on"
+    )
+    parser.add_argument(
+        '--server-buffer', type=int, metavar='BYTES',
+        help="how far a client may fall behind before changes are "
+             "skipped for it"
+    )
+    parser.add_argument(
+        '--ticks', type=int, metavar='N',
+        help="stop after N ticks"
+    )
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parse_args()
+    apply_args(args)
+    try:
+        asyncio.run(serve(
+            config['server_host'], config['server_port'], args.ticks
+        ))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,541 @@
+#! /usr/bin/env python3
+# vi: set ts=4 et fileencoding=utf-8 ff=unix:
+############################################################################
+#                                                                          #
+# Copyright © 2016 Julian R Yon <julian@julianyon.net>                     #
+#                                                                          #
+# This program is free software: you can redistribute it and/or modify it  #
+# under the terms of the GNU General Public License as published by the    #
+# Free Software Foundation, either version 3 of the License, or (at your   #
+# option) any later version.                                               #
+#                                                                          #
+# This program is distributed in the hope that it will be useful, but      #
+# WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General #
+# Public License for more details.                                         #
+#                                                                          #
+# You should have received a copy of the GNU General Public License along  #
+# with this program. If not, see <http://www.gnu.org/licenses/>.           #
+#                                                                          #
+############################################################################
+
+"""
+Shows the clock in a terminal, for headless machines and for status
+screens over SSH. The texts and colours are those of the windowed clock,
+and the analogue clock is drawn with Braille characters, each of which
+is a block of 2×4 dots, or in plain ASCII for terminals whose fonts
+don't have them. A terminal only has one size of text, so the smaller
+lines of the word clock and date are the same size as the rest, and the
+numerals don't flip to Roman numbers.
+
+The screen is redrawn by comparing each frame with the last, and only
+writing the character cells which have changed, with the cursor moved
+to each run of them. A tick which only moves the second hand and the
+seconds of the digital clock writes a few hundred bytes, not a screen.
+
+    python3 termclock.py --term-face ascii
+"""
+
+import os
+
+# Our command line is our own, not Kivy's.
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+from main import (
+    config, _colors_d, argument_parser, apply_args,
+    HourHand, MinuteHand, SecondHand, SegmentedLabel,
+    DigitalTime24, DigitalTime12, WordClock, DateDisplay
+)
+from clockstate import (
+    ClockState, frame_delay, make_time_source,
+    SUBSECOND, SECOND, MINUTE, DAY, BLINK
+)
+
+import math
+import shutil
+import signal
+import sys
+import time
+
+############################################################################
+
+# Which bit of a Braille character is the dot at (x, y) within its cell.
+BRAILLE_BITS = ((0x01, 0x02, 0x04, 0x40), (0x08, 0x10, 0x20, 0x80))
+
+# A cell is a (character, foreground, background) triple, the colours
+# being SGR parameters. These are the terminal's defaults.
+FG = '39'
+BG = '49'
+BLANK = (' ', FG, BG)
+
+class Palette:
+    """
+    Turns colours into SGR parameters, for a terminal with 24-bit colour
+    or one with the usual 256 colours.
+    """
+    def __init__(self, depth='truecolor'):
+        if depth not in ('truecolor', '256'):
+            raise ValueError("Unknown colour depth: {0!r}".format(depth))
+        self.depth = depth
+        self._cache = {}
+
+    def __call__(self, rgb, ground=38):
+        """
+        Return the parameters for an (r, g, b) colour, given as bytes
+        or as floats (as from marked up text, maybe with an alpha), in
+        the foreground or (if `ground` is 48) the background.
+        """
+        key = (tuple(rgb[:3]), ground)
+        sgr = self._cache.get(key)
+        if sgr is None:
+            rgb = key[0]
+            if isinstance(rgb[0], float):
+                rgb = tuple( round(c * 255) for c in rgb )
+            if self.depth == 'truecolor':
+                sgr = '{0};2;{1};{2};{3}'.format(ground, *rgb)
+            else:
+                # The 6×6×6 cube of the 256 colour palette.
+                r, g, b = ( round(c / 51) for c in rgb )
+                sgr = '{0};5;{1}'.format(ground, 16 + 36*r + 6*g + b)
+            self._cache[key] = sgr
+        return sgr
+
+############################################################################
+
+class Dots:
+    """
+    Dots plotted on character cells, 2×4 to a cell as Braille or one to
+    a cell in ASCII, each cell taking the colour of the last dot in it.
+    Positions are measured in cell widths across and down, with a cell
+    taken to be twice as high as it is wide, which most fonts are near
+    enough, so that a circle comes out round.
+    """
+    def __init__(self, braille=True):
+        self.braille = braille
+        self.per_col, self.per_row = (2, 4) if braille else (1, 1)
+        self.cells = {}
+
+    def plot(self, x, y, fg, char='*'):
+        """
+        Plot a dot at the point (x, y), in the colour `fg`. In ASCII the
+        dot is shown as `char`.
+        """
+        dx = math.floor(x * self.per_col)
+        dy = math.floor(y * self.per_row / 2)
+        col, dx = divmod(dx, self.per_col)
+        row, dy = divmod(dy, self.per_row)
+        if self.braille:
+            bits = self.cells.get((row, col), (0,))[0]
+            self.cells[(row, col)] = (bits | BRAILLE_BITS[dx][dy], fg)
+        else:
+            self.cells[(row, col)] = (char, fg)
+
+    def line(self, x0, y0, x1, y1, fg, char='*'):
+        """
+        Plot a line of dots between two points.
+        """
+        steps = math.ceil(max(
+            abs(x1 - x0) * self.per_col, abs(y1 - y0) * self.per_row / 2
+        )) + 1
+        for i in range(steps + 1):
+            t = i / steps
+            self.plot(x0 + (x1 - x0)*t, y0 + (y1 - y0)*t, fg, char)
+
+    def circle(self, cx, cy, radius, fg, char='.'):
+        """
+        Plot a circle of dots.
+        """
+        steps = math.ceil(2 * math.pi * radius * self.per_col) * 2
+        for i in range(steps):
+            a = 2 * math.pi * i / steps
+            self.plot(cx + radius*math.sin(a), cy - radius*math.cos(a),
+                      fg, char)
+
+    def draw(self, grid, width, height):
+        """
+        Put the plotted cells on a grid (a list of cells, row by row)
+        of the given size, replacing whatever was there.
+        """
+        braille = self.braille
+        for (row, col), (value, fg) in self.cells.items():
+            if 0 <= row < height and 0 <= col < width:
+                char = chr(0x2800 + value) if braille else value
+                grid[row*width + col] = (char, fg, BG)
+
+############################################################################
+
+class Text:
+    """
+    A display of marked up text, each line centred on a column, in
+    the cells starting at a row.
+    """
+    def __init__(self, clock, row, col):
+        self.clock = clock
+        self.row = row
+        self.col = col
+        self.text = None
+        self.cells = ()
+
+    def show(self, text):
+        if text == self.text:
+            return
+        self.text = text
+        palette, width = self.clock.palette, self.clock.width
+        cells = []
+        for i, (size, runs) in enumerate(SegmentedLabel.parse(text)):
+            length = sum(len(t) for color, size, t in runs)
+            row = self.row + i
+            col = self.col - length // 2
+            for color, size, t in runs:
+                fg = palette(color) if color is not None else FG
+                for char in t:
+                    if 0 <= col < width:
+                        cells.append((row*width + col, (char, fg, BG)))
+                    col += 1
+        self.cells = cells
+        self.clock.changed = True
+
+    def draw(self, grid):
+        for i, cell in self.cells:
+            if i < len(grid):
+                grid[i] = cell
+
+class Hand:
+    """
+    One of the clock hands, drawn as a line of dots from the centre,
+    and the label showing its value on the rim.
+    """
+    def __init__(self, clock, kind, color_key):
+        self.clock = clock
+        self.kind = kind
+        self.length = kind.point_vectors[0][1]
+        color = _colors_d[color_key]
+        self.fg = clock.palette(color)
+        self.rim_bg = clock.palette(tuple( c // 2 for c in color ), 48)
+        self.value = None
+
+    def draw(self, dots, grid):
+        clock = self.clock
+        a = math.radians(self.value * self.kind.unit_angle)
+        sin, cos = math.sin(a), math.cos(a)
+        cx, cy, r = clock.cx, clock.cy, clock.radius
+        dots.line(cx, cy, cx + r*self.length*sin, cy - r*self.length*cos,
+                  self.fg)
+
+        # The label goes just outside the rim, in the hand's colour.
+        text = '{0:02d}'.format(math.floor(self.value) % 60)
+        x, y = cx + r*1.1*sin, cy - r*1.1*cos
+        width = clock.width
+        row, col = int(y / 2), round(x - len(text)/2)
+        fg = clock.palette(_colors_d['rim_text'])
+        for i, char in enumerate(text):
+            if 0 <= col + i < width and 0 <= row < clock.height:
+                grid[row*width + col + i] = (char, fg, self.rim_bg)
+
+############################################################################
+
+class TermClock:
+    """
+    The whole clock on a terminal of a given size, written to a binary
+    stream as escape sequences.
+    """
+    # The rows of the layout in bkclock.kv, from the top, with their
+    # size hints and the number of lines of text they need here.
+    rows = (
+        ('date', 0.2, 2), ('face', 1, 0), ('word', 0.2, 3),
+        ('digital_12', 0.2, 1)
+    )
+
+    def __init__(self, out, source, size, braille=True, depth='truecolor'):
+        self.out = out
+        self.braille = braille
+        self.palette = Palette(depth)
+        self.state = ClockState(source)
+        self.hands = [
+            Hand(self, HourHand, 'hour'), Hand(self, MinuteHand, 'minute'),
+            Hand(self, SecondHand, 'second')
+        ]
+        self.layout(size)
+
+        self.state.subscribe(self.tick_face, SUBSECOND)
+        self.state.subscribe(self.tick_digital_24, SECOND)
+        self.state.subscribe(self.tick_digital_12, MINUTE | BLINK)
+        self.state.subscribe(self.tick_word_clock, MINUTE)
+        self.state.subscribe(self.tick_date, DAY)
+
+    def layout(self, size):
+        """
+        Lay the clock out for a terminal of `size` (columns, rows), and
+        arrange for the whole of it to be written on the next frame.
+        """
+        self.width, self.height = width, height = size
+        total = sum(hint for name, hint, lines in self.rows)
+        heights = {
+            name: max(lines, round(height * hint / total))
+            for name, hint, lines in self.rows if lines
+        }
+        heights['face'] = max(1, height - sum(heights.values()))
+
+        tops = {}
+        top = 0
+        for name, hint, lines in self.rows:
+            tops[name] = top
+            top += heights[name]
+
+        def text(name, lines):
+            return Text(self, tops[name] + (heights[name] - lines) // 2,
+                        width // 2)
+
+        self.date = text('date', 2)
+        self.word_clock = text('word', 3)
+        self.digital_12 = text('digital_12', 1)
+
+        # The face, in cell widths (see Dots) from the top left of the
+        # screen, and the digital clock on it a third of the way up.
+        face_top, face_height = tops['face'], heights['face']
+        self.cx = width / 2
+        self.cy = 2 * face_top + face_height
+        self.radius = min(width, 2 * face_height) / 2.2
+        self.digital_24 = Text(
+            self, face_top + face_height - face_height // 3 - 1, width // 2
+        )
+
+        # The rim and the numerals never change.
+        dots = Dots(self.braille)
+        dots.circle(self.cx, self.cy, self.radius,
+                    self.palette(_colors_d['rim']))
+        self.static = [BLANK] * (width * height)
+        dots.draw(self.static, width, height)
+        numerals = self.palette(_colors_d['numerals'])
+        for hour in range(1, 13):
+            a = math.radians(30 * hour)
+            x = self.cx + 0.85*self.radius*math.sin(a)
+            y = self.cy - 0.85*self.radius*math.cos(a)
+            text = str(hour)
+            row, col = int(y / 2), round(x - len(text)/2)
+            for i, char in enumerate(text):
+                if 0 <= col + i < width and 0 <= row < height:
+                    self.static[row*width + col + i] = (char, numerals, BG)
+
+        # Nothing is known to be on the screen, which is cleared first.
+        self.shown = None
+        self.changed = True
+        self._fg, self._bg, self._pos = FG, BG, None
+        if self.state.day is not None:
+            self.state.refresh()
+
+    def tick_face(self, state):
+        s = state.second + state.fraction
+        m = state.minute + s/60
+        h = state.hour % 24 + m/60
+        hands = self.hands
+        hands[0].value, hands[1].value = h, m
+        hands[2].value = state.second
+        self.changed = True
+
+    def tick_digital_24(self, state):
+        self.digital_24.show(DigitalTime24.text_for(
+            state.hour, state.minute, state.second
+        ))
+
+    def tick_digital_12(self, state):
+        self.digital_12.show(DigitalTime12.text_for(
+            state.hour, state.minute, state.second
+        ))
+
+    def tick_word_clock(self, state):
+        # The font size only goes into [size] tags, which are ignored.
+        self.word_clock.show(WordClock.text_for(state.hour, state.minute, 15))
+
+    def tick_date(self, state):
+        self.date.show(DateDisplay.text_for(
+            state.year, state.month, state.day, 15
+        ))
+
+    def compose(self):
+        """
+        Return the grid of cells for the current state, drawn over the
+        static cells in the same order as the window draws them.
+        """
+        grid = list(self.static)
+        dots = Dots(self.braille)
+        for hand in self.hands:
+            if hand.value is not None:
+                hand.draw(dots, grid)
+
+        # The hands' dots are combined with the rim's in Braille cells.
+        if self.braille:
+            width = self.width
+            for (row, col), (bits, fg) in dots.cells.items():
+                if 0 <= col < width and 0 <= row < self.height:
+                    char = grid[row*width + col][0]
+                    if '\u2800' < char <= '\u28ff':
+                        dots.cells[(row, col)] = (bits | ord(char) - 0x2800, fg)
+        dots.draw(grid, self.width, self.height)
+
+        for text in (self.digital_24, self.date, self.word_clock,
+                     self.digital_12):
+            text.draw(grid)
+        return grid
+
+    def diff(self, grid):
+        """
+        Return the escape sequences to change the screen from what was
+        last shown to `grid`, as bytes.
+        """
+        width = self.width
+        out = []
+        if self.shown is None:
+            out.append('\x1b[0m\x1b[2J')
+            self.shown = [BLANK] * len(grid)
+            self._fg, self._bg, self._pos = FG, BG, None
+        shown = self.shown
+        fg, bg, pos = self._fg, self._bg, self._pos
+
+        # The bottom right cell is never written, since writing it makes
+        # some terminals scroll.
+        last = len(grid) - 1
+        for a in range(0, len(grid), width):
+            b = min(a + width, last)
+            if grid[a:b] == shown[a:b]:
+                continue
+            i = a
+            while i < b:
+                cell = grid[i]
+                if cell == shown[i]:
+                    i += 1
+                    continue
+
+                if pos != i:
+                    if pos is not None and a <= pos < i:
+                        out.append('\x1b[{0}C'.format(i - pos)
+                                   if i - pos > 1 else '\x1b[C')
+                    else:
+                        out.append('\x1b[{0};{1}H'.format(a//width + 1,
+                                                          i - a + 1))
+                    pos = i
+                char, f, g = cell
+
+                # A long run of changed cells which are now blank is
+                # erased, which leaves the cursor where it is.
+                if cell == BLANK and bg == BG:
+                    j = i + 1
+                    while j < b and grid[j] == BLANK and shown[j] != BLANK:
+                        j += 1
+                    if j - i >= 6:
+                        out.append('\x1b[{0}X'.format(j - i))
+                        i = j
+                        continue
+
+                # The foreground doesn't show on a space.
+                if char == ' ':
+                    f = fg
+                if f != fg and g != bg:
+                    out.append('\x1b[{0};{1}m'.format(f, g))
+                elif f != fg:
+                    out.append('\x1b[{0}m'.format(f))
+                elif g != bg:
+                    out.append('\x1b[{0}m'.format(g))
+                fg, bg = f, g
+                out.append(char)
+
+                # After the last column the cursor's position depends on
+                # the terminal.
+                i += 1
+                pos = i if i < a + width else None
+        self.shown = grid
+        self._fg, self._bg, self._pos = fg, bg, pos
+        return ''.join(out).encode('utf-8')
+
+    def frame(self):
+        """
+        Write whatever has changed to the terminal, returning the number
+        of bytes written.
+        """
+        if not self.changed:
+            return 0
+        self.changed = False
+        data = self.diff(self.compose())
+        if data:
+            self.out.write(data)
+            self.out.flush()
+        return len(data)
+
+    def run(self, frames=None, resize=None):
+        """
+        Show the clock until interrupted, or for the given number of
+        frames. If `resize` is given, it's called on each frame and
+        returns the terminal's size, or None if it hasn't changed.
+        """
+        n = 0
+        while frames is None or n < frames:
+            size = resize() if resize is not None else None
+            if size is not None:
+                self.layout(size)
+            self.state.tick()
+            self.frame()
+            n += 1
+            time.sleep(frame_delay(
+                self.state.source, config['frame_mode'], config['frame_rate']
+            ))
+
+############################################################################
+
+def parse_args(argv=None):
+    parser = argument_parser("Show the clock in a terminal.")
+    parser.add_argument(
+        '--term-size', metavar='WxH',
+        type=lambda s: tuple(map(int, s.split('x'))),
+        help="lay the clock out for this size rather than the terminal's"
+    )
+    parser.add_argument(
+        '--term-face', choices=('braille', 'ascii'),
+        help="how to draw the analogue clock"
+    )
+    parser.add_argument(
+        '--term-colors', choices=('truecolor', '256'),
+        help="the colours the terminal can show"
+    )
+    parser.add_argument(
+        '--frames', type=int, metavar='N',
+        help="stop after drawing N frames"
+    )
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parse_args()
+    apply_args(args)
+    source = make_time_source(
+        offset=config['time_offset'], scale=config['time_scale'],
+        start=config['time_start'], step=config['time_step'],
+        replay=config['time_replay']
+    )
+
+    # Follow the terminal's size unless told otherwise.
+    resized = []
+    resize = None
+    size = config['term_size']
+    if size is None:
+        size = tuple(shutil.get_terminal_size())
+        signal.signal(signal.SIGWINCH, lambda *args: resized.append(True))
+
+        def resize():
+            if resized:
+                del resized[:]
+                return tuple(shutil.get_terminal_size())
+
+    out = sys.stdout.buffer
+    clock = TermClock(
+        out, source, size, config['term_face'] == 'braille',
+        config['term_colors']
+    )
+
+    # The alternate screen, without a cursor.
+    out.write(b'\x1b[?1049h\x1b[?25l')
+    try:
+        clock.run(args.frames, resize)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        out.write(b'\x1b[0m\x1b[?25h\x1b[?1049l')
+        out.flush()
@@ -0,0 +1,217 @@
+# vi: set ts=4 et fileencoding=utf-8 ff=unix:
+############################################################################
+#                                                                          #
+# Copyright © 2016 Julian R Yon <julian@julianyon.net>                     #
+#                                                                          #
+# This program is free software: you can redistribute it and/or modify it  #
+# under the terms of the GNU General Public License as published by the    #
+# Free Software Foundation, either version 3 of the License, or (at your   #
+# option) any later version.                                               #
+#                                                                          #
+# This program is distributed in the hope that it will be useful, but      #
+# WITHOUT ANY WARRANTY; without even the implied warranty of               #
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General #
+# Public License for more details.                                         #
+#                                                                          #
+# You should have received a copy of the GNU General Public License along  #
+# with this program. If not, see <http://www.gnu.org/licenses/>.           #
+#                                                                          #
+############################################################################
+
+"""
+A cache on disk of rendered text, kept as raw RGBA bitmaps so that text
+which has been rendered once (even by an earlier run of the clock) can be
+put straight into a texture without going near the font renderer.
+
+Each bitmap is a file in the cache directory, named after a hash of
+everything that went into rendering it. The cache is kept under a size
+limit by deleting the least recently used files, going by their
+modification times, which are updated whenever a file is used.
+
+Like clockstate, this doesn't import Kivy.
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+############################################################################
+
+class Bitmap:
+    """
+    A bitmap loaded from the cache. The pixels are a memoryview of the
+    file mapped into memory, so they are only valid until the bitmap is
+    closed, which it is at the end of a `with` block.
+    """
+    def __init__(self, width, height, meta, data, offset):
+        self.width = width
+        self.height = height
+        self.meta = meta
+        self._data = data
+        self.pixels = memoryview(data)[offset:]
+
+    def close(self):
+        self.pixels.release()
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class TextureCache:
+    """
+    The bitmaps in one directory, limited to a total of `limit` bytes.
+    Problems reading or writing the files just count as cache misses,
+    since the text can always be rendered again.
+    """
+    # A file is the header, then any metadata as JSON, then the pixels.
+    header = struct.Struct('<4sIII')
+    magic = b'BKT1'
+    suffix = '.rgba'
+
+    def __init__(self, path, limit):
+        self.path = os.path.expanduser(path)
+        self.limit = limit
+        self._fonts = {}
+
+        # The size of each file, least recently used first; read from
+        # the directory when first needed.
+        self._files = None
+        self._total = 0
+
+    def font_hash(self, path):
+        """
+        Return a hash of the contents of the font file at `path`, so
+        that replacing a font doesn't bring back the old one's text.
+        """
+        digest = self._fonts.get(path)
+        if digest is None:
+            with open(path, 'rb') as f:
+                digest = self._fonts[path] = hashlib.sha1(f.read()).digest()
+        return digest
+
+    def key(self, font_path, *parts):
+        """
+        Return the key for text rendered with the font at `font_path`,
+        where `parts` (which must have stable reprs) are everything else
+        affecting the result: the size, colour, text and so on.
+        """
+        h = hashlib.sha1(self.font_hash(font_path))
+        h.update(repr(parts).encode('utf-8'))
+        return h.hexdigest()
+
+    def __contains__(self, key):
+        if self._files is None:
+            self._scan()
+        return key + self.suffix in self._files
+
+    def load(self, key):
+        """
+        Return the Bitmap stored under `key`, or None if there isn't one.
+        """
+        if self._files is None:
+            self._scan()
+        name = key + self.suffix
+        if name not in self._files:
+            return None
+
+        path = os.path.join(self.path, name)
+        try:
+            with open(path, 'rb') as f:
+                # Copy on write, since Kivy insists on a writable buffer
+                # even though it only reads from it.
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+            os.utime(path)
+        except (OSError, ValueError):
+            self._forget(name)
+            return None
+
+        try:
+            magic, width, height, n = self.header.unpack_from(data)
+            offset = self.header.size + n
+            if (magic != self.magic
+                    or len(data) != offset + width * height * 4):
+                raise ValueError("Bad texture cache file")
+            meta = json.loads(data[self.header.size:offset].decode('utf-8'))
+        except (struct.error, ValueError):
+            data.close()
+            self._forget(name, delete=True)
+            return None
+
+        self._files.move_to_end(name)
+        return Bitmap(width, height, meta, data, offset)
+
+    def store(self, key, width, height, pixels, meta=None):
+        """
+        Store RGBA `pixels` under `key`, with optional metadata which
+        must be serialisable as JSON.
+        """
+        if self._files is None:
+            self._scan()
+        name = key + self.suffix
+        meta = json.dumps(meta).encode('utf-8')
+        size = self.header.size + len(meta) + len(pixels)
+        if size > self.limit:
+            return
+
+        # Written to a temporary file and then renamed, so that nothing
+        # (such as another clock) ever sees half a file.
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(self.header.pack(self.magic, width, height,
+                                             len(meta)))
+                    f.write(meta)
+                    f.write(pixels)
+                os.replace(tmp, os.path.join(self.path, name))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError:
+            return
+
+        self._total += size - self._files.pop(name, 0)
+        self._files[name] = size
+        self._evict()
+
+    def _scan(self):
+        """
+        Find out what's in the cache directory.
+        """
+        files = []
+        try:
+            with os.scandir(self.path) as it:
+                for entry in it:
+                    if entry.name.endswith(self.suffix):
+                        st = entry.stat()
+                        files.append((st.st_mtime, entry.name, st.st_size))
+        except OSError:
+            pass
+        files.sort()
+        self._files = OrderedDict( (name, size) for t, name, size in files )
+        self._total = sum(self._files.values())
+        self._evict()
+
+    def _forget(self, name, delete=False):
+        self._total -= self._files.pop(name, 0)
+        if delete:
+            try:
+                os.unlink(os.path.join(self.path, name))
+            except OSError:
+                pass
+
+    def _evict(self):
+        """
+        Delete the least recently used files until the cache is within
+        its limit.
+        """
+        while self._total > self.limit and self._files:
+            self._forget(next(iter(self._files)), delete=True)